@@ -1,17 +1,51 @@
+import atexit
+import functools
+import time
+import weakref
 import psutil
+from collections import Counter, deque
 from datetime import datetime
 from logger import FirewallLogger
 
 # Global safety switch — True means NO real termination or blocking.
 DRY_RUN = True
 
+ACTION_HISTORY_SIZE = 1000   # recent actions kept in memory; older ones live in the JSONL log
+SUMMARY_INTERVAL = 10.0      # seconds between console summaries in "summary" mode
+
+# Console output modes:
+#   "action"  → one line per action (legacy behaviour)
+#   "summary" → one aggregate line every SUMMARY_INTERVAL seconds
+#   "silent"  → no console output
+OUTPUT_MODES = ("action", "summary", "silent")
+
 
 class ActionSimulator:
     """Simulates (and optionally enforces) actions like block, allow, terminate."""
 
-    def __init__(self, logger=None):
-        self.action_log = []
+    def __init__(self, logger=None, executor=None, output="action",
+                 history_size=ACTION_HISTORY_SIZE, summary_interval=SUMMARY_INTERVAL):
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode '{output}' (expected one of {OUTPUT_MODES})")
+        # Bounded ring buffer: memory stays flat no matter how long we run
+        self.action_log = deque(maxlen=history_size)
+        # Running aggregates for show_action_log()
+        self.total_actions = 0
+        self.action_counts = Counter()
+        self.rule_counts = Counter()
+        self.output = output
+        self.summary_interval = summary_interval
+        self._summary_counts = Counter()
+        self._last_summary = time.monotonic()
         self.logger = logger or FirewallLogger()  # integrate with global firewall logger
+        # Optional enforcement.EnforcementExecutor: block/terminate decisions are queued
+        # there and applied in batches by flush() instead of per target.
+        self.executor = executor
+        self._atexit_hook = None
+        if output == "summary":
+            # Prints the last group if close() is never called; holds only a weak reference
+            self._atexit_hook = functools.partial(_flush_summary_at_exit, weakref.ref(self))
+            atexit.register(self._atexit_hook)
 
     # ----------------------------
     # Main Action Dispatcher
@@ -22,15 +56,25 @@ class ActionSimulator:
         - target: psutil.Process, Connection object, or dict
         - rule: dict with keys (id, type, value, action)
         """
+        result = self.execute(target, rule)
+
+        # Log using FirewallLogger (structured)
+        if self.logger:
+            self.logger.log_decision(target, rule, result)
+
+        return result
+
+    def execute(self, target, rule):
+        """apply_action() without the logging, for callers that log separately (e.g. pipeline.py)."""
         action = rule.get("action", "allow").lower()
-        pid = getattr(target, "pid", None)
+        pid = target.get("pid") if isinstance(target, dict) else getattr(target, "pid", None)
         rule_id = rule.get("id", "N/A")
 
         # Determine simulated or real execution
         if action == "terminate":
             result = self._terminate(target)
         elif action == "block":
-            result = self._block(target)
+            result = self._block(target, rule)
         elif action == "allow":
             result = self._allow(target)
         else:
@@ -45,13 +89,16 @@ class ActionSimulator:
             "result": result,
         }
         self.action_log.append(log_entry)
+        self.total_actions += 1
+        self.action_counts[action] += 1
+        self.rule_counts[rule_id] += 1
 
-        # Print to console
-        print(f"PID {pid} | Rule {rule_id} | Action: {action.upper()} | Result: {result}")
-
-        # Log using FirewallLogger (structured)
-        if self.logger:
-            self.logger.log_decision(target, rule, result)
+        # Console output (stdout can be a slow pipe, so it is configurable)
+        if self.output == "action":
+            print(f"PID {pid} | Rule {rule_id} | Action: {action.upper()} | Result: {result}")
+        elif self.output == "summary":
+            self._summary_counts[action] += 1
+            self._maybe_print_summary()
 
         return result
 
@@ -60,6 +107,10 @@ class ActionSimulator:
     # ----------------------------
     def _terminate(self, target):
         """Terminate a process (simulated or real based on DRY_RUN)."""
+        if self.executor:
+            if self.executor.submit_terminate(target):
+                return self._describe_target(target, "queued for TERMINATION")
+            return self._describe_target(target, "cannot be terminated (no PID)")
         if DRY_RUN:
             return self._describe_target(target, "would be TERMINATED (simulated)")
         else:
@@ -72,8 +123,12 @@ class ActionSimulator:
             except (psutil.AccessDenied, psutil.NoSuchProcess):
                 return f"termination failed (access denied or process ended)"
 
-    def _block(self, target):
+    def _block(self, target, rule=None):
         """Block a process or connection (simulated)."""
+        if self.executor:
+            if self.executor.submit_block(target, rule):
+                return self._describe_target(target, "queued for BLOCK")
+            return self._describe_target(target, "cannot be blocked (no IP or port)")
         if DRY_RUN:
             return self._describe_target(target, "would be BLOCKED (simulated)")
         else:
@@ -84,19 +139,60 @@ class ActionSimulator:
         """Allow the process/connection (safe no-op)."""
         return self._describe_target(target, "allowed")
 
+    def flush(self):
+        """Apply queued enforcement decisions as one batch (no-op without an executor)."""
+        if self.executor:
+            return self.executor.flush()
+        return None
+
     # ----------------------------
     # Log Utilities
     # ----------------------------
     def show_action_log(self, limit=10):
-        """Print the most recent actions."""
+        """Print the most recent actions followed by running totals."""
         if not self.action_log:
             print("No actions taken yet.")
             return
         print("\n--- Recent Action Log ---")
-        for entry in self.action_log[-limit:]:
+        recent = list(self.action_log)[-limit:]
+        for entry in recent:
             print(f"[{entry['timestamp']}] PID {entry['pid']} | Rule {entry['rule_id']} | "
                   f"Action: {entry['action']} | Result: {entry['result']}")
 
+        print(f"\nTotal actions: {self.total_actions} "
+              f"(last {len(self.action_log)} kept in memory)")
+        print("By action: " + ", ".join(f"{a}={c}" for a, c in self.action_counts.most_common()))
+        print("Top rules: " + ", ".join(f"{r}={c}" for r, c in self.rule_counts.most_common(5)))
+
+    def print_summary(self):
+        """Print and reset the counts accumulated since the last summary."""
+        if self._summary_counts:
+            parts = ", ".join(f"{a.upper()}={c}" for a, c in self._summary_counts.most_common())
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {sum(self._summary_counts.values())} "
+                  f"actions in last {self.summary_interval:.0f}s: {parts} (total {self.total_actions})")
+            self._summary_counts.clear()
+        self._last_summary = time.monotonic()
+
+    def _maybe_print_summary(self):
+        if time.monotonic() - self._last_summary >= self.summary_interval:
+            self.print_summary()
+
+    def _flush_summary(self):
+        if self.output == "summary" and self._summary_counts:
+            self.print_summary()
+
+    def close(self):
+        """
+        Apply queued enforcement, shut down the executor and print the pending summary,
+        which otherwise waits for the next action.
+        """
+        if self.executor:
+            self.executor.close()  # last batch + outstanding terminations
+        self._flush_summary()
+        if self._atexit_hook is not None:
+            atexit.unregister(self._atexit_hook)
+            self._atexit_hook = None
+
     # ----------------------------
     # Helper Methods
     # ----------------------------
@@ -110,6 +206,14 @@ class ActionSimulator:
             elif isinstance(target, dict):
                 pid = target.get("pid", "?")
                 return f"Target PID {pid} {msg}"
+            elif isinstance(getattr(target, "name", None), str):
+                return f"{target.name} (PID {target.pid}) {msg}"  # ProcessManager.Process records
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             return f"Process ended {msg}"
         return f"Unknown target {msg}"
+
+
+def _flush_summary_at_exit(ref):
+    simulator = ref()
+    if simulator is not None:
+        simulator._flush_summary()
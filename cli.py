@@ -0,0 +1,282 @@
+# cli.py
+"""
+Headless firewall CLI for cron jobs and health checks.
+
+    python cli.py sweep  [--rules FILE] [--mode all|first_match] [--apply] [--trace FILE]
+    python cli.py watch  [--rules FILE] [--interval SECONDS] [--count N] [--apply] [--serve [SOCKET]]
+                         [--ship HOST:PORT] [--trace FILE]
+    python cli.py query  [--pid PID] [--rule-id ID] [--action ACTION] [--limit N]
+    python cli.py analyze [LOG ...] [--workers N] [--top N]
+
+Every subcommand streams NDJSON (one JSON object per line) to stdout and imports
+only the modules it needs — no tkinter, no GUI, no snapshot/replay machinery.
+"""
+import argparse
+import json
+import sys
+import time
+
+from profiling import profiler, span
+
+RECHECK_WAIT = 2.0  # seconds a one-shot sweep waits for in-flight exe hashes / DNS lookups before re-checking
+
+
+def emit(record):
+    """Write one NDJSON line and flush so consumers see decisions immediately."""
+    sys.stdout.write(json.dumps(record, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def _decision(kind, target, rule):
+    if kind == "process":
+        target = getattr(target, "info", target)  # attrs prefetched by process_iter
+    get = target.get if isinstance(target, dict) else lambda attr: getattr(target, attr, None)
+    record = {"ts": time.time(), "kind": kind, "pid": get("pid"),
+              "rule_id": rule.get("id"), "rule_type": rule.get("type"),
+              "rule_value": rule.get("value"), "action": rule.get("action")}
+    if kind == "process":
+        record["name"] = get("name")
+    else:
+        record.update(local_ip=get("local_ip"), local_port=get("local_port"),
+                      remote_ip=get("remote_ip"), remote_port=get("remote_port"), status=get("status"))
+    return record
+
+
+class Sweeper:
+    """One RuleEngine + ConnectionTracker reused across sweeps (watch keeps lifetimes and rates)."""
+
+    def __init__(self, rules_file, mode, apply, keep_tree=False, ship=None):
+        from rule_engine import RULE_SCOPES, RuleEngine
+        from connection_tracker import ConnectionTracker
+
+        self.engine = RuleEngine(rules_file, mode=mode) if rules_file else RuleEngine(mode=mode)
+        self.tracker = ConnectionTracker()
+        self.pm = None
+        if keep_tree or any(r.get("scope", "self") in RULE_SCOPES[1:] for r in self.engine.rules):
+            from process_manager import ProcessManager
+            self.pm = ProcessManager()
+            self.engine.set_process_tree(self.pm)
+        self.simulator = None
+        self.executor = None
+        self.logger = None
+        self.shipper = None
+        if apply or ship:
+            from action_simulator import ActionSimulator
+            from logger import FirewallLogger
+            if apply:
+                from enforcement import NftablesExecutor
+                self.executor = NftablesExecutor()  # batched per sweep; enforcement.DRY_RUN guards it
+            self.logger = FirewallLogger()
+            self.simulator = ActionSimulator(self.logger, executor=self.executor, output="silent")
+            if ship:
+                from log_shipping import DecisionShipper
+                host, _, port = ship.rpartition(":")
+                self.shipper = DecisionShipper(host or "127.0.0.1", int(port)).attach(self.logger).start()
+
+    def sweep(self, recheck_wait=0.0):
+        """
+        Yield (key, kind, target, matched_rules) for every live target, processes first,
+        then again for targets re-checked by rechecks(recheck_wait).
+        """
+        import psutil
+        from target_index import target_key
+
+        if self.pm is not None:
+            with span("update_processes"):
+                self.pm.update_processes()
+        with span("update_resources"):
+            self.engine.update_resources()  # resource rules (rss_mb_gt, cpu_percent_gt, ...)
+        with span("match_processes"):
+            for proc in psutil.process_iter(["pid", "name", "username"]):
+                try:
+                    matched = self.engine.match_process(proc)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+                yield target_key("proc", proc), "process", proc, matched
+
+        with span("fetch_connections"):
+            self.tracker.fetch_connections()
+        with span("observe_connections"):
+            self.engine.observe_connections(self.tracker.drain_new_connections())
+        with span("match_connections", count=len(self.tracker.connections)):
+            for conn in self.tracker.connections:
+                yield target_key("conn", conn), "connection", conn, self.engine.match_connection(conn)
+        with span("rechecks"):
+            yield from self.rechecks(recheck_wait)
+
+    def rechecks(self, wait=0.0):
+        """
+        Re-evaluate processes whose executable hash was still being computed, and connections
+        whose remote IP was still being reverse-resolved, when they were matched (after waiting
+        up to `wait` seconds for the hashes and lookups in flight).
+        """
+        import psutil
+        from target_index import target_key
+
+        if wait:
+            self.engine.wait_pending(wait)
+        for pid in sorted(self.engine.pending_rechecks()):
+            try:
+                proc = psutil.Process(pid)
+                proc.info = proc.as_dict(["pid", "name", "username"])
+                matched = self.engine.match_process(proc)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            yield target_key("proc", proc), "process", proc, matched
+        for ip in sorted(self.engine.pending_dns_rechecks()):
+            for conn in self.tracker.connections_to_ip(ip):
+                yield target_key("conn", conn), "connection", conn, self.engine.match_connection(conn)
+
+    def apply(self, target, rule):
+        if self.simulator is not None:
+            self.simulator.apply_action(target, rule)
+
+    def flush(self):
+        if self.simulator is not None:
+            with span("flush_actions"):
+                self.simulator.flush()
+
+    def close(self):
+        if self.simulator is not None:
+            self.simulator.close()  # also closes the executor: last batch + outstanding terminations
+        if self.logger is not None:
+            self.logger.close()
+        if self.shipper is not None:
+            self.shipper.close()
+
+
+def cmd_sweep(args):
+    sweeper = Sweeper(args.rules, args.mode, args.apply)
+    if args.trace:
+        profiler.trace_next_sweep(args.trace)
+    emitted = {}  # key -> rule ids already emitted (re-checked targets repeat earlier matches)
+    try:
+        with profiler.sweep():
+            for key, kind, target, matched in sweeper.sweep(recheck_wait=RECHECK_WAIT):
+                done = emitted.setdefault(key, set())
+                for rule in matched:
+                    if rule.get("id") in done:
+                        continue
+                    done.add(rule.get("id"))
+                    emit(_decision(kind, target, rule))
+                    sweeper.apply(target, rule)
+            sweeper.flush()
+    finally:
+        sweeper.close()
+    return 0
+
+
+def cmd_watch(args):
+    """Repeated sweeps; only targets whose verdict changed since the last sweep are emitted."""
+    sweeper = Sweeper(args.rules, args.mode, args.apply, keep_tree=bool(args.serve), ship=args.ship)
+    profiler.install_signals()
+    if args.trace:
+        profiler.trace_next_sweep(args.trace)
+    server = None
+    if args.serve:
+        from query_api import QueryServer
+        server = QueryServer(sweeper.engine, sweeper.tracker, sweeper.pm, sweeper.simulator, path=args.serve)
+        server.start()
+    try:
+        return _watch_loop(args, sweeper)
+    finally:
+        if server is not None:
+            server.stop()
+        sweeper.close()
+
+
+def _watch_loop(args, sweeper):
+    verdicts = {}
+    cycle = 0
+    while args.count is None or cycle < args.count:
+        started = time.monotonic()
+        seen = {}
+        with profiler.sweep():
+            for key, kind, target, matched in sweeper.sweep():
+                ids = tuple(r.get("id") for r in matched)
+                previous = seen.get(key, verdicts.get(key, ()))  # a re-checked target is seen twice
+                seen[key] = ids
+                if previous == ids:
+                    continue
+                for rule in matched:
+                    emit(_decision(kind, target, rule))
+                    sweeper.apply(target, rule)
+            for key in verdicts.keys() - seen.keys():
+                if verdicts[key]:
+                    emit({"ts": time.time(), "kind": "gone", "key": list(key), "rule_ids": list(verdicts[key])})
+            verdicts = seen
+            sweeper.flush()
+        cycle += 1
+        if args.count is None or cycle < args.count:
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+    return 0
+
+
+def cmd_query(args):
+    from logger import FirewallLogger
+
+    records = FirewallLogger(args.log, sinks_file=None).query_logs(pid=args.pid, rule_id=args.rule_id, action=args.action)
+    for record in records[-args.limit:] if args.limit else records:
+        emit(record)
+    return 0
+
+
+def cmd_analyze(args):
+    from log_analytics import analyze
+
+    emit(analyze(args.paths, args.workers).report(args.top))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless user-level firewall (NDJSON output)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, help_text in (("sweep", cmd_sweep, "evaluate rules once against live targets"),
+                                  ("watch", cmd_watch, "evaluate repeatedly, emitting verdict changes")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--rules", help="rules JSON file (default: rules.json)")
+        p.add_argument("--mode", default="all", choices=("all", "first_match"))
+        p.add_argument("--apply", action="store_true",
+                       help="also apply decisions: logged, and blocks/terminations batched through "
+                            "the nftables executor (enforcement.DRY_RUN keeps it a dry run)")
+        p.add_argument("--trace", metavar="FILE",
+                       help="write a Chrome trace-event JSON of the (first) sweep's stages to FILE")
+        p.set_defaults(func=func)
+        if name == "watch":
+            p.add_argument("--interval", type=float, default=5.0)
+            p.add_argument("--count", type=int, help="stop after N sweeps")
+            p.add_argument("--serve", nargs="?", const="firewall.sock", metavar="SOCKET",
+                           help="serve the query API on a UNIX socket while watching")
+            p.add_argument("--ship", metavar="HOST:PORT",
+                           help="stream decisions to a log_shipping collector (actions are simulated "
+                                "and logged, not enforced, unless --apply is also given)")
+
+    q = sub.add_parser("query", help="stream matching firewall log records")
+    q.add_argument("--log", default="firewall_log.jsonl")
+    q.add_argument("--pid", type=int)
+    q.add_argument("--rule-id")
+    q.add_argument("--action")
+    q.add_argument("--limit", type=int, help="only the last N matching records")
+    q.set_defaults(func=cmd_query)
+
+    a = sub.add_parser("analyze", help="aggregate report over the log and its rotated segment")
+    a.add_argument("paths", nargs="*", help="log files (default: firewall_log.jsonl and .old)")
+    a.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    a.add_argument("--top", type=int, default=10)
+    a.set_defaults(func=cmd_analyze)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        return 0  # consumer (e.g. `head`) went away
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
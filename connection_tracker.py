@@ -1,7 +1,14 @@
 import psutil
 import socket
+import threading
+import time
+from collections import deque
+
+from timing_wheel import TimingWheel
 
 DRY_RUN = True  # safety flag: ensures we never modify or kill connections
+IDLE_TIMEOUT = 30.0  # seconds a socket may go unseen before its lifetime record expires
+MAX_PENDING_NEW = 65536  # newly seen sockets kept until drained (oldest dropped beyond this)
 
 class Connection:
     """Represents a real network connection (safe read-only)."""
@@ -12,6 +19,20 @@ class Connection:
         self.remote_ip = raddr.ip if raddr else None
         self.remote_port = raddr.port if raddr else None
         self.status = status
+        # Lifetime (monotonic seconds), filled in by ConnectionTracker
+        self.first_seen = None
+        self.last_seen = None
+        self.preexisting = False  # already open when tracking started (true open time unknown)
+
+    @property
+    def key(self):
+        return (self.pid, self.local_ip, self.local_port, self.remote_ip, self.remote_port)
+
+    def age(self, now=None):
+        """Seconds since this socket was first seen (0 if untracked)."""
+        if self.first_seen is None:
+            return 0.0
+        return (now if now is not None else time.monotonic()) - self.first_seen
 
     def __str__(self):
         return (f"PID:{self.pid} | Local:{self.local_ip}:{self.local_port} | "
@@ -22,6 +43,18 @@ class ConnectionTracker:
     """Tracks *real* network connections, safely (no destructive actions)."""
     def __init__(self):
         self.connections = []
+        # Hash indexes rebuilt on every fetch → O(1) lookups instead of list scans
+        self.by_port = {}       # local port -> [Connection]
+        self.by_remote_ip = {}  # remote ip  -> [Connection]
+        self.by_pid = {}        # pid        -> [Connection]
+        # Lifetime tracking: socket tuple -> [first_seen, last_seen, preexisting]
+        self.lifetimes = {}
+        self.new_connections = []   # sockets first seen by the latest fetch
+        self._pending_new = deque(maxlen=MAX_PENDING_NEW)  # first seen since the last drain
+        self.idle_timeout = IDLE_TIMEOUT
+        self._wheel = TimingWheel(tick=1.0, start=time.monotonic())
+        self._baseline_done = False
+        self._lifetime_lock = threading.Lock()
 
     def fetch_connections(self):
         """Fetch active and listening sockets from the system."""
@@ -39,6 +72,78 @@ class ConnectionTracker:
             print("⚠️ Some system connections are hidden (access denied).")
         except Exception as e:
             print(f"⚠️ Error while fetching connections: {e}")
+        self._update_lifetimes()
+        self._rebuild_indexes()
+
+    # ----------------------------
+    # Lifetime Tracking
+    # ----------------------------
+    def _update_lifetimes(self):
+        """
+        Stamp first/last-seen on every socket and expire sockets unseen for idle_timeout.
+        Each socket costs O(1): a dict update, plus one timer in the timing wheel
+        that is re-armed lazily only when it fires.
+        """
+        now = time.monotonic()
+        new = []
+        with self._lifetime_lock:
+            for conn in self.connections:
+                key = conn.key
+                record = self.lifetimes.get(key)
+                if record is None:
+                    record = self.lifetimes[key] = [now, now, not self._baseline_done]
+                    self._wheel.schedule(key, now + self.idle_timeout)
+                    new.append(conn)
+                else:
+                    record[1] = now
+                conn.first_seen, conn.last_seen, conn.preexisting = record
+
+            for key in self._wheel.advance(now):
+                record = self.lifetimes.get(key)
+                if record is None:
+                    continue
+                if now - record[1] >= self.idle_timeout:
+                    del self.lifetimes[key]
+                else:
+                    self._wheel.schedule(key, record[1] + self.idle_timeout)
+            self._baseline_done = True
+            self._pending_new.extend(new)
+        self.new_connections = new
+
+    def drain_new_connections(self):
+        """
+        Return (and forget) every socket first seen since the last drain, across all
+        fetches — so callers that don't see every fetch (e.g. rate rules) miss nothing.
+        """
+        with self._lifetime_lock:
+            drained = list(self._pending_new)
+            self._pending_new.clear()
+        return drained
+
+    def _rebuild_indexes(self):
+        by_port, by_remote_ip, by_pid = {}, {}, {}
+        for conn in self.connections:
+            by_port.setdefault(conn.local_port, []).append(conn)
+            if conn.remote_ip:
+                by_remote_ip.setdefault(conn.remote_ip, []).append(conn)
+            by_pid.setdefault(conn.pid, []).append(conn)
+        # Swap in whole dicts so readers on other threads never see a half-built index
+        self.by_port, self.by_remote_ip, self.by_pid = by_port, by_remote_ip, by_pid
+
+    # ----------------------------
+    # Indexed Lookups
+    # ----------------------------
+    def connections_on_port(self, port):
+        """All sockets bound to a local port."""
+        return self.by_port.get(port, [])
+
+    def connections_to_ip(self, ip):
+        """All sockets whose remote end is `ip`."""
+        return self.by_remote_ip.get(ip, [])
+
+    def connections_for_pid(self, pid):
+        """All sockets owned by a process."""
+        return self.by_pid.get(pid, [])
 
     def list_connections(self, limit=25):
         """Display both LISTENING and ESTABLISHED connections."""
@@ -85,7 +190,7 @@ class ConnectionTracker:
 
     def find_owner_of_port(self, port):
         """Find process that owns a given local port (if any)."""
-        matches = [c for c in self.connections if c.local_port == port]
+        matches = self.connections_on_port(port)
         if not matches:
             print(f"No process is currently using port {port}.")
             return
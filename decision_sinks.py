@@ -0,0 +1,322 @@
+import json
+import os
+import queue
+import random
+import socket
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from logger import LOG_FILE, MAX_LOG_SIZE_MB, SINKS_FILE
+
+QUEUE_SIZE = 10000    # records buffered per sink before new ones are dropped
+BATCH_SIZE = 500      # records handed to one write() call
+_STOP = object()
+
+
+class Sink:
+    """
+    One decision output with its own bounded queue and worker thread, so a slow or
+    unreachable destination only ever fills (and then drops from) its own queue —
+    submit() never blocks rule evaluation.
+
+    Per-sink options (also the keys of a sinks.json entry):
+      where:      {field: value or [values]} — only matching records are kept
+      sample:     fraction of the matching records kept (1.0 = all)
+      queue_size: bounded queue length
+    Subclasses implement write(records) for a batch and may override close_resources().
+    """
+
+    type = None
+
+    def __init__(self, name=None, where=None, sample=1.0, queue_size=QUEUE_SIZE):
+        self.name = name or self.type
+        self.where = {field: set(v) if isinstance(v, list) else {v} for field, v in (where or {}).items()}
+        self.sample = float(sample)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.counts = Counter()   # submitted / filtered / sampled_out / dropped / written / errors
+        self._counts_lock = threading.Lock()  # submit() callers and the worker both count
+        self.closing = threading.Event()
+        self._thread = None
+
+    def accepts(self, record):
+        for field, allowed in self.where.items():
+            if record.get(field) not in allowed:
+                return False
+        return True
+
+    def count(self, key, n=1):
+        with self._counts_lock:
+            self.counts[key] += n
+
+    def submit(self, record):
+        """Queue a record if it passes the filter and sampling (never blocks)."""
+        if self.where and not self.accepts(record):
+            outcome = "filtered"
+        elif self.sample < 1.0 and random.random() >= self.sample:
+            outcome = "sampled_out"
+        else:
+            try:
+                self.queue.put_nowait(record)
+                outcome = None
+            except queue.Full:
+                outcome = "dropped"
+        with self._counts_lock:
+            self.counts["submitted"] += 1
+            if outcome is not None:
+                self.counts[outcome] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"sink-{self.name}")
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                try:
+                    self.write(batch)
+                    self.count("written", len(batch))
+                except Exception as e:
+                    self.count("errors")
+                    print(f"⚠️ Sink {self.name} failed to write {len(batch)} record(s): {e}", file=sys.stderr)
+            if stop:
+                break
+        self.close_resources()
+
+    def write(self, records):
+        raise NotImplementedError
+
+    def close_resources(self):
+        pass
+
+    def close(self, timeout=5.0):
+        """Let the worker drain what is queued (for up to `timeout` seconds), then stop it."""
+        if self._thread is None:
+            return
+        self.closing.set()
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def stats(self):
+        with self._counts_lock:
+            counts = dict(self.counts)
+        return {"name": self.name, "type": self.type, "queued": self.queue.qsize(), **counts}
+
+
+class JsonlSink(Sink):
+    """Appends records to a JSONL file, rotating it to <path>.old past max_mb (like FirewallLogger)."""
+
+    type = "jsonl"
+
+    def __init__(self, path=LOG_FILE, max_mb=MAX_LOG_SIZE_MB, **options):
+        super().__init__(**options)
+        self.path = path
+        self.max_bytes = max_mb * 1024 * 1024
+
+    def write(self, records):
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+            size = f.tell()
+        if size > self.max_bytes:
+            os.replace(self.path, f"{self.path}.old")
+            with open(self.path, "w") as f:
+                f.write(f"--- Log rotated on {datetime.now()} ---\n")
+
+
+class SqliteSink(Sink):
+    """
+    Stores records in an indexed log_store.LogStore (same schema the fleet collector uses).
+    Records are numbered per agent, which defaults to "<hostname>:<pid>" so several firewall
+    processes can share one database without their sequence numbers colliding.
+    """
+
+    type = "sqlite"
+
+    def __init__(self, path="decisions.db", agent=None, **options):
+        super().__init__(**options)
+        self.path = path
+        self.agent = agent or f"{socket.gethostname()}:{os.getpid()}"
+        self.store = None
+
+    def write(self, records):
+        if self.store is None:
+            from log_store import LogStore
+            self.store = LogStore(self.path)  # opened on the worker thread that uses it
+        self.store.append(self.agent, self.store.last_seq(self.agent) + 1, records)
+
+    def close_resources(self):
+        if self.store is not None:
+            self.store.close()
+
+
+class SyslogSink(Sink):
+    """
+    RFC 3164 syslog datagrams to the local daemon ("/dev/log") or a "host:port" UDP target.
+    Block/terminate decisions are sent as warnings, everything else as info.
+    """
+
+    type = "syslog"
+    SEVERITY = {"block": 4, "terminate": 4}
+    DEFAULT_SEVERITY = 6
+
+    def __init__(self, address="/dev/log", facility=1, tag="firewall", **options):
+        super().__init__(**options)
+        if ":" in address:
+            host, _, port = address.rpartition(":")
+            self.address = (host, int(port))
+            self.family = socket.AF_INET
+        else:
+            self.address = address
+            self.family = socket.AF_UNIX
+        self.facility = int(facility)
+        self.header = f"{socket.gethostname()} {tag}[{os.getpid()}]:"
+        self.sock = None
+
+    def write(self, records):
+        if self.sock is None:
+            self.sock = socket.socket(self.family, socket.SOCK_DGRAM)
+        stamp = time.strftime("%b %d %H:%M:%S")
+        for record in records:
+            priority = self.facility * 8 + self.SEVERITY.get(record.get("action"), self.DEFAULT_SEVERITY)
+            message = f"<{priority}>{stamp} {self.header} {json.dumps(record, default=str)}"
+            try:
+                self.sock.sendto(message.encode(), self.address)
+            except OSError:
+                self.sock.close()
+                self.sock = None  # reconnect on the next batch (e.g. syslog daemon restarted)
+                raise
+
+    def close_resources(self):
+        if self.sock is not None:
+            self.sock.close()
+
+
+class MemorySink(Sink):
+    """Keeps the most recent `size` records in memory (the GUI's log view reads them from here)."""
+
+    type = "memory"
+
+    def __init__(self, size=1000, **options):
+        super().__init__(**options)
+        self.records = deque(maxlen=size)
+
+    def write(self, records):
+        self.records.extend(records)
+
+    def recent(self, limit=25):
+        return list(self.records)[-limit:]
+
+
+class TcpSink(Sink):
+    """
+    Forwards records as NDJSON over TCP (e.g. to Vector, Fluent Bit or Logstash).
+    While the peer is unreachable the worker retries with backoff; meanwhile only
+    this sink's queue fills up and overflowing records are dropped and counted.
+    """
+
+    type = "tcp"
+
+    def __init__(self, host="127.0.0.1", port=5170, connect_timeout=5.0, max_backoff=30.0, **options):
+        super().__init__(**options)
+        self.host = host
+        self.port = int(port)
+        self.connect_timeout = connect_timeout
+        self.max_backoff = max_backoff
+        self.sock = None
+
+    def write(self, records):
+        payload = "".join(json.dumps(record, default=str) + "\n" for record in records).encode()
+        backoff = 0.5
+        while True:
+            try:
+                if self.sock is None:
+                    self.sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+                self.sock.sendall(payload)
+                return
+            except OSError as e:
+                if self.sock is not None:
+                    self.sock.close()
+                    self.sock = None
+                self.count("reconnects")
+                if self.closing.is_set():
+                    raise  # shutting down: don't wait for the peer
+                print(f"⚠️ Sink {self.name}: {self.host}:{self.port} unreachable ({e}); retrying in {backoff:g}s",
+                      file=sys.stderr)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def close_resources(self):
+        if self.sock is not None:
+            self.sock.close()
+
+
+SINK_TYPES = {cls.type: cls for cls in (JsonlSink, SqliteSink, SyslogSink, MemorySink, TcpSink)}
+
+
+class DecisionRouter:
+    """Fans every decision record out to a set of independently queued sinks."""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def start(self):
+        for sink in self.sinks:
+            sink.start()
+        return self
+
+    def submit(self, record):
+        for sink in self.sinks:
+            sink.submit(record)
+
+    def first(self, sink_type):
+        """The first configured sink of `sink_type`, or None."""
+        return next((sink for sink in self.sinks if sink.type == sink_type), None)
+
+    def stats(self):
+        return [sink.stats() for sink in self.sinks]
+
+    def close(self, timeout=5.0):
+        for sink in self.sinks:
+            sink.close(timeout)
+
+
+def build_sinks(config):
+    """Create sinks from a list of {"type": ..., **options} dicts (the sinks.json format)."""
+    sinks = []
+    for i, entry in enumerate(config):
+        options = dict(entry)
+        sink_type = options.pop("type", None)
+        if sink_type not in SINK_TYPES:
+            raise ValueError(f"sink #{i}: unknown type {sink_type!r} (expected one of {sorted(SINK_TYPES)})")
+        try:
+            sinks.append(SINK_TYPES[sink_type](**options))
+        except TypeError as e:
+            raise ValueError(f"sink #{i} ({sink_type}): {e}") from None
+    return sinks
+
+
+def load_sinks(path=SINKS_FILE):
+    """Build and start a DecisionRouter from a JSON config file; None if the file doesn't exist."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        config = json.load(f)
+    if not isinstance(config, list):
+        raise ValueError(f"{path} must contain a JSON list of sink definitions")
+    return DecisionRouter(build_sinks(config)).start()
@@ -0,0 +1,107 @@
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+POSITIVE_TTL = 300.0   # seconds a resolved hostname is trusted
+NEGATIVE_TTL = 60.0    # seconds a failed lookup is remembered before retrying
+MAX_ENTRIES = 10000    # cached IPs (oldest evicted first)
+MAX_CONCURRENT = 4     # resolver threads; bounds outstanding DNS queries
+
+
+def system_resolver(ip):
+    """Reverse-resolve `ip` with the OS resolver; returns the hostname or None."""
+    try:
+        return socket.gethostbyaddr(ip)[0]
+    except (OSError, UnicodeError):
+        return None
+
+
+class ReverseDNSCache:
+    """
+    Non-blocking reverse-DNS cache for remote IPs.
+    lookup() answers from the cache or returns None ("unknown yet") after queueing
+    one background resolution per IP, however many connections ask for it.
+    Hits are kept for POSITIVE_TTL and failures for NEGATIVE_TTL. IPs resolved
+    since the last drain_ready() are reported so their connections can be re-checked.
+    The resolver is injectable (any callable ip -> hostname or None) for testing.
+    """
+
+    def __init__(self, resolver=system_resolver, max_workers=MAX_CONCURRENT,
+                 positive_ttl=POSITIVE_TTL, negative_ttl=NEGATIVE_TTL, max_entries=MAX_ENTRIES):
+        self.resolver = resolver
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # ip -> (hostname or None, expires_at)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rdns")
+        self._pending = {}   # ip -> Future (request coalescing)
+        self._ready = set()  # ips resolved since the last drain
+
+    # ----------------------------
+    # Lookup
+    # ----------------------------
+    def lookup(self, ip):
+        """Return the cached lowercase hostname for `ip`, or None if unknown/unresolvable."""
+        if not ip:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self.entries.get(ip)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            if ip not in self._pending:
+                self._pending[ip] = self._pool.submit(self._resolve, ip)
+            # An expired entry keeps answering until the refresh lands
+            return entry[0] if entry is not None else None
+
+    def drain_ready(self):
+        """Return (and forget) IPs whose resolution completed since the last call."""
+        with self._lock:
+            ready, self._ready = self._ready, set()
+        return ready
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _resolve(self, ip):
+        try:
+            hostname = self.resolver(ip)
+        except Exception:
+            hostname = None
+        hostname = hostname.rstrip(".").lower() if hostname else None
+        ttl = self.positive_ttl if hostname else self.negative_ttl
+        with self._lock:
+            self._pending.pop(ip, None)
+            previous = self.entries.pop(ip, None)
+            self.entries[ip] = (hostname, time.monotonic() + ttl)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            if (previous[0] if previous else None) != hostname:
+                self._ready.add(ip)
+        return hostname
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+# --- Demo ---
+if __name__ == "__main__":
+    stub = {"192.0.2.10": "mail.example.com.", "192.0.2.20": "tracker.ads.example.net"}
+
+    def stub_resolver(ip):
+        time.sleep(0.2)  # a slow DNS server
+        return stub.get(ip)
+
+    cache = ReverseDNSCache(resolver=stub_resolver)
+    for ip in ("192.0.2.10", "192.0.2.20", "192.0.2.99", "192.0.2.10"):
+        print(f"{ip}: {cache.lookup(ip) or 'unknown yet'}")
+    while cache.pending_count():
+        time.sleep(0.05)
+    print(f"Resolved: {sorted(cache.drain_ready())}")
+    for ip in ("192.0.2.10", "192.0.2.20", "192.0.2.99"):
+        print(f"{ip}: {cache.lookup(ip)}")
+    cache.close()
@@ -0,0 +1,296 @@
+import ipaddress
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+DRY_RUN = True  # Executors only print what they would apply unless this is False
+
+NFT_TABLE = "user_firewall"
+NFT_FAMILY = "inet"
+TERMINATE_TIMEOUT = 3.0  # seconds to wait for SIGTERM before escalating to SIGKILL
+MAX_APPLIED = 65536      # remembered enforced elements per kind before the dedup memory is reset
+
+# Target field a block rule matched on, by rule type; other types (or no rule) block the
+# remote IP if the target has one, else its local port.
+BLOCK_FIELDS = {
+    "port": "local_port",
+    "listen_recent": "local_port",
+    "ip": "remote_ip",
+    "ip_blocklist": "remote_ip",
+    "hostname": "remote_ip",
+    "ip_rate_gt": "remote_ip",
+}
+
+
+class EnforcementExecutor:
+    """
+    Queues block/terminate decisions, deduplicates them, and applies them in batches.
+    Subclasses implement _apply_blocks(); terminations run asynchronously on a
+    small thread pool so a slow-to-exit process never stalls the match loop.
+    Processes are tracked by (pid, create_time), so a reused PID is a new target;
+    entries for exited processes are pruned on each flush. The applied_* sets are
+    only a dedup memory (re-adding an element to an nft set is harmless) and are
+    reset once they grow past MAX_APPLIED.
+    """
+
+    def __init__(self, dry_run=DRY_RUN, max_workers=4, terminate_timeout=TERMINATE_TIMEOUT):
+        self.dry_run = dry_run
+        self.terminate_timeout = terminate_timeout
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="enforce")
+        self._futures = []
+
+        # Pending (deduplicated) decisions for the current sweep
+        self.pending_ipv4 = set()
+        self.pending_ipv6 = set()
+        self.pending_ports = set()
+        self.pending_pids = set()      # (pid, create_time)
+
+        # Already enforced elements, so repeated sweeps don't re-apply them
+        self.applied_ipv4 = set()
+        self.applied_ipv6 = set()
+        self.applied_ports = set()
+        self.terminated_pids = set()   # (pid, create_time)
+
+        self.stats = {"batches": 0, "elements": 0, "terminations": 0, "skipped": 0, "failures": 0}
+
+    # ----------------------------
+    # Queueing
+    # ----------------------------
+    def submit_block(self, target, rule=None):
+        """
+        Queue a block for a connection on the field `rule` matched (see BLOCK_FIELDS):
+        a port rule blocks the local port, an IP rule the remote IP. Returns True if queued.
+        """
+        field = BLOCK_FIELDS.get(rule.get("type")) if rule else None
+        remote_ip = self._field(target, "remote_ip") if field in (None, "remote_ip") else None
+        local_port = self._field(target, "local_port") if field in (None, "local_port") else None
+        with self._lock:
+            if remote_ip:
+                try:
+                    addr = ipaddress.ip_address(remote_ip)
+                except ValueError:
+                    self.stats["skipped"] += 1
+                    return False
+                ip = str(addr)
+                if addr.version == 4 and ip not in self.applied_ipv4:
+                    self.pending_ipv4.add(ip)
+                elif addr.version == 6 and ip not in self.applied_ipv6:
+                    self.pending_ipv6.add(ip)
+                return True
+            if local_port:
+                port = self._port(local_port)
+                if port is None:
+                    self.stats["skipped"] += 1
+                    return False
+                if port not in self.applied_ports:
+                    self.pending_ports.add(port)
+                return True
+            # Process-level blocking has no packet-filter equivalent here
+            self.stats["skipped"] += 1
+            return False
+
+    def submit_terminate(self, target):
+        """Queue a termination for the target's pid. Returns True if queued."""
+        pid = self._field(target, "pid")
+        if not pid:
+            return False
+        create_time = self._field(target, "create_time")
+        if create_time is None:
+            try:
+                create_time = psutil.Process(pid).create_time()
+            except psutil.NoSuchProcess:
+                return False
+            except psutil.AccessDenied:
+                create_time = 0.0
+        key = (pid, create_time)
+        with self._lock:
+            if key not in self.terminated_pids:
+                self.pending_pids.add(key)
+        return True
+
+    # ----------------------------
+    # Batch Application
+    # ----------------------------
+    def flush(self):
+        """
+        Apply all pending decisions as one batch. Returns a summary dict. If the block
+        batch fails it is put back in pending (retried by the next flush), counted in
+        stats["failures"] and reported under summary["error"]; terminations still run.
+        """
+        with self._lock:
+            ipv4, self.pending_ipv4 = self.pending_ipv4, set()
+            ipv6, self.pending_ipv6 = self.pending_ipv6, set()
+            ports, self.pending_ports = self.pending_ports, set()
+            pids, self.pending_pids = self.pending_pids, set()
+
+        summary = {"ipv4": len(ipv4), "ipv6": len(ipv6), "ports": len(ports), "terminations": len(pids)}
+        if ipv4 or ipv6 or ports:
+            try:
+                self._apply_blocks(sorted(ipv4), sorted(ipv6), sorted(ports))
+            except Exception as e:
+                with self._lock:
+                    self.pending_ipv4 |= ipv4
+                    self.pending_ipv6 |= ipv6
+                    self.pending_ports |= ports
+                    self.stats["failures"] += 1
+                summary["error"] = str(e)
+                print(f"⚠️ Enforcement batch failed, will retry on the next flush: {e}", file=sys.stderr)
+            else:
+                with self._lock:
+                    for applied, added in ((self.applied_ipv4, ipv4), (self.applied_ipv6, ipv6),
+                                           (self.applied_ports, ports)):
+                        if len(applied) + len(added) > MAX_APPLIED:
+                            applied.clear()
+                        applied |= added
+                    self.stats["batches"] += 1
+                    self.stats["elements"] += len(ipv4) + len(ipv6) + len(ports)
+
+        live = set(psutil.pids()) if self.terminated_pids else set()
+        with self._lock:
+            # Forget exited processes: bounded memory, and their PIDs may be reused
+            self.terminated_pids = {key for key in self.terminated_pids if key[0] in live}
+            self.terminated_pids |= pids
+            self.stats["terminations"] += len(pids)
+        for pid, create_time in pids:
+            self._futures.append(self._pool.submit(self._terminate, pid, create_time))
+        return summary
+
+    def wait_terminations(self, timeout=None):
+        """Block until queued terminations finish; returns their result strings."""
+        futures, self._futures = self._futures, []
+        return [f.result(timeout=timeout) for f in futures]
+
+    def close(self):
+        self.flush()
+        self._pool.shutdown(wait=True)
+
+    def _apply_blocks(self, ipv4, ipv6, ports):
+        raise NotImplementedError
+
+    def _terminate(self, pid, create_time=None):
+        """SIGTERM, wait up to terminate_timeout, then SIGKILL survivors."""
+        if self.dry_run:
+            return f"PID {pid} would be TERMINATED (dry run)"
+        try:
+            proc = psutil.Process(pid)
+            if create_time and proc.create_time() != create_time:
+                return f"PID {pid} already exited (reused by another process)"
+            proc.terminate()
+            _, alive = psutil.wait_procs([proc], timeout=self.terminate_timeout)
+            for p in alive:
+                p.kill()
+            return f"terminated PID {pid}" + (" (killed after timeout)" if alive else "")
+        except psutil.NoSuchProcess:
+            return f"PID {pid} already exited"
+        except psutil.AccessDenied:
+            return f"termination of PID {pid} denied"
+
+    @staticmethod
+    def _port(value):
+        """A valid port number from `value`, or None."""
+        try:
+            port = int(value)
+        except (TypeError, ValueError):
+            return None
+        return port if 0 < port < 65536 else None
+
+    @staticmethod
+    def _field(target, name):
+        if isinstance(target, dict):
+            return target.get(name)
+        return getattr(target, name, None)
+
+
+class NftablesExecutor(EnforcementExecutor):
+    """
+    Enforces blocks through named nftables sets, one `nft -f -` transaction per flush.
+    Works in an unprivileged user+network namespace for testing, e.g.:
+        unshare -rn python -c "from enforcement import NftablesExecutor; ..."
+    """
+
+    def __init__(self, table=NFT_TABLE, nft_binary="nft", **kwargs):
+        super().__init__(**kwargs)
+        self.table = table
+        self.nft_binary = shutil.which(nft_binary) or nft_binary
+        self._table_ready = False
+        self.last_script = ""
+
+    def setup_script(self):
+        """Table, sets and drop rules; idempotent thanks to `add`."""
+        t = f"{NFT_FAMILY} {self.table}"
+        return "\n".join([
+            f"add table {t}",
+            f"add set {t} blocked_ipv4 {{ type ipv4_addr; flags interval; }}",
+            f"add set {t} blocked_ipv6 {{ type ipv6_addr; flags interval; }}",
+            f"add set {t} blocked_ports {{ type inet_service; }}",
+            f"add chain {t} output {{ type filter hook output priority 0; policy accept; }}",
+            f"add chain {t} input {{ type filter hook input priority 0; policy accept; }}",
+            f"flush chain {t} output",
+            f"flush chain {t} input",
+            f"add rule {t} output ip daddr @blocked_ipv4 drop",
+            f"add rule {t} output ip6 daddr @blocked_ipv6 drop",
+            f"add rule {t} input tcp dport @blocked_ports drop",
+            f"add rule {t} input udp dport @blocked_ports drop",
+        ])
+
+    def batch_script(self, ipv4, ipv6, ports):
+        """One script that adds every pending element to its named set."""
+        t = f"{NFT_FAMILY} {self.table}"
+        lines = [] if self._table_ready else [self.setup_script()]
+        if ipv4:
+            lines.append(f"add element {t} blocked_ipv4 {{ {', '.join(ipv4)} }}")
+        if ipv6:
+            lines.append(f"add element {t} blocked_ipv6 {{ {', '.join(ipv6)} }}")
+        if ports:
+            lines.append(f"add element {t} blocked_ports {{ {', '.join(map(str, ports))} }}")
+        return "\n".join(lines) + "\n"
+
+    def _apply_blocks(self, ipv4, ipv6, ports):
+        script = self.batch_script(ipv4, ipv6, ports)
+        self.last_script = script
+        if self.dry_run:
+            print(f"[DRY RUN] nft transaction: {len(ipv4)} IPv4, {len(ipv6)} IPv6, {len(ports)} ports",
+                  file=sys.stderr)  # stdout may be an NDJSON stream (cli.py)
+            self._table_ready = True
+            return
+        result = subprocess.run([self.nft_binary, "-f", "-"], input=script, text=True,
+                                capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"nft transaction failed: {result.stderr.strip()}")
+        self._table_ready = True
+
+
+class RecordingExecutor(EnforcementExecutor):
+    """Fake executor for tests: records each batch and termination instead of enforcing."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("dry_run", True)
+        super().__init__(**kwargs)
+        self.batches = []
+        self.terminations = []
+
+    def _apply_blocks(self, ipv4, ipv6, ports):
+        self.batches.append({"ipv4": list(ipv4), "ipv6": list(ipv6), "ports": list(ports)})
+
+    def _terminate(self, pid, create_time=None):
+        self.terminations.append(pid)
+        return f"PID {pid} termination recorded"
+
+
+# --- Safe Demo ---
+if __name__ == "__main__":
+    import time
+
+    executor = NftablesExecutor(dry_run=True)
+    started = time.perf_counter()
+    for i in range(10_000):
+        executor.submit_block({"remote_ip": f"10.{i // 65536}.{(i // 256) % 256}.{i % 256}"})
+    summary = executor.flush()
+    print(f"Queued and flushed 10k blocks in {(time.perf_counter() - started) * 1000:.1f} ms: {summary}")
+    print(executor.last_script[:300] + "...")
+    executor.close()
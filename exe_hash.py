@@ -0,0 +1,169 @@
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_CACHE_FILE = "exe_hash_cache.json"
+HASH_CHUNK_SIZE = 1024 * 1024   # streamed reads, never the whole binary in memory
+SAVE_EVERY = 32                 # persist after this many newly computed hashes
+
+
+def file_key(path):
+    """(st_dev, st_ino, st_size, st_mtime_ns) as a string; changes whenever the file does."""
+    return stat_key(os.stat(path))
+
+
+def stat_key(st):
+    return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def sha256_file(path, key=None):
+    """Hex digest of `path`; with `key`, None if the opened file no longer has that file_key()."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if key is not None and stat_key(os.fstat(f.fileno())) != key:
+            return None
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def running_exe(pid):
+    """/proc/<pid>/exe: opens the inode the process is running even if its path now names another file."""
+    path = f"/proc/{pid}/exe"
+    return path if pid is not None and os.path.exists(path) else None
+
+
+class ExeHashCache:
+    """
+    Persistent SHA-256 cache for executables, keyed by inode identity + size + mtime.
+    Unknown files are hashed on a background thread pool; lookup() never blocks.
+    A pid that asked for a pending hash is reported once by drain_ready() so the
+    caller can re-evaluate it deterministically when the hash is known.
+    With a pid, the running binary is hashed through /proc/<pid>/exe, so a file
+    replaced on disk after the process started can't lend it its digest. Files that
+    can't be read are remembered (in memory, by the same key) and not retried.
+    """
+
+    def __init__(self, cache_file=HASH_CACHE_FILE, max_workers=2):
+        self.cache_file = cache_file
+        self.hashes = self._load()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exe-hash")
+        self._pending = {}    # key -> Future (one hash job per file, however many pids ask)
+        self._waiting = {}    # key -> {pids waiting for this hash}
+        self._ready = set()   # pids whose hash finished since the last drain
+        self.failed = set()   # keys of files that could not be hashed
+        self._unsaved = 0
+        atexit.register(self.save)
+
+    # ----------------------------
+    # Lookup
+    # ----------------------------
+    def lookup(self, path, pid=None):
+        """Return the hex digest of `path`, or None if it is unreadable or still being hashed."""
+        sources = [src for src in (running_exe(pid), path) if src]
+        key = None
+        for src in sources:
+            try:
+                key = file_key(src)
+                break
+            except OSError:
+                continue
+        if key is None:
+            return None
+
+        with self._lock:
+            digest = self.hashes.get(key)
+            if digest is not None or key in self.failed:
+                return digest
+            if pid is not None:
+                self._waiting.setdefault(key, set()).add(pid)
+            if key not in self._pending:
+                self._pending[key] = self._pool.submit(self._hash, sources, key)
+        return None
+
+    def drain_ready(self):
+        """Return (and forget) pids whose pending hashes have completed."""
+        with self._lock:
+            ready, self._ready = self._ready, set()
+        return ready
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _hash(self, sources, key):
+        digest = None
+        for src in sources:  # the /proc link dies with its process; the path may since be another file
+            try:
+                digest = sha256_file(src, key)
+            except OSError:
+                continue
+            if digest is not None:
+                break
+        with self._lock:
+            self._pending.pop(key, None)
+            waiting = self._waiting.pop(key, set())
+            if digest is None:
+                self.failed.add(key)
+                return None
+            self.hashes[key] = digest
+            self._ready |= waiting
+            self._unsaved += 1
+            should_save = self._unsaved >= SAVE_EVERY
+        if should_save:
+            self.save()
+        return digest
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+    def _load(self):
+        try:
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def save(self):
+        """Atomically write the cache (temp file + rename) so a crash can't corrupt it."""
+        with self._lock:
+            if not self._unsaved:
+                return
+            snapshot = dict(self.hashes)
+            self._unsaved = 0
+        directory = os.path.dirname(os.path.abspath(self.cache_file))
+        fd, tmp = tempfile.mkstemp(prefix=".exe_hash_", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            print(f"⚠️ Failed to save hash cache: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.save()
+
+
+# --- Demo ---
+if __name__ == "__main__":
+    import sys
+    import time
+
+    cache = ExeHashCache()
+    path = sys.executable
+    digest = cache.lookup(path, pid=os.getpid())
+    print(f"First lookup of {path}: {digest or 'pending'}")
+    if digest is None:
+        while not cache.drain_ready():
+            time.sleep(0.01)
+        print(f"Ready: {cache.lookup(path)}")
+    cache.close()
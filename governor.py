@@ -0,0 +1,173 @@
+import os
+import random
+import time
+from collections import deque
+
+import psutil
+
+CPU_BUDGET = 2.0          # percent of one core the firewall may use on average
+HOST_BUSY_PERCENT = 80.0  # host CPU above this → back off regardless of our own usage
+HOST_IDLE_PERCENT = 30.0  # host CPU below this (and us under budget) → allowed to speed up
+BACKOFF_FACTOR = 1.5
+SPEEDUP_FACTOR = 1.25
+MAX_COLLECT_EVERY = 8     # while backing off, full process/connection listings at most every Nth cycle
+
+
+class HostCPU:
+    """
+    Host-wide CPU percent since the previous percent() call, from psutil.cpu_times() deltas.
+    Each caller keeps its own instance: psutil.cpu_percent(interval=None) shares one
+    baseline between all callers, so two of them skew each other's readings.
+    """
+
+    def __init__(self):
+        self._last = psutil.cpu_times()
+
+    @staticmethod
+    def _split(times):
+        # guest time is already counted in user/nice on Linux
+        total = sum(times) - getattr(times, "guest", 0.0) - getattr(times, "guest_nice", 0.0)
+        idle = times.idle + getattr(times, "iowait", 0.0)
+        return total, idle
+
+    def percent(self):
+        now = psutil.cpu_times()
+        total, idle = self._split(now)
+        last_total, last_idle = self._split(self._last)
+        self._last = now
+        if total <= last_total:
+            return 0.0
+        busy = (total - last_total) - (idle - last_idle)
+        return max(0.0, min(100.0, busy / (total - last_total) * 100.0))
+
+
+class CPUGovernor:
+    """
+    Keeps the firewall's own CPU use within a budget (percent of one core).
+    Each update() measures our CPU time since the last call plus host load, then
+    scales polling intervals and evaluation batch sizes multiplicatively:
+    back off when over budget or when the host is busy, speed up when both
+    are comfortably idle. Evaluation depth drops from "full" sweeps to random
+    "sampled" batches while backing off, and callers gate their full process and
+    connection listings with due(), which skips cycles (reusing the last listing)
+    as the backoff deepens. Decisions are exposed via metrics().
+    """
+
+    def __init__(self, budget=CPU_BUDGET, metrics_interval=1.0, eval_interval=2.0,
+                 proc_batch=10, conn_batch=5, min_interval=0.5, max_interval=30.0,
+                 max_batch=500):
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_batch = max_batch
+        self.metrics_interval = metrics_interval
+        self.eval_interval = eval_interval
+        self._batches = [float(proc_batch), float(conn_batch)]  # fractional so speedups compound
+        self._collect_every = 1.0   # cycles per full listing (fractional like the batches)
+        self._skipped = {}          # collection name -> cycles skipped since its last listing
+        self.depth = "sampled"    # "full" → every target each cycle, "sampled" → random batches
+        self.state = "steady"     # last decision: backoff / steady / speedup
+        self.own_cpu = 0.0        # percent of one core since the previous update
+        self.host_cpu = 0.0
+        self.adjustments = 0
+        self.decisions = deque(maxlen=100)   # (timestamp, state, own_cpu, host_cpu)
+        self._proc = psutil.Process(os.getpid())
+        self._last_cpu = self._cpu_seconds()
+        self._last_wall = time.monotonic()
+        self._host = HostCPU()
+
+    @property
+    def proc_batch(self):
+        return int(round(self._batches[0]))
+
+    @property
+    def conn_batch(self):
+        return int(round(self._batches[1]))
+
+    @property
+    def collect_every(self):
+        return 1 if self.depth == "full" else int(round(self._collect_every))
+
+    def due(self, name):
+        """Whether collection `name` (e.g. "processes") should take a fresh listing this cycle."""
+        skipped = self._skipped.get(name)
+        if skipped is None or skipped + 1 >= self.collect_every:
+            self._skipped[name] = 0
+            return True
+        self._skipped[name] = skipped + 1
+        return False
+
+    def _cpu_seconds(self):
+        times = self._proc.cpu_times()
+        return times.user + times.system
+
+    def update(self):
+        """Measure usage since the last call and adapt; returns the new state."""
+        now = time.monotonic()
+        cpu = self._cpu_seconds()
+        elapsed = now - self._last_wall
+        if elapsed <= 0:
+            return self.state
+        self.own_cpu = (cpu - self._last_cpu) / elapsed * 100.0
+        self.host_cpu = self._host.percent()
+        self._last_cpu, self._last_wall = cpu, now
+
+        if self.own_cpu > self.budget or self.host_cpu > HOST_BUSY_PERCENT:
+            # Scale by how far over budget we are so a large overshoot recovers quickly
+            factor = max(BACKOFF_FACTOR, min(self.own_cpu / self.budget, 4.0))
+            self._scale(factor)
+            self.depth = "sampled"
+            self.state = "backoff"
+        elif self.own_cpu < self.budget / 2 and self.host_cpu < HOST_IDLE_PERCENT:
+            self._scale(1 / SPEEDUP_FACTOR)
+            if self.eval_interval <= self.min_interval * 2:
+                self.depth = "full"
+            self.state = "speedup"
+        else:
+            self.state = "steady"
+        if self.state != "steady":
+            self.adjustments += 1
+        self.decisions.append((time.time(), self.state, self.own_cpu, self.host_cpu))
+        return self.state
+
+    def _scale(self, factor):
+        """Multiply intervals by `factor` and divide batch sizes by it, within bounds."""
+        def clamp(value, low, high):
+            return max(low, min(high, value))
+        self.metrics_interval = clamp(self.metrics_interval * factor, self.min_interval, self.max_interval)
+        self.eval_interval = clamp(self.eval_interval * factor, self.min_interval, self.max_interval)
+        self._batches = [clamp(batch / factor, 1, self.max_batch) for batch in self._batches]
+        self._collect_every = clamp(self._collect_every * factor, 1, MAX_COLLECT_EVERY)
+
+    def sample(self, targets, batch):
+        """Targets to evaluate this cycle according to the current depth."""
+        if self.depth == "full" or len(targets) <= batch:
+            return list(targets)
+        return random.sample(targets, batch)
+
+    def metrics(self):
+        return {
+            "budget": self.budget,
+            "own_cpu": round(self.own_cpu, 2),
+            "host_cpu": round(self.host_cpu, 1),
+            "state": self.state,
+            "depth": self.depth,
+            "metrics_interval": round(self.metrics_interval, 2),
+            "eval_interval": round(self.eval_interval, 2),
+            "proc_batch": self.proc_batch,
+            "conn_batch": self.conn_batch,
+            "collect_every": self.collect_every,
+            "adjustments": self.adjustments,
+        }
+
+
+# --- Demo ---
+if __name__ == "__main__":
+    gov = CPUGovernor(budget=2.0)
+    for cycle in range(5):
+        busy_until = time.monotonic() + (0.3 if cycle < 2 else 0.0)
+        while time.monotonic() < busy_until:
+            pass  # simulate an expensive sweep
+        time.sleep(0.5)
+        gov.update()
+        print(gov.metrics())
@@ -0,0 +1,284 @@
+import hashlib
+import ipaddress
+import mmap
+import os
+import socket
+import struct
+import tempfile
+from array import array
+from bisect import bisect_right
+
+BLOCKLIST_CACHE_DIR = ".blocklist_cache"
+CACHE_MAGIC = b"FWBL"
+CACHE_VERSION = 2   # 2: IPv4-mapped IPv6 feed entries are stored as IPv4
+# magic, version, ipv4 range count, ipv6 range count, feed signature (sha256), padding → 64 bytes
+HEADER = struct.Struct("<4sIQQ32s8x")
+IPV4_MAPPED_PREFIX = 0xFFFF << 32   # ::ffff:0:0/96
+
+
+# ----------------------------
+# Feed Parsing
+# ----------------------------
+def _ipv4_to_int(text):
+    return int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+
+
+def parse_entry(token):
+    """
+    Parse one feed entry into (version, first_int, last_int) or None.
+    Accepts single addresses, CIDRs and "first-last" ranges.
+    """
+    token = token.strip().strip('"')
+    if not token:
+        return None
+    try:
+        # Fast path for the common case (plain IPv4 / IPv4 CIDR) — ipaddress is ~10x slower
+        if ":" not in token and "-" not in token:
+            if "/" in token:
+                addr, prefix = token.split("/", 1)
+                prefix = int(prefix)
+                if not 0 <= prefix <= 32:
+                    return None
+                host_bits = 32 - prefix
+                first = (_ipv4_to_int(addr) >> host_bits) << host_bits
+                return 4, first, first | ((1 << host_bits) - 1)
+            n = _ipv4_to_int(token)
+            return 4, n, n
+        if "-" in token and "/" not in token:
+            first, last = (ipaddress.ip_address(part.strip()) for part in token.split("-", 1))
+            if first.version != last.version or int(last) < int(first):
+                return None
+            return _unmap_ipv4(first.version, int(first), int(last))
+        net = ipaddress.ip_network(token, strict=False)
+        return _unmap_ipv4(net.version, int(net.network_address), int(net.broadcast_address))
+    except (ValueError, OSError):
+        return None
+
+
+def _unmap_ipv4(version, first, last):
+    """Store an IPv4-mapped IPv6 range (::ffff:a.b.c.d) as IPv4, where lookups of such addresses go."""
+    if version == 6 and first >> 32 == last >> 32 == IPV4_MAPPED_PREFIX >> 32:
+        return 4, first & 0xFFFFFFFF, last & 0xFFFFFFFF
+    return version, first, last
+
+
+def iter_feed(path):
+    """Stream entries from a plain-text or CSV feed (first column), skipping comments/headers."""
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            line = line.split("#", 1)[0].split(";", 1)[0].strip()
+            if not line:
+                continue
+            entry = parse_entry(line.split(",", 1)[0].split()[0])
+            if entry is not None:
+                yield entry
+
+
+def merge_ranges(sorted_pairs, firsts, lasts):
+    """Merge sorted (first, last) pairs that overlap or touch into the given sequences."""
+    for first, last in sorted_pairs:
+        if lasts and first <= lasts[-1] + 1:
+            if last > lasts[-1]:
+                lasts[-1] = last
+        else:
+            firsts.append(first)
+            lasts.append(last)
+    return firsts, lasts
+
+
+class _U128View:
+    """Sequence view joining (hi, lo) uint64 arrays into 128-bit ints, for bisect."""
+
+    def __init__(self, hi, lo):
+        self.hi, self.lo = hi, lo
+
+    def __len__(self):
+        return len(self.hi)
+
+    def __getitem__(self, i):
+        return (self.hi[i] << 64) | self.lo[i]
+
+
+class IPBlocklist:
+    """
+    Bulk IP blocklist for threat-intel feeds with millions of entries.
+    IPv4 is stored as sorted, merged uint32 range arrays; IPv6 as uint64 hi/lo pairs.
+    The compiled arrays live in an on-disk cache that is memory-mapped, so startup
+    does not reparse feeds and lookups are an O(log n) bisect with no copies.
+    """
+
+    def __init__(self, feeds, name=None, cache_dir=BLOCKLIST_CACHE_DIR):
+        self.feeds = [feeds] if isinstance(feeds, str) else list(feeds)
+        self.name = name or hashlib.sha1("|".join(sorted(self.feeds)).encode()).hexdigest()[:12]
+        self.cache_dir = cache_dir
+        self.cache_path = os.path.join(cache_dir, f"{self.name}.fwbl")
+        self.signature = b""
+        self._mmap = None
+        self._views = []   # memoryviews into _mmap; released before it is closed
+        self._v4_first = self._v4_last = array("I")
+        self._v6_first = self._v6_last = _U128View(array("Q"), array("Q"))
+        self.load()
+
+    # ----------------------------
+    # Lookup
+    # ----------------------------
+    def __contains__(self, ip):
+        if not ip:
+            return False
+        try:
+            if ":" in ip:
+                n = int.from_bytes(socket.inet_pton(socket.AF_INET6, ip.split("%", 1)[0]), "big")
+                v4 = n >> 32 == IPV4_MAPPED_PREFIX >> 32   # ::ffff:a.b.c.d is the IPv4 address
+                if v4:
+                    n &= 0xFFFFFFFF
+            else:
+                n = _ipv4_to_int(ip)
+                v4 = True
+        except (OSError, TypeError):
+            return False
+        for _ in range(2):
+            first, last = (self._v4_first, self._v4_last) if v4 else (self._v6_first, self._v6_last)
+            try:
+                i = bisect_right(first, n) - 1
+                return i >= 0 and n <= last[i]
+            except ValueError:
+                continue  # a concurrent refresh released these arrays; retry on the new ones
+        return False
+
+    def contains(self, ip):
+        return ip in self
+
+    def stats(self):
+        return {"ipv4_ranges": len(self._v4_first), "ipv6_ranges": len(self._v6_first),
+                "cache_bytes": os.path.getsize(self.cache_path) if os.path.exists(self.cache_path) else 0}
+
+    # ----------------------------
+    # Loading & Refresh
+    # ----------------------------
+    def feed_signature(self):
+        """Hash of each feed's path, size and mtime; changes whenever a feed does."""
+        h = hashlib.sha256()
+        for path in sorted(self.feeds):
+            try:
+                st = os.stat(path)
+                h.update(f"{path}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+            except OSError:
+                h.update(f"{path}:missing\n".encode())
+        return h.digest()
+
+    def load(self):
+        """Map the cache if it matches the current feeds, otherwise rebuild it first."""
+        signature = self.feed_signature()
+        if not self._map_cache(signature):
+            self.rebuild(signature)
+
+    def refresh(self):
+        """Rebuild only if a feed changed on disk. Returns True if the blocklist was reloaded."""
+        signature = self.feed_signature()
+        if signature == self.signature:
+            return False
+        self.rebuild(signature)
+        return True
+
+    def rebuild(self, signature=None):
+        """Stream-parse all feeds, merge ranges, and atomically replace the on-disk cache."""
+        signature = signature or self.feed_signature()
+        # Pack (first, last) into one uint64 so IPv4 parsing stays compact before sorting
+        v4 = array("Q")
+        v6 = []
+        for path in self.feeds:
+            if not os.path.exists(path):
+                print(f"⚠️ Blocklist feed not found: {path}")
+                continue
+            for version, first, last in iter_feed(path):
+                if version == 4:
+                    v4.append((first << 32) | last)
+                else:
+                    v6.append((first, last))
+
+        v4_first, v4_last = merge_ranges(((x >> 32, x & 0xFFFFFFFF) for x in sorted(v4)),
+                                         array("I"), array("I"))
+        del v4
+        v6_first, v6_last = merge_ranges(sorted(v6), [], [])
+        del v6
+
+        mask64 = (1 << 64) - 1
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".fwbl_", dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(v4_first), len(v6_first), signature))
+            v4_first.tofile(f)
+            v4_last.tofile(f)
+            for values in (v6_first, v6_last):
+                array("Q", (v >> 64 for v in values)).tofile(f)
+                array("Q", (v & mask64 for v in values)).tofile(f)
+        os.replace(tmp, self.cache_path)
+
+        if not self._map_cache(signature):
+            raise RuntimeError(f"Failed to map rebuilt blocklist cache {self.cache_path}")
+        print(f"✅ Blocklist '{self.name}': {len(v4_first)} IPv4 + {len(v6_first)} IPv6 ranges")
+
+    def _map_cache(self, signature):
+        """Memory-map the cache file if it exists and was built from `signature`."""
+        try:
+            with open(self.cache_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < HEADER.size:
+                    return False
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError:
+            return False
+
+        magic, version, n4, n6, sig = HEADER.unpack_from(mm, 0)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION or sig != signature:
+            mm.close()
+            return False
+
+        view = memoryview(mm)
+        off = HEADER.size
+        v4_first = view[off:off + 4 * n4].cast("I")
+        off += 4 * n4
+        v4_last = view[off:off + 4 * n4].cast("I")
+        off += 4 * n4  # 64-byte header + 8 bytes per IPv4 range keeps the IPv6 arrays aligned
+        v6 = []
+        for _ in range(4):
+            v6.append(view[off:off + 8 * n6].cast("Q"))
+            off += 8 * n6
+
+        # Swap in the new arrays in one step, then unmap the previous cache
+        old_mmap, old_views = self._mmap, self._views
+        self._v4_first, self._v4_last = v4_first, v4_last
+        self._v6_first, self._v6_last = _U128View(v6[0], v6[1]), _U128View(v6[2], v6[3])
+        self._mmap = mm
+        self._views = [v4_first, v4_last] + v6 + [view]
+        self.signature = signature
+        self._unmap(old_mmap, old_views)
+        return True
+
+    @staticmethod
+    def _unmap(mm, views):
+        for view in views:
+            view.release()
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:
+                pass  # still exported elsewhere; unmapped once unreferenced
+
+
+# --- Demo ---
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python ip_blocklist.py FEED [FEED ...] [--check IP]")
+        sys.exit(1)
+    args = sys.argv[1:]
+    check = args[args.index("--check") + 1] if "--check" in args else None
+    feeds = [a for a in args if a != "--check" and a != check]
+
+    started = time.perf_counter()
+    bl = IPBlocklist(feeds)
+    print(f"Loaded in {(time.perf_counter() - started) * 1000:.1f} ms: {bl.stats()}")
+    if check:
+        print(f"{check} blocked: {check in bl}")
@@ -0,0 +1,222 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import socket
+import tempfile
+import time
+
+import psutil
+
+DEFAULT_PORT_BASE = 20000
+DEFAULT_PORTS_PER_WORKER = 500
+
+
+# ----------------------------
+# Socket Churn Workers
+# ----------------------------
+def churn_worker(events, stop, proto, port_base, port_count, rate, hold):
+    """
+    Open and close sockets on 127.0.0.1 at `rate` sockets/sec.
+    Every open and close is reported as (kind, port, wall_time) so the harness
+    can measure detection latency and missed targets.
+    """
+    sock_type = socket.SOCK_STREAM if proto == "tcp" else socket.SOCK_DGRAM
+    open_socks = []  # (close_deadline, port, socket)
+    next_port = 0
+    period = 1.0 / rate if rate > 0 else 0.0
+    next_open = time.time()
+
+    try:
+        while not stop.is_set():
+            now = time.time()
+
+            # Close sockets whose hold time has passed
+            while open_socks and open_socks[0][0] <= now:
+                _, port, s = open_socks.pop(0)
+                s.close()
+                events.put(("close", port, time.time()))
+
+            if now >= next_open:
+                port = port_base + next_port
+                next_port = (next_port + 1) % port_count
+                s = socket.socket(socket.AF_INET, sock_type)
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                try:
+                    s.bind(("127.0.0.1", port))
+                    if proto == "tcp":
+                        s.listen(1)
+                except OSError:
+                    s.close()  # port still in use by another process, skip it
+                else:
+                    events.put(("open", port, time.time()))
+                    open_socks.append((time.time() + hold, port, s))
+                next_open += period
+                continue
+
+            time.sleep(min(next_open - now, 0.005))
+    finally:
+        for _, port, s in open_socks:
+            s.close()
+            events.put(("close", port, time.time()))
+
+
+# ----------------------------
+# Harness
+# ----------------------------
+class LoadHarness:
+    """End-to-end soak test: real socket churn → ConnectionTracker → RuleEngine → ActionSimulator → log."""
+
+    def __init__(self, tcp_workers=2, udp_workers=1, rate=50.0, hold=2.0,
+                 port_base=DEFAULT_PORT_BASE, ports_per_worker=DEFAULT_PORTS_PER_WORKER):
+        self.tcp_workers = tcp_workers
+        self.udp_workers = udp_workers
+        self.rate = rate
+        self.hold = hold
+        self.port_base = port_base
+        self.ports_per_worker = ports_per_worker
+        self.workdir = tempfile.mkdtemp(prefix="fw_soak_")
+
+        self.pending = {}        # port -> open wall time (not yet decided)
+        self.latencies = []
+        self.opened = 0
+        self.detected = 0
+        self.missed = 0
+        self.sweeps = 0
+        self.sweep_time = 0.0
+
+    def _write_rules(self):
+        """One port rule per harness port, so every churned socket should get a decision."""
+        total = (self.tcp_workers + self.udp_workers) * self.ports_per_worker
+        rules = [{"id": f"soak_{p}", "type": "port", "value": str(p), "action": "block"}
+                 for p in range(self.port_base, self.port_base + total)]
+        path = os.path.join(self.workdir, "rules.json")
+        with open(path, "w") as f:
+            json.dump(rules, f)
+        return path
+
+    def _drain_events(self, events):
+        while True:
+            try:
+                kind, port, ts = events.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "open":
+                self.opened += 1
+                self.pending[port] = ts
+            elif port in self.pending:
+                # Socket closed before the firewall ever decided on it
+                del self.pending[port]
+                self.missed += 1
+
+    def _sweep(self, ct, engine, simulator):
+        started = time.perf_counter()
+        ct.fetch_connections()
+        for conn in ct.connections:
+            for rule in engine.match_connection(conn):
+                simulator.apply_action(conn, rule)
+                opened_at = self.pending.pop(conn.local_port, None)
+                if opened_at is not None:
+                    self.latencies.append(time.time() - opened_at)
+                    self.detected += 1
+        self.sweeps += 1
+        self.sweep_time += time.perf_counter() - started
+
+    def run(self, duration=10.0, sweep_interval=0.1, show_actions=False):
+        from connection_tracker import ConnectionTracker
+        from rule_engine import RuleEngine
+        from action_simulator import ActionSimulator
+        from logger import FirewallLogger
+
+        ct = ConnectionTracker()
+        engine = RuleEngine(self._write_rules())
+        simulator = ActionSimulator(FirewallLogger(os.path.join(self.workdir, "firewall_log.jsonl")),
+                                    output="action" if show_actions else "silent")
+
+        events = mp.Queue()
+        stop = mp.Event()
+        workers = []
+        slot = 0
+        for proto, count in (("tcp", self.tcp_workers), ("udp", self.udp_workers)):
+            for _ in range(count):
+                base = self.port_base + slot * self.ports_per_worker
+                workers.append(mp.Process(target=churn_worker, daemon=True, args=(
+                    events, stop, proto, base, self.ports_per_worker, self.rate, self.hold)))
+                slot += 1
+        for w in workers:
+            w.start()
+
+        me = psutil.Process()
+        cpu_before = me.cpu_times()
+        peak_rss = me.memory_info().rss
+        wall_start = time.time()
+
+        print(f"🔥 Soak test: {len(workers)} workers × {self.rate:.0f} sockets/s for {duration:.0f}s "
+              f"(logs in {self.workdir})")
+        while time.time() - wall_start < duration:
+            self._drain_events(events)
+            self._sweep(ct, engine, simulator)
+            peak_rss = max(peak_rss, me.memory_info().rss)
+            time.sleep(sweep_interval)
+
+        stop.set()
+        for w in workers:
+            w.join(timeout=5)
+        self._drain_events(events)
+
+        wall = time.time() - wall_start
+        cpu_after = me.cpu_times()
+        cpu_used = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+        return self.report(wall, cpu_used, peak_rss)
+
+    def report(self, wall, cpu_used, peak_rss):
+        lat = sorted(self.latencies)
+
+        def pct(p):
+            return lat[min(len(lat) - 1, int(p / 100 * len(lat)))] * 1000 if lat else 0.0
+
+        return {
+            "opened": self.opened,
+            "detected": self.detected,
+            "missed": self.missed,
+            "undecided": len(self.pending),
+            "latency_ms": {"p50": pct(50), "p95": pct(95), "p99": pct(99),
+                           "max": lat[-1] * 1000 if lat else 0.0},
+            "sweeps": self.sweeps,
+            "avg_sweep_ms": (self.sweep_time / self.sweeps * 1000) if self.sweeps else 0.0,
+            "firewall_cpu_percent": cpu_used / wall * 100 if wall > 0 else 0.0,
+            "peak_rss_mb": peak_rss / (1024 * 1024),
+        }
+
+
+def print_report(r):
+    print("\n--- Soak Test Report ---")
+    print(f"Sockets opened: {r['opened']} | Detected: {r['detected']} | "
+          f"Missed: {r['missed']} | Undecided: {r['undecided']}")
+    lat = r["latency_ms"]
+    print(f"Detection latency (open → decision logged): p50 {lat['p50']:.1f} ms | "
+          f"p95 {lat['p95']:.1f} ms | p99 {lat['p99']:.1f} ms | max {lat['max']:.1f} ms")
+    print(f"Sweeps: {r['sweeps']} | Avg sweep: {r['avg_sweep_ms']:.2f} ms")
+    print(f"Firewall CPU: {r['firewall_cpu_percent']:.1f}% of one core | Peak RSS: {r['peak_rss_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Localhost socket churn soak test for the firewall loop")
+    parser.add_argument("--tcp-workers", type=int, default=2)
+    parser.add_argument("--udp-workers", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=50.0, help="sockets opened per second per worker")
+    parser.add_argument("--hold", type=float, default=2.0, help="seconds each socket stays open")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--sweep-interval", type=float, default=0.1)
+    parser.add_argument("--port-base", type=int, default=DEFAULT_PORT_BASE)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--show-actions", action="store_true", help="keep per-action console output")
+    args = parser.parse_args()
+
+    harness = LoadHarness(args.tcp_workers, args.udp_workers, args.rate, args.hold, args.port_base)
+    result = harness.run(args.duration, args.sweep_interval, args.show_actions)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
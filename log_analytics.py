@@ -0,0 +1,164 @@
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+try:  # optional, several times faster than the stdlib decoder
+    import orjson
+    _loads = orjson.loads
+    JSON_DECODER = "orjson"
+except ImportError:
+    _loads = json.loads
+    JSON_DECODER = "json"
+
+from logger import LOG_FILE
+
+CHUNK_BYTES = 32 * 1024 * 1024   # byte range parsed by one worker task
+READ_BUFFER = 1024 * 1024
+
+
+def log_segments(log_file=LOG_FILE):
+    """The live log plus its rotated segment (FirewallLogger rotates to <log>.old), oldest first."""
+    return [path for path in (f"{log_file}.old", log_file) if os.path.exists(path)]
+
+
+def plan_chunks(paths, chunk_bytes=CHUNK_BYTES):
+    """Split files into (path, start, end) byte ranges; workers align them to line boundaries."""
+    chunks = []
+    for path in paths:
+        size = os.path.getsize(path)
+        for start in range(0, size, chunk_bytes):
+            chunks.append((path, start, min(start + chunk_bytes, size)))
+    return chunks
+
+
+class LogStats:
+    """Mergeable aggregate over decision records; partial results from workers are combined with merge()."""
+
+    def __init__(self):
+        self.records = 0
+        self.malformed = 0
+        self.rules = Counter()
+        self.processes = Counter()
+        self.actions = Counter()
+        self.per_hour = Counter()     # "YYYY-MM-DD HH" -> decisions
+        self.first = None
+        self.last = None
+
+    def add(self, record):
+        self.records += 1
+        self.rules[str(record.get("rule_id"))] += 1
+        self.processes[record.get("process_name") or "Unknown"] += 1
+        self.actions[record.get("action")] += 1
+        timestamp = record.get("timestamp")
+        if timestamp:
+            self.per_hour[timestamp[:13]] += 1
+            if self.first is None or timestamp < self.first:
+                self.first = timestamp
+            if self.last is None or timestamp > self.last:
+                self.last = timestamp
+
+    def merge(self, other):
+        self.records += other.records
+        self.malformed += other.malformed
+        self.rules.update(other.rules)
+        self.processes.update(other.processes)
+        self.actions.update(other.actions)
+        self.per_hour.update(other.per_hour)
+        for stamp in (other.first, other.last):
+            if stamp is not None:
+                self.first = stamp if self.first is None or stamp < self.first else self.first
+                self.last = stamp if self.last is None or stamp > self.last else self.last
+        return self
+
+    def report(self, top=10):
+        return {
+            "records": self.records,
+            "malformed": self.malformed,
+            "first": self.first,
+            "last": self.last,
+            "actions": dict(self.actions),
+            "top_rules": self.rules.most_common(top),
+            "top_processes": self.processes.most_common(top),
+            "per_hour": dict(sorted(self.per_hour.items())),
+        }
+
+
+def analyze_chunk(chunk):
+    """
+    Parse the records of one byte range. A line belongs to the chunk its first byte
+    falls in, so every line is counted exactly once across chunks. Memory is bounded
+    by the read buffer, not the chunk size.
+    """
+    path, start, end = chunk
+    stats = LogStats()
+    with open(path, "rb", buffering=READ_BUFFER) as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # finish the line that started in the previous chunk
+        pos = f.tell()
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            if not line.startswith(b"{"):
+                continue  # rotation markers and blank lines
+            try:
+                record = _loads(line)
+            except ValueError:
+                stats.malformed += 1
+                continue
+            stats.add(record)
+    return stats
+
+
+def analyze(paths=None, workers=None, chunk_bytes=CHUNK_BYTES):
+    """Aggregate every record in `paths` (default: live + rotated log) using a process pool."""
+    paths = paths or log_segments()
+    chunks = plan_chunks(paths, chunk_bytes)
+    total = LogStats()
+    if len(chunks) <= 1 or workers == 1:
+        for chunk in chunks:
+            total.merge(analyze_chunk(chunk))  # not worth a pool's startup cost
+        return total
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for partial in pool.map(analyze_chunk, chunks):
+            total.merge(partial)
+    return total
+
+
+def print_report(report):
+    print(f"\n📈 {report['records']} decisions ({report['malformed']} malformed lines) "
+          f"from {report['first']} to {report['last']}")
+    print("Actions: " + ", ".join(f"{action}={count}" for action, count in report["actions"].items()))
+    print("\nTop rules:")
+    for rule_id, count in report["top_rules"]:
+        print(f"  {rule_id:<20}{count}")
+    print("\nTop processes:")
+    for name, count in report["top_processes"]:
+        print(f"  {name:<30}{count}")
+    print("\nDecisions per hour:")
+    for hour, count in report["per_hour"].items():
+        print(f"  {hour}:00  {count}")
+
+
+# --- Demo ---
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Parallel analytics over firewall JSONL logs")
+    parser.add_argument("paths", nargs="*", help=f"log files (default: {LOG_FILE} and its rotated segment)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="emit the report as one JSON object")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = analyze(args.paths, args.workers).report(args.top)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print_report(report)
+        print(f"\n[{time.perf_counter() - started:.2f}s, decoder: {JSON_DECODER}]")
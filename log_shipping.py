@@ -0,0 +1,540 @@
+import asyncio
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+COLLECTOR_PORT = 9555
+SPOOL_DIR = ".decision_spool"
+SEGMENT_BYTES = 4 * 1024 * 1024   # spool segment size before rolling to a new file
+BATCH_RECORDS = 2000              # records per frame at most
+BATCH_DELAY = 0.05                # seconds to wait for more records before sending a short frame
+MAX_IN_FLIGHT = 8                 # unacknowledged frames per connection
+COMPRESS_MIN_BYTES = 1024
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+RECONNECT_MAX_DELAY = 30.0
+SYNC_INTERVAL = 0.05              # seconds between group commits (fsyncs) of the spool
+
+# payload length, flags, first sequence number, record count
+FRAME = struct.Struct("!IBQI")
+ACK = struct.Struct("!Q")
+FLAG_COMPRESSED = 0x01
+FLAG_HELLO = 0x02
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_frame(lines, first_seq=0, flags=0, compress=True):
+    """Length-prefixed frame; the payload is newline-joined JSON records, zlib'd when worthwhile."""
+    payload = b"\n".join(lines)
+    if compress and len(payload) >= COMPRESS_MIN_BYTES:
+        payload = zlib.compress(payload, 1)
+        flags |= FLAG_COMPRESSED
+    return FRAME.pack(len(payload), flags, first_seq, len(lines)) + payload
+
+
+def decode_payload(flags, payload):
+    if flags & FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+    return payload.split(b"\n") if payload else []
+
+
+def decode_records(flags, payload, count):
+    """
+    Decode a record frame into exactly `count` dicts plus the number that were malformed.
+    A record that isn't a JSON object, or every record of an undecodable frame, becomes a
+    {"malformed": ...} placeholder so sequence numbers stay aligned and the frame can be acked.
+    """
+    try:
+        lines = decode_payload(flags, payload)
+    except zlib.error as e:
+        return [{"malformed": f"undecodable frame: {e}"}] * count, count
+    if len(lines) != count:
+        reason = f"frame declares {count} records but carries {len(lines)}"
+        return [{"malformed": reason}] * count, count
+    records, bad = [], 0
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            record = {"malformed": line[:200].decode("utf-8", "replace")}
+            bad += 1
+        records.append(record)
+    return records, bad
+
+
+# ----------------------------
+# Agent Side: Spool
+# ----------------------------
+class Spool:
+    """
+    Append-only on-disk queue of NDJSON records in numbered segment files
+    (<first seq>.ndjson). Every record is spooled before it is sent, so records
+    survive collector outages and agent restarts; acknowledged segments are deleted.
+    append() only writes; sync() fsyncs everything appended so far in one group
+    commit (a no-op with fsync=False). A record torn by a crash mid-write is cut
+    off when the spool is reopened.
+    """
+
+    def __init__(self, directory=SPOOL_DIR, fsync=True):
+        self.directory = directory
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Condition()
+        self.acked = self._load_acked()
+        segments = self.segments()
+        if segments:
+            first = segments[-1]
+            self.next_seq = first + self._recover(self._path(first))
+        else:
+            self.next_seq = self.acked + 1
+        self._synced_seq = self.next_seq   # records below this are on stable storage
+        self._rolled = []                  # finished segments still awaiting their fsync
+        self._segment_first = segments[-1] if segments else self.next_seq
+        self._file = open(self._path(self._segment_first), "ab")
+
+    @staticmethod
+    def _recover(path):
+        """Truncate a segment to its last complete line (a torn tail would swallow the next record)."""
+        count = good = 0
+        with open(path, "rb+") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                count += 1
+                good += len(line)
+            if f.seek(0, os.SEEK_END) != good:
+                f.truncate(good)
+                f.flush()
+                os.fsync(f.fileno())
+        return count
+
+    def _path(self, first_seq):
+        return os.path.join(self.directory, f"{first_seq:020d}.ndjson")
+
+    def segments(self):
+        return sorted(int(name.split(".")[0]) for name in os.listdir(self.directory)
+                      if name.endswith(".ndjson"))
+
+    def append(self, line):
+        """Spool one encoded record; returns its sequence number."""
+        with self.lock:
+            if self._file.tell() >= SEGMENT_BYTES:
+                if self.fsync:
+                    self._file.flush()
+                    self._rolled.append(self._file)  # closed by the next sync(), after its fsync
+                else:
+                    self._file.close()
+                self._segment_first = self.next_seq
+                self._file = open(self._path(self._segment_first), "ab")
+            self._file.write(line + b"\n")
+            seq = self.next_seq
+            self.next_seq += 1
+            self.lock.notify_all()
+            return seq
+
+    def flush(self):
+        with self.lock:
+            self._file.flush()
+
+    def sync(self):
+        """Group commit: fsync every record appended so far (appends continue meanwhile)."""
+        if not self.fsync:
+            return
+        with self.lock:
+            seq = self.next_seq
+            if seq <= self._synced_seq:
+                return
+            self._file.flush()
+            fd = os.dup(self._file.fileno())  # stays valid if the segment rolls mid-fsync
+            rolled, self._rolled = self._rolled, []
+        try:
+            for f in rolled:
+                os.fsync(f.fileno())
+                f.close()
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        with self.lock:
+            self._synced_seq = max(self._synced_seq, seq)
+
+    def wait_for(self, seq, timeout):
+        """Block until record `seq` has been spooled or `timeout` passes."""
+        with self.lock:
+            if self.next_seq <= seq:
+                self.lock.wait(timeout)
+            self._file.flush()
+            return self.next_seq > seq
+
+    def restart_at(self, seq):
+        """Continue numbering at `seq` in a fresh segment (records already spooled keep their numbers)."""
+        self.sync()
+        with self.lock:
+            self._file.close()
+            if os.path.getsize(self._path(self._segment_first)) == 0:
+                os.remove(self._path(self._segment_first))
+            self.next_seq = self._segment_first = self._synced_seq = seq
+            self._file = open(self._path(seq), "ab")
+
+    def reader(self, start_seq):
+        return SpoolReader(self, start_seq)
+
+    # ----------------------------
+    # Acknowledgements
+    # ----------------------------
+    def _load_acked(self):
+        try:
+            with open(os.path.join(self.directory, "acked"), "r") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def ack(self, seq):
+        """Record that the collector has stored everything up to `seq`; drop finished segments."""
+        with self.lock:
+            if seq <= self.acked:
+                return
+            self.acked = seq
+            current = self._segment_first
+        tmp = os.path.join(self.directory, "acked.tmp")
+        with open(tmp, "w") as f:
+            f.write(str(seq))
+        os.replace(tmp, os.path.join(self.directory, "acked"))
+        segments = self.segments()
+        for first, following in zip(segments, segments[1:]):
+            if following - 1 <= seq and first != current:
+                try:
+                    os.remove(self._path(first))
+                except OSError:
+                    pass
+
+    def close(self):
+        self.sync()
+        with self.lock:
+            self._file.close()
+
+
+class SpoolReader:
+    """Sequential reader over spool segments starting at a given sequence number."""
+
+    def __init__(self, spool, start_seq):
+        self.spool = spool
+        self.seq = start_seq     # next sequence number to return
+        self._file = None
+        self._segment = None
+        self._partial = b""
+
+    def _open(self):
+        segments = self.spool.segments()
+        if not segments:
+            return False
+        if segments[0] > self.seq:
+            self.seq = segments[0]  # older records were already acknowledged and dropped
+        segments = [first for first in segments if first <= self.seq]
+        self._segment = segments[-1]
+        self._file = open(self.spool._path(self._segment), "rb")
+        for _ in range(self.seq - self._segment):  # only on (re)connect: skip to the resume point
+            self._file.readline()
+        return True
+
+    def read_batch(self, max_records=BATCH_RECORDS, timeout=BATCH_DELAY):
+        """Return (first_seq, lines) with up to max_records spooled records; waits up to `timeout`."""
+        if not self.spool.wait_for(self.seq, timeout):
+            return self.seq, []
+        if self._file is None and not self._open():
+            return self.seq, []
+        first = self.seq
+        lines = []
+        while len(lines) < max_records and self.seq < self.spool.next_seq:
+            line = self._file.readline()
+            if not line.endswith(b"\n"):
+                self._partial += line
+                if self._next_segment_ready():
+                    continue
+                break
+            lines.append(self._partial + line[:-1])
+            self._partial = b""
+            self.seq += 1
+        return first, lines
+
+    def _next_segment_ready(self):
+        """At the end of a finished segment, move on to the next one."""
+        later = [first for first in self.spool.segments() if first > self._segment]
+        if not later or later[0] != self.seq:
+            return False
+        self._file.close()
+        self._segment = later[0]
+        self._file = open(self.spool._path(self._segment), "rb")
+        self._partial = b""
+        return True
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+# ----------------------------
+# Agent Side: Shipper
+# ----------------------------
+class DecisionShipper:
+    """
+    Streams decision records to a collector over TCP.
+    Attach it to a FirewallLogger (attach()) or call submit() directly. Records
+    are spooled to disk first, then sent in batched, optionally compressed,
+    length-prefixed frames with up to MAX_IN_FLIGHT frames awaiting acknowledgement.
+    submit() never waits on the disk: the shipper thread fsyncs the spool once per
+    batch before sending it, and every SYNC_INTERVAL while it can't send.
+    On reconnect the collector reports the last sequence it stored, and the
+    shipper resumes from the spool right after it.
+    """
+
+    def __init__(self, host="127.0.0.1", port=COLLECTOR_PORT, agent_id=None,
+                 spool_dir=SPOOL_DIR, compress=True, fsync=True):
+        self.address = (host, port)
+        self.agent_id = agent_id or socket.gethostname()
+        self.compress = compress
+        self.spool = Spool(spool_dir, fsync=fsync)
+        self.connected = False
+        self.frames_sent = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._acked = threading.Condition()
+
+    def attach(self, logger):
+        logger.add_listener(self.submit)
+        return self
+
+    def submit(self, record):
+        self.spool.append(json.dumps(record, default=str).encode())
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="decision-shipper")
+        self._thread.start()
+        return self
+
+    def close(self, timeout=5.0):
+        """Try to deliver what is spooled for up to `timeout` seconds, then stop (the rest stays spooled)."""
+        deadline = time.monotonic() + timeout
+        while self.connected and self.spool.acked < self.spool.next_seq - 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self.spool.close()
+
+    def backlog(self):
+        return self.spool.next_seq - 1 - self.spool.acked
+
+    def _run(self):
+        delay = 0.5
+        while not self._stop.is_set():
+            try:
+                sock = socket.create_connection(self.address, timeout=5.0)
+            except OSError:
+                self._idle(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            delay = 0.5
+            try:
+                self._session(sock)
+            except (OSError, ProtocolError) as e:
+                if not self._stop.is_set():
+                    print(f"⚠️ Collector connection lost ({e}); {self.backlog()} record(s) spooled",
+                          file=sys.stderr)
+            finally:
+                self.connected = False
+                sock.close()
+
+    def _idle(self, seconds):
+        """Wait out a reconnect delay, still group-committing what gets spooled meanwhile."""
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set():
+            self.spool.sync()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._stop.wait(min(SYNC_INTERVAL, remaining))
+
+    def _session(self, sock):
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        hello = json.dumps({"agent": self.agent_id}).encode()
+        sock.sendall(encode_frame([hello], flags=FLAG_HELLO, compress=False))
+        resume = ACK.unpack(_recv_exact(sock, ACK.size))[0]
+        if resume >= self.spool.next_seq:
+            # The collector is ahead of our spool (e.g. the spool was wiped): continue its numbering
+            print(f"⚠️ Collector has records up to {resume}; renumbering spool from {resume + 1}",
+                  file=sys.stderr)
+            self.spool.restart_at(resume + 1)
+        self.spool.ack(resume)
+        self.connected = True
+
+        acked = [resume]
+        ack_thread = threading.Thread(target=self._read_acks, args=(sock, acked), daemon=True)
+        ack_thread.start()
+        reader = self.spool.reader(acked[0] + 1)
+        in_flight = []   # last seq of each unacknowledged frame
+        try:
+            while not self._stop.is_set() and ack_thread.is_alive():
+                with self._acked:
+                    while in_flight and in_flight[0] <= acked[0]:
+                        in_flight.pop(0)
+                    full = len(in_flight) >= MAX_IN_FLIGHT
+                    if full:
+                        self._acked.wait(SYNC_INTERVAL)
+                if full:
+                    self.spool.sync()
+                    continue
+                first, lines = reader.read_batch()
+                self.spool.sync()   # one fsync covers the whole batch (and anything spooled since)
+                if not lines:
+                    continue
+                sock.sendall(encode_frame(lines, first, compress=self.compress))
+                in_flight.append(first + len(lines) - 1)
+                self.frames_sent += 1
+        finally:
+            reader.close()
+            if self._stop.is_set():
+                sock.shutdown(socket.SHUT_RDWR)  # unblocks the ack reader
+
+    def _read_acks(self, sock, acked):
+        try:
+            while True:
+                seq = ACK.unpack(_recv_exact(sock, ACK.size))[0]
+                self.spool.ack(seq)
+                with self._acked:
+                    acked[0] = seq
+                    self._acked.notify_all()
+        except (OSError, ProtocolError):
+            pass
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ProtocolError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+# ----------------------------
+# Collector Side
+# ----------------------------
+class Collector:
+    """
+    Receives frames from many agents and merges them into a LogStore.
+    Connections are served by asyncio; SQLite writes run on one dedicated thread so
+    slow commits never stall socket reads. Each frame is acknowledged only after
+    its records are committed.
+    """
+
+    def __init__(self, store, host="127.0.0.1", port=COLLECTOR_PORT):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.records_received = 0
+        self.records_malformed = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-store")
+        self._server = None
+
+    async def serve(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"✅ Collector listening on {self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        peer = writer.get_extra_info("peername")
+        agent = None
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(FRAME.size)
+                except asyncio.IncompleteReadError:
+                    break
+                length, flags, first_seq, count = FRAME.unpack(header)
+                if length > MAX_FRAME_BYTES:
+                    raise ProtocolError(f"frame of {length} bytes exceeds limit")
+                payload = await reader.readexactly(length)
+
+                if flags & FLAG_HELLO:
+                    agent = json.loads(decode_payload(flags, payload)[0])["agent"]
+                    last = await loop.run_in_executor(self._writer, self.store.last_seq, agent)
+                    writer.write(ACK.pack(last))
+                    await writer.drain()
+                    continue
+                if agent is None:
+                    raise ProtocolError("records received before hello")
+
+                # Malformed records are stored as placeholders and acked rather than dropping the
+                # agent: it would only resend the same frame on every reconnect
+                records, bad = decode_records(flags, payload, count)
+                if bad:
+                    self.records_malformed += bad
+                    print(f"⚠️ Agent {agent}: {bad} malformed record(s) in frame {first_seq}-{first_seq + count - 1}",
+                          file=sys.stderr)
+                last = await loop.run_in_executor(self._writer, self.store.append, agent, first_seq, records)
+                self.records_received += len(records)
+                writer.write(ACK.pack(last))
+                await writer.drain()
+        except (ProtocolError, ValueError, zlib.error) as e:
+            print(f"⚠️ Dropping agent {agent or peer}: {e}")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+# --- Demo / localhost benchmark ---
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Decision log shipping (agent → collector)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    c = sub.add_parser("collector", help="run a collector")
+    c.add_argument("--host", default="127.0.0.1")
+    c.add_argument("--port", type=int, default=COLLECTOR_PORT)
+    c.add_argument("--db", default="fleet_log.db")
+    b = sub.add_parser("bench", help="ship synthetic decisions to a collector and report throughput")
+    b.add_argument("--host", default="127.0.0.1")
+    b.add_argument("--port", type=int, default=COLLECTOR_PORT)
+    b.add_argument("--records", type=int, default=100000)
+    b.add_argument("--agent", default=None)
+    b.add_argument("--spool", default=SPOOL_DIR)
+    args = parser.parse_args()
+
+    if args.command == "collector":
+        from log_store import LogStore
+        try:
+            asyncio.run(Collector(LogStore(args.db), args.host, args.port).serve())
+        except KeyboardInterrupt:
+            pass
+    else:
+        shipper = DecisionShipper(args.host, args.port, agent_id=args.agent, spool_dir=args.spool).start()
+        started = time.perf_counter()
+        for i in range(args.records):
+            shipper.submit({"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "dry_run": True,
+                            "pid": 1000 + i % 500, "process_name": "bench", "rule_id": f"r{i % 7}",
+                            "action": "block", "result": "simulated"})
+        submitted = time.perf_counter() - started
+        while shipper.backlog() and time.perf_counter() - started < 120:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        print(f"Submitted {args.records} in {submitted:.2f}s; delivered in {elapsed:.2f}s "
+              f"({args.records / elapsed:,.0f} decisions/sec, {shipper.frames_sent} frames, "
+              f"backlog {shipper.backlog()})")
+        shipper.close()
@@ -0,0 +1,107 @@
+import json
+import sqlite3
+import threading
+
+LOG_STORE_FILE = "fleet_log.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id           INTEGER PRIMARY KEY,
+    agent        TEXT    NOT NULL,
+    seq          INTEGER NOT NULL,
+    timestamp    TEXT,
+    pid          INTEGER,
+    process_name TEXT,
+    rule_id      TEXT,
+    action       TEXT,
+    result       TEXT,
+    record       TEXT    NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS decisions_agent_seq ON decisions (agent, seq);
+CREATE INDEX IF NOT EXISTS decisions_pid ON decisions (pid);
+CREATE INDEX IF NOT EXISTS decisions_rule ON decisions (rule_id);
+CREATE INDEX IF NOT EXISTS decisions_action ON decisions (action);
+CREATE INDEX IF NOT EXISTS decisions_time ON decisions (timestamp);
+CREATE TABLE IF NOT EXISTS agents (
+    agent    TEXT PRIMARY KEY,
+    last_seq INTEGER NOT NULL
+);
+"""
+
+
+class LogStore:
+    """
+    Indexed SQLite store for decision records merged from many agents.
+    Each record is keyed by (agent, seq) so replays after a reconnect are ignored,
+    and agents.last_seq lets an agent resume exactly where the store left off.
+    Queries mirror FirewallLogger.query_logs but use indexes instead of a file scan.
+    """
+
+    def __init__(self, path=LOG_STORE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+
+    def last_seq(self, agent):
+        """Highest sequence number stored for `agent` (0 if none)."""
+        with self._lock:
+            row = self.db.execute("SELECT last_seq FROM agents WHERE agent = ?", (agent,)).fetchone()
+        return row[0] if row else 0
+
+    def append(self, agent, first_seq, records):
+        """
+        Store records numbered first_seq, first_seq + 1, ... in one transaction.
+        Records at or below the agent's last_seq are skipped. Returns the new last_seq.
+        """
+        with self._lock:
+            row = self.db.execute("SELECT last_seq FROM agents WHERE agent = ?", (agent,)).fetchone()
+            last = row[0] if row else 0
+            skip = max(0, last - first_seq + 1)
+            rows = []
+            for seq, record in enumerate(records[skip:], start=first_seq + skip):
+                rule_id = record.get("rule_id")
+                rows.append((agent, seq, record.get("timestamp"), record.get("pid"),
+                             record.get("process_name"), None if rule_id is None else str(rule_id),
+                             record.get("action"), record.get("result"), json.dumps(record)))
+            if not rows:
+                return last
+            new_last = first_seq + len(records) - 1
+            with self.db:
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO decisions (agent, seq, timestamp, pid, process_name, rule_id, "
+                    "action, result, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.db.execute("INSERT INTO agents (agent, last_seq) VALUES (?, ?) "
+                                "ON CONFLICT(agent) DO UPDATE SET last_seq = excluded.last_seq",
+                                (agent, new_last))
+            return new_last
+
+    def query(self, pid=None, rule_id=None, action=None, agent=None, limit=100):
+        """Most recent matching records (newest last), like FirewallLogger.query_logs."""
+        clauses, params = [], []
+        for column, value in (("pid", pid), ("rule_id", rule_id), ("action", action), ("agent", agent)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(str(value) if column == "rule_id" else value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT agent, record FROM decisions {where} ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self.db.execute(sql, (*params, limit)).fetchall()
+        records = []
+        for agent_name, raw in reversed(rows):
+            record = json.loads(raw)
+            record["agent"] = agent_name
+            records.append(record)
+        return records
+
+    def stats(self):
+        with self._lock:
+            total = self.db.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+            agents = dict(self.db.execute("SELECT agent, last_seq FROM agents").fetchall())
+        return {"records": total, "agents": agents}
+
+    def close(self):
+        with self._lock:
+            self.db.close()
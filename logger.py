@@ -4,6 +4,7 @@ from datetime import datetime
 import psutil
 
 LOG_FILE = "firewall_log.jsonl"
+SINKS_FILE = "sinks.json"  # optional decision sink configuration (see decision_sinks.py)
 MAX_LOG_SIZE_MB = 5  # Auto-rotate if exceeds this size
 DRY_RUN = True       # Reflects system-wide safe mode
 
@@ -11,8 +12,15 @@ DRY_RUN = True       # Reflects system-wide safe mode
 class FirewallLogger:
     """Structured, safe logging of all firewall-like actions and rule decisions."""
 
-    def __init__(self, log_file=LOG_FILE):
+    def __init__(self, log_file=LOG_FILE, sinks_file=SINKS_FILE):
         self.log_file = log_file
+        self.listeners = []  # callables receiving each decision record (e.g. log shipping)
+        # With a sinks file, decisions fan out to its queued sinks instead of being
+        # appended to log_file synchronously
+        self.sinks = None
+        if sinks_file and os.path.exists(sinks_file):
+            from decision_sinks import load_sinks
+            self.sinks = load_sinks(sinks_file)
         # Ensure the log file exists
         if not os.path.exists(self.log_file):
             with open(self.log_file, "w") as f:
@@ -27,7 +35,27 @@ class FirewallLogger:
         Log an action/decision taken on a target (process or connection).
         Includes process name, connection info, and DRY_RUN mode awareness.
         """
-        record = {
+        record = self.build_record(target, rule, result)
+
+        if self.sinks is not None:
+            self.sinks.submit(record)  # queued per sink; never blocks on I/O
+        else:
+            # Write JSONL entry
+            try:
+                with open(self.log_file, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            except Exception as e:
+                print(f"⚠️ Failed to write log: {e}")
+
+        for listener in self.listeners:
+            try:
+                listener(record)
+            except Exception as e:
+                print(f"⚠️ Log listener failed: {e}")
+
+    def build_record(self, target=None, rule=None, result=None):
+        """The structured decision record written to the log and handed to sinks/listeners."""
+        return {
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "dry_run": DRY_RUN,
             "pid": getattr(target, "pid", None),
@@ -43,12 +71,9 @@ class FirewallLogger:
             "result": result or "simulated_action"
         }
 
-        # Write JSONL entry
-        try:
-            with open(self.log_file, "a") as f:
-                f.write(json.dumps(record) + "\n")
-        except Exception as e:
-            print(f"⚠️ Failed to write log: {e}")
+    def add_listener(self, callback):
+        """Call `callback(record)` for every decision logged from now on."""
+        self.listeners.append(callback)
 
     # ----------------------------
     # Query Utilities
@@ -74,16 +99,27 @@ class FirewallLogger:
             return []
         return records
 
+    def recent(self, limit=25):
+        """Most recent records: from an in-memory sink when one is configured, else from the log file."""
+        memory = self.sinks.first("memory") if self.sinks is not None else None
+        if memory is not None:
+            return memory.recent(limit)
+        return self.query_logs()[-limit:]
+
     def show_recent_logs(self, limit=10):
         """Display the most recent 'limit' logs."""
-        records = self.query_logs()
         print("\n--- Recent Firewall Logs ---")
-        for rec in records[-limit:]:
+        for rec in self.recent(limit):
             dry = "(DRY RUN)" if rec.get("dry_run") else ""
             pname = rec.get("process_name") or "Unknown"
             print(f"{rec['timestamp']} | {pname} (PID {rec['pid']}) | "
                   f"Rule {rec['rule_id']} | Action: {rec['action']} | Result: {rec['result']} {dry}")
 
+    def close(self):
+        """Drain and stop the configured sinks (no-op without a sinks file)."""
+        if self.sinks is not None:
+            self.sinks.close()
+
     # ----------------------------
     # Internal helpers
     # ----------------------------
@@ -96,6 +132,8 @@ class FirewallLogger:
                 return target.process_name
             elif isinstance(target, dict):
                 return target.get("name", None)
+            elif isinstance(getattr(target, "name", None), str):
+                return target.name  # ProcessManager.Process records
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             return None
         return None
@@ -1,10 +1,10 @@
 # main.py
-import psutil
 from process_manager import ProcessManager
 from connection_tracker import ConnectionTracker
 from rule_engine import RuleEngine
 from action_simulator import ActionSimulator
 from logger import FirewallLogger
+from pipeline import FirewallPipeline
 
 def main():
     print("\n=== USER-LEVEL FIREWALL (REAL-TIME SAFE DEMONSTRATION) ===")
@@ -16,38 +16,32 @@ def main():
     logger = FirewallLogger()    # Structured JSONL logger
     act = ActionSimulator(logger)  # Injects logger into ActionSimulator
 
-    # --- Step 2: Fetch real processes ---
+    # --- Step 2: Load and list rules ---
+    print("\n--- LOADED RULES ---")
+    re.list_rules()
+    re.report_rule_issues()
+    re.set_process_tree(pm)  # resolves "descendants"/"ancestors" rule scopes
+
+    # --- Step 3: Apply rules to one consistent snapshot of processes and connections ---
+    # collector → normalizer → matcher → action executor → log sink, joined by bounded queues
+    print("\n--- APPLYING RULES (PIPELINE) ---")
+    pipeline = FirewallPipeline(re, ct, act, logger, process_manager=pm)
+    for stage in pipeline.run(count=1, recheck_wait=2.0):  # + pending exe hashes / DNS names
+        print(f"  {stage['stage']:<12} in={stage.get('in', 0):<6} out={stage.get('out', 0):<6} "
+              f"busy={stage['busy_ms']:.1f} ms")
+
+    # --- Step 4: Show the snapshot the rules were applied to ---
     print("\n--- ACTIVE SYSTEM PROCESSES (TOP 25) ---")
-    pm.show_processes()  # already implemented with psutil in new ProcessManager
-
-    # --- Step 3: Fetch and show real network connections ---
+    pm.show_processes()
     print("\n--- ACTIVE NETWORK CONNECTIONS ---")
-    ct.fetch_connections()
     ct.list_connections()
 
-    # --- Step 4: Load and list rules ---
-    print("\n--- LOADED RULES ---")
-    re.list_rules()
-
-    # --- Step 5: Apply rules to real processes ---
-    print("\n--- APPLYING RULES TO PROCESSES ---")
-    for proc in psutil.process_iter(['pid', 'name', 'username']):
-        matched_rules = re.match_process(proc)
-        for rule in matched_rules:
-            act.apply_action(proc, rule)  # ActionSimulator handles logging now
-
-    # --- Step 6: Apply rules to real connections ---
-    print("\n--- APPLYING RULES TO NETWORK CONNECTIONS ---")
-    ct.fetch_connections()
-    for conn in ct.connections:
-        matched_rules = re.match_connection(conn)
-        for rule in matched_rules:
-            act.apply_action(conn, rule)
-
-    # --- Step 7: Show summary logs ---
+    # --- Step 5: Show summary logs ---
     print("\n--- ACTION SUMMARY ---")
+    act.close()  # prints a pending "summary"-mode group; flushes any queued enforcement
     act.show_action_log()
 
+    logger.close()  # drain queued decision sinks (sinks.json), if configured
     print("\n--- RECENT FIREWALL LOG ENTRIES ---")
     logger.show_recent_logs()
 
@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+METRICS_FILE = "metrics.rrd"
+METRICS = ("cpu", "memory", "firewall_cpu", "processes", "connections", "rule_eval_ms")
+# (seconds per bucket, buckets kept): 1s for 1 hour, 1m for 1 day, 1h for 30 days
+RESOLUTIONS = ((1, 3600), (60, 1440), (3600, 720))
+FLUSH_INTERVAL = 10.0     # seconds between msync of the mapped file
+MAGIC = b"FWRRD001"
+HEADER_BYTES = 4096
+# Per bucket and metric: min, max, sum, count (avg = sum / count)
+MIN, MAX, SUM, COUNT = range(4)
+
+
+class _Level:
+    """One resolution: bucket start stamps plus (slots, metrics, 4) aggregates, both memory-mapped views."""
+
+    def __init__(self, buffer, offset, step, slots, n_metrics):
+        self.step = step
+        self.slots = slots
+        self.stamps = np.ndarray((slots,), dtype=np.int64, buffer=buffer, offset=offset)
+        offset += self.stamps.nbytes
+        self.data = np.ndarray((slots, n_metrics, 4), dtype=np.float64, buffer=buffer, offset=offset)
+        self.nbytes = self.stamps.nbytes + self.data.nbytes
+
+    @staticmethod
+    def size(slots, n_metrics):
+        return slots * 8 + slots * n_metrics * 4 * 8
+
+
+class MetricsStore:
+    """
+    RRD-style store for host and firewall metrics.
+    Every resolution is a fixed-size NumPy ring buffer inside one memory-mapped
+    file, so its size never grows, history survives restarts, and reads index the
+    mapping directly with no parsing. Each sample updates the current bucket of
+    every resolution in place (min/max/sum/count), which is the 1s → 1m → 1h
+    rollup; a bucket is reset when its ring slot is reused for a newer period.
+    """
+
+    def __init__(self, path=METRICS_FILE, metrics=METRICS, resolutions=RESOLUTIONS):
+        self.path = path
+        self.metrics = tuple(metrics)
+        self.index = {name: i for i, name in enumerate(self.metrics)}
+        self.resolutions = tuple(tuple(r) for r in resolutions)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._map()
+
+    # ----------------------------
+    # File Layout
+    # ----------------------------
+    def _layout(self):
+        return f"{','.join(self.metrics)}|{self.resolutions}".encode()
+
+    def _map(self):
+        layout = self._layout()
+        size = HEADER_BYTES + sum(_Level.size(slots, len(self.metrics)) for _, slots in self.resolutions)
+        fresh = True
+        if os.path.exists(self.path) and os.path.getsize(self.path) == size:
+            with open(self.path, "rb") as f:
+                header = f.read(HEADER_BYTES)
+            fresh = not (header.startswith(MAGIC) and header[8:8 + len(layout)] == layout)
+        if fresh:
+            # New file, or metrics/resolutions changed: start an empty store of the right shape
+            with open(self.path, "wb") as f:
+                f.truncate(size)
+        self.mm = np.memmap(self.path, dtype=np.uint8, mode="r+", shape=(size,))
+        self.levels = []
+        offset = HEADER_BYTES
+        for step, slots in self.resolutions:
+            level = _Level(self.mm, offset, step, slots, len(self.metrics))
+            offset += level.nbytes
+            self.levels.append(level)
+        if fresh:
+            for level in self.levels:
+                level.stamps[:] = -1
+            self.mm[:len(MAGIC)] = np.frombuffer(MAGIC, dtype=np.uint8)
+            self.mm[8:8 + len(layout)] = np.frombuffer(layout, dtype=np.uint8)
+            self.mm.flush()
+
+    # ----------------------------
+    # Writing
+    # ----------------------------
+    def record(self, values, now=None):
+        """Add one sample ({metric: value}) at `now` (epoch seconds) to every resolution."""
+        now = int(now if now is not None else time.time())
+        columns = [(self.index[name], float(value)) for name, value in values.items()
+                   if name in self.index and value is not None]
+        if not columns:
+            return
+        cols = np.array([c for c, _ in columns])
+        vals = np.array([v for _, v in columns])
+        with self._lock:
+            for level in self.levels:
+                bucket = now // level.step
+                slot = bucket % level.slots
+                row = level.data[slot]
+                if level.stamps[slot] != bucket:
+                    level.stamps[slot] = bucket
+                    row[:, MIN] = np.inf
+                    row[:, MAX] = -np.inf
+                    row[:, SUM] = 0.0
+                    row[:, COUNT] = 0.0
+                row[cols, MIN] = np.minimum(row[cols, MIN], vals)
+                row[cols, MAX] = np.maximum(row[cols, MAX], vals)
+                row[cols, SUM] += vals
+                row[cols, COUNT] += 1
+            if time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+                self.flush()
+
+    def flush(self):
+        self.mm.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+    # ----------------------------
+    # Reading
+    # ----------------------------
+    def _level(self, step):
+        for level in self.levels:
+            if level.step == step:
+                return level
+        raise ValueError(f"No {step}s resolution (have {[s for s, _ in self.resolutions]})")
+
+    def window(self, metric, step=1, count=60, now=None):
+        """
+        The last `count` buckets of `metric` at resolution `step`, oldest first.
+        Returns (bucket_start_times, min, avg, max) arrays; buckets with no samples are NaN.
+        """
+        level = self._level(step)
+        count = min(count, level.slots)
+        col = self.index[metric]
+        last = int(now if now is not None else time.time()) // step
+        buckets = np.arange(last - count + 1, last + 1)
+        slots = buckets % level.slots
+        with self._lock:
+            valid = level.stamps[slots] == buckets
+            rows = level.data[slots, col]
+        counts = np.where(valid, rows[:, COUNT], 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg = np.where(counts > 0, rows[:, SUM] / counts, np.nan)
+        lo = np.where(counts > 0, rows[:, MIN], np.nan)
+        hi = np.where(counts > 0, rows[:, MAX], np.nan)
+        return buckets * step, lo, avg, hi
+
+    def latest(self, metric, step=1, now=None):
+        """Average of `metric` in the current bucket, or None if nothing was recorded yet."""
+        _, _, avg, _ = self.window(metric, step, 1, now)
+        return None if np.isnan(avg[0]) else float(avg[0])
+
+    def summary(self, step=60, count=60, now=None):
+        """{metric: {"min", "avg", "max"}} over the last `count` buckets (for metrics endpoints)."""
+        result = {}
+        for metric in self.metrics:
+            _, lo, avg, hi = self.window(metric, step, count, now)
+            if np.all(np.isnan(avg)):
+                continue
+            result[metric] = {"min": float(np.nanmin(lo)), "avg": float(np.nanmean(avg)),
+                              "max": float(np.nanmax(hi))}
+        return result
+
+
+# --- Demo ---
+if __name__ == "__main__":
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "demo.rrd")
+    store = MetricsStore(path)
+    start = 1_700_000_000
+    for t in range(start, start + 180):
+        store.record({"cpu": 20 + (t % 60), "rule_eval_ms": 0.05}, now=t)
+    store.close()
+
+    reopened = MetricsStore(path)
+    times, lo, avg, hi = reopened.window("cpu", step=60, count=3, now=start + 179)
+    for t, a, b, c in zip(times, lo, avg, hi):
+        print(f"{t}: min={a:.0f} avg={b:.1f} max={c:.0f}")
+    print(f"file size: {os.path.getsize(path)} bytes, summary: {reopened.summary(now=start + 179)}")
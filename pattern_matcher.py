@@ -0,0 +1,140 @@
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+PATTERN_CACHE_FILE = ".pattern_cache.json"
+PATTERN_MODES = ("glob", "regex")
+PATTERN_FLAGS = re.IGNORECASE | re.DOTALL
+_NOT_COMBINABLE = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?[aiLmsux]+\)")
+
+
+def pattern_source(mode, pattern):
+    """
+    Regex source for one rule pattern.
+    Globs must match the whole value ("chrome*" does not match "xchrome");
+    regexes are searched anywhere in the value, like re.search.
+    """
+    if mode == "glob":
+        return r"\A" + fnmatch.translate(pattern)
+    return pattern
+
+
+class CombinedMatcher:
+    """
+    Every glob/regex pattern for one field compiled into a single alternation.
+    One search() rejects a non-matching value no matter how many
+    patterns exist. An alternation only reports the first pattern that hits
+    (its named group, m.lastgroup), so the others are then checked one by one
+    to report *all* matching rules, but only where they still can match: none
+    of them matched before the hit's position, and anchored globs can only
+    match at position 0, after the hit in alternation order.
+    """
+
+    def __init__(self, sources):
+        # sources: list of (pattern_index, regex_source)
+        self.sources = []
+        # Backreferences, named groups and inline global flags change meaning once
+        # embedded in a larger pattern, so those are checked on their own.
+        self.standalone = []
+        for index, src in sources:
+            (self.standalone if _NOT_COMBINABLE.search(src) else self.sources).append((index, src))
+        combined = "|".join(f"(?P<p{index}>{src})" for index, src in self.sources) if self.sources else r"(?!)"
+        try:
+            self._combined = re.compile(combined, PATTERN_FLAGS)
+        except re.error:
+            self.standalone += self.sources
+            self.sources = []
+            self._combined = re.compile(r"(?!)")
+        self._order = {f"p{index}": order for order, (index, _) in enumerate(self.sources)}
+        self._anchored = [src.startswith(r"\A") for _, src in self.sources]  # globs
+        self._singles = {}
+
+    def matches(self, value):
+        """Return the set of pattern indexes matching `value`."""
+        if not value:
+            return set()
+        hits = set()
+        m = self._combined.search(value)
+        if m:
+            first, start = self._order[m.lastgroup], m.start()
+            hits.add(self.sources[first][0])
+            for order, (index, src) in enumerate(self.sources):
+                if order == first or (self._anchored[order] and (start > 0 or order < first)):
+                    continue
+                if self._single(index, src).search(value, start):
+                    hits.add(index)
+        for index, src in self.standalone:
+            if self._single(index, src).search(value):
+                hits.add(index)
+        return hits
+
+    def _single(self, index, src):
+        single = self._singles.get(index)
+        if single is None:
+            single = self._singles[index] = re.compile(src, PATTERN_FLAGS)
+        return single
+
+
+class PatternSet:
+    """
+    Builds one CombinedMatcher per field (process_name, username, cmdline) from
+    glob/regex rules. Translated and validated sources are cached on disk keyed
+    by a hash of the pattern rules, so startup skips translation and validation.
+    """
+
+    def __init__(self, cache_file=PATTERN_CACHE_FILE):
+        self.cache_file = cache_file
+        self.matchers = {}   # field -> CombinedMatcher
+        self.errors = {}     # pattern index -> error message
+
+    def build(self, specs):
+        """
+        specs: list of (pattern_index, field, mode, pattern).
+        Returns self; invalid patterns are recorded in self.errors and skipped.
+        """
+        key = hashlib.sha256(json.dumps(specs, sort_keys=True).encode()).hexdigest()
+        cached = self._load_cache(key)
+        if cached is None:
+            cached = {"fields": {}, "errors": {}}
+            for index, field, mode, pattern in specs:
+                src = pattern_source(mode, pattern)
+                try:
+                    re.compile(src, PATTERN_FLAGS)
+                except re.error as e:
+                    cached["errors"][str(index)] = f"invalid {mode} pattern '{pattern}': {e}"
+                    continue
+                cached["fields"].setdefault(field, []).append([index, src])
+            self._save_cache(key, cached)
+
+        self.errors = {int(i): msg for i, msg in cached["errors"].items()}
+        self.matchers = {field: CombinedMatcher((i, src) for i, src in sources)
+                         for field, sources in cached["fields"].items()}
+        return self
+
+    def hits(self, field, value):
+        matcher = self.matchers.get(field)
+        return matcher.matches(value) if matcher else set()
+
+    # ----------------------------
+    # Disk Cache
+    # ----------------------------
+    def _load_cache(self, key):
+        try:
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return data.get("compiled") if data.get("key") == key else None
+
+    def _save_cache(self, key, compiled):
+        directory = os.path.dirname(os.path.abspath(self.cache_file))
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=".pattern_", dir=directory)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"key": key, "compiled": compiled}, f)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            pass  # cache is an optimisation only
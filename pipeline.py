@@ -0,0 +1,303 @@
+import itertools
+import queue
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+
+from profiling import span
+
+QUEUE_SIZE = 64     # items buffered between two stages before the upstream stage blocks
+BATCH_SIZE = 256    # targets per normalized batch handed to the matcher
+_STOP = object()
+
+# Items flowing between stages; every one carries the id of the snapshot it came from
+Snapshot = namedtuple("Snapshot", "id timestamp process_infos connections new_connections resources recheck",
+                      defaults=(None,))
+# A normalized snapshot, shared by all of its batches: the matcher applies it to the engine once.
+# `recheck` is None for a full snapshot, else the rule types a partial re-check snapshot reports.
+Frame = namedtuple("Frame", "id processes new_connections resources batches recheck")
+Batch = namedtuple("Batch", "snapshot_id kind targets frame")
+Decision = namedtuple("Decision", "snapshot_id kind target rule result")
+
+
+class Stage:
+    """
+    One pipeline step: `workers` threads take items from a bounded input queue, call
+    func(item) and put every item it returns (an iterable, or None) on the next stage's
+    queue. A full downstream queue blocks the workers — that is the backpressure.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.output = None     # next stage's queue, linked by Pipeline
+        self.counts = Counter()
+        self.busy = 0.0        # seconds spent inside func, summed over workers
+        self._threads = []
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._run, daemon=True, name=f"{self.name}-{i}")
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            self.counts["in"] += 1
+            started = time.perf_counter()
+            try:
+                with span(self.name):
+                    results = self.func(item)
+                    results = list(results) if results is not None else []
+            except Exception as e:
+                self.counts["errors"] += 1
+                print(f"⚠️ Pipeline stage {self.name} failed: {e}", file=sys.stderr)
+                continue
+            finally:
+                self.busy += time.perf_counter() - started  # work only, not time blocked downstream
+            self.counts["out"] += len(results)
+            if self.output is not None:
+                for result in results:
+                    self.output.put(result)
+
+    def stop(self):
+        """Called once every upstream stage has stopped: finish the queued items, then exit."""
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self):
+        return {"stage": self.name, "workers": self.workers, "queued": self.queue.qsize(),
+                "busy_ms": round(self.busy * 1000, 2), **self.counts}
+
+
+class Pipeline:
+    """Stages connected in order by bounded queues; put() feeds the first one."""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        for upstream, downstream in zip(self.stages, self.stages[1:]):
+            upstream.output = downstream.queue
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def put(self, item):
+        """Hand an item to the first stage (blocks while it is full)."""
+        self.stages[0].queue.put(item)
+
+    def close(self):
+        """Drain every queued item through the remaining stages, then stop all workers."""
+        for stage in self.stages:
+            stage.stop()
+
+    def stats(self):
+        return [stage.stats() for stage in self.stages]
+
+
+class FirewallPipeline(Pipeline):
+    """
+    collector → normalizer → matcher → action executor → log sink
+
+    The collector (run in the caller's thread) takes one consistent snapshot per cycle:
+    a single process_iter pass and a single fetch_connections, plus the per-sweep engine
+    inputs (new connections for the rate counters, a resource sample) — every later stage
+    sees only that snapshot. Engine state (process tree, rates, resource matches) is only
+    changed by the matcher, between snapshots, so rules never see a mix of two of them.
+    Matching of one snapshot overlaps with actions and logging of the previous one, and
+    the other stages' concurrency is configurable via `workers`, e.g. {"matcher": 2, "log": 2}.
+    The normalizer always runs one worker so batches reach the matcher in snapshot order.
+    """
+
+    DEFAULT_WORKERS = {"normalizer": 1, "matcher": 1, "action": 1, "log": 1}
+
+    def __init__(self, engine, tracker, simulator=None, logger=None, process_manager=None,
+                 workers=None, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE):
+        self.engine = engine
+        self.tracker = tracker
+        self.simulator = simulator
+        self.logger = logger or (simulator.logger if simulator is not None else None)
+        self.pm = process_manager
+        self.batch_size = batch_size
+        self.snapshot_ids = itertools.count(1)
+        self._flushed_snapshot = None
+        self._flush_lock = threading.Lock()
+        self._frame_order = threading.Condition()
+        self._frame_id = None      # snapshot the engine state currently reflects
+        self._frame_left = 0       # its batches still being matched
+        workers = {**self.DEFAULT_WORKERS, **(workers or {})}
+        if workers["normalizer"] != 1:
+            raise ValueError("the normalizer runs exactly one worker (it keeps snapshots in order)")
+
+        stages = [Stage("normalizer", self.normalize, workers["normalizer"], queue_size),
+                  Stage("matcher", self.match, workers["matcher"], queue_size)]
+        if self.simulator is not None:
+            stages.append(Stage("action", self.act, workers["action"], queue_size))
+        if self.logger is not None:
+            stages.append(Stage("log", self.log, workers["log"], queue_size))
+        super().__init__(stages)
+
+    # ----------------------------
+    # Driving
+    # ----------------------------
+    def run(self, count=1, interval=5.0, recheck_wait=0.0):
+        """
+        Collect and submit `count` snapshots (None = forever) `interval` seconds apart, then drain.
+        With recheck_wait > 0, then wait up to that long for exe hashes and reverse-DNS lookups
+        still in flight and re-check the targets that were matched without them (see recheck()).
+        """
+        self.start()
+        try:
+            for n in itertools.count(1):
+                started = time.monotonic()
+                self.put(self.collect())
+                if count is not None and n >= count:
+                    break
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        finally:
+            self.close()
+        if recheck_wait:
+            self.recheck(recheck_wait)
+        return self.stats()
+
+    def recheck(self, wait=0.0):
+        """
+        Run processes whose executable hash, and connections whose remote hostname, was pending
+        when they were matched through the stages again (after waiting up to `wait` seconds).
+        Only their exe_sha256 / hostname decisions are kept — every other rule already ran on
+        them. Returns the number of targets re-checked.
+        """
+        import psutil
+
+        if wait:
+            self.engine.wait_pending(wait)
+        attrs = self._process_attrs()
+        infos = []
+        for pid in sorted(self.engine.pending_rechecks()):
+            try:
+                infos.append(psutil.Process(pid).as_dict(attrs))
+            except psutil.NoSuchProcess:
+                continue
+        connections = [conn for ip in sorted(self.engine.pending_dns_rechecks())
+                       for conn in self.tracker.connections_to_ip(ip)]
+        if not infos and not connections:
+            return 0
+        self.start()
+        try:
+            self.put(Snapshot(next(self.snapshot_ids), time.time(), infos, connections, [], None,
+                              {"exe_sha256", "hostname"}))
+        finally:
+            self.close()
+        return len(infos) + len(connections)
+
+    def close(self):
+        super().close()
+        if self.simulator is not None:
+            self.simulator.flush()  # enforcement queued by the last snapshot
+
+    # ----------------------------
+    # Stages
+    # ----------------------------
+    def collect(self):
+        """Take one consistent snapshot of processes and connections."""
+        import psutil
+
+        attrs = self._process_attrs()
+        with span("collect"):
+            process_infos = [proc.info for proc in psutil.process_iter(attrs)]
+            self.tracker.fetch_connections()
+            connections = list(self.tracker.connections)  # the tracker's list is refilled next fetch
+            new_connections = self.tracker.drain_new_connections()
+            resources = self.engine.sample_resources()
+        return Snapshot(next(self.snapshot_ids), time.time(), process_infos, connections,
+                        new_connections, resources)
+
+    def _process_attrs(self):
+        """process_iter attributes to collect: the basics plus what the current rules read."""
+        from process_manager import PROCESS_ATTRS
+
+        rule_types = {rule.get("type") for rule in self.engine.rules}
+        return PROCESS_ATTRS + [attr for attr, rule_type in (("cmdline", "cmdline"), ("exe", "exe_sha256"))
+                                if rule_type in rule_types]
+
+    def normalize(self, snapshot):
+        """Turn raw process infos into Process records and split the snapshot's targets into batches."""
+        from process_manager import Process
+
+        processes = [Process(info["pid"], info["name"], info.get("username"), info["status"],
+                             info.get("ppid"), info.get("cmdline"), info.get("exe"))
+                     for info in snapshot.process_infos]
+        groups = (("process", processes), ("connection", snapshot.connections))
+        batches = sum(-(-len(targets) // self.batch_size) for _, targets in groups)
+        frame = Frame(snapshot.id, processes, snapshot.new_connections, snapshot.resources, batches,
+                      snapshot.recheck)
+        for kind, targets in groups:
+            for start in range(0, len(targets), self.batch_size):
+                yield Batch(snapshot.id, kind, targets[start:start + self.batch_size], frame)
+
+    def match(self, batch):
+        self._enter_frame(batch.frame)
+        try:
+            matcher = self.engine.match_process if batch.kind == "process" else self.engine.match_connection
+            only = batch.frame.recheck
+            return [Decision(batch.snapshot_id, batch.kind, target, rule, None)
+                    for target in batch.targets for rule in matcher(target)
+                    if only is None or rule["type"] in only]
+        finally:
+            self._leave_frame()
+
+    def _enter_frame(self, frame):
+        """
+        Before the first batch of a snapshot is matched, wait until every batch of the
+        previous one is done, then apply the snapshot to the engine (process tree, rate
+        counters, resource rules). Batches of the same snapshot are matched concurrently.
+        """
+        with self._frame_order:
+            while self._frame_id != frame.id:
+                if self._frame_left == 0:
+                    self._frame_id, self._frame_left = frame.id, frame.batches
+                    try:
+                        self._apply_frame(frame)
+                    except Exception as e:
+                        print(f"⚠️ Pipeline snapshot {frame.id}: engine update failed: {e}", file=sys.stderr)
+                    break
+                self._frame_order.wait()
+
+    def _leave_frame(self):
+        with self._frame_order:
+            self._frame_left -= 1
+            if self._frame_left == 0:
+                self._frame_order.notify_all()
+
+    def _apply_frame(self, frame):
+        if frame.recheck is not None:
+            return  # a handful of re-checked targets, not a new view of the system
+        with span("engine_update"):
+            if self.pm is not None:
+                self.pm.load_processes(frame.processes)
+            self.engine.observe_connections(frame.new_connections)
+            self.engine.update_resources(frame.resources)
+
+    def act(self, decision):
+        # Enforcement is batched per snapshot: flush once the first decision of a new one arrives
+        with self._flush_lock:
+            if self._flushed_snapshot != decision.snapshot_id:
+                if self._flushed_snapshot is not None:
+                    self.simulator.flush()
+                self._flushed_snapshot = decision.snapshot_id
+        result = self.simulator.execute(decision.target, decision.rule)
+        return [decision._replace(result=result)]
+
+    def log(self, decision):
+        self.logger.log_decision(decision.target, decision.rule, decision.result)
+        return None
@@ -5,13 +5,19 @@ import time
 DRY_RUN = True
 
 # --- Process Class ---
+MAX_TREE_DEPTH = 256  # guards ancestry walks against pid reuse cycles
+PROCESS_ATTRS = ['pid', 'name', 'username', 'status', 'ppid']
+
 class Process:
     """Represents a single real process (read-only)."""
-    def __init__(self, pid, name, username, status):
+    def __init__(self, pid, name, username, status, ppid=None, cmdline=None, exe=None):
         self.pid = pid
         self.name = name
         self.username = username
         self.status = status  # e.g., running, sleeping, stopped, zombie
+        self.ppid = ppid
+        self.cmdline = cmdline  # only filled when collected (cmdline / exe_sha256 rules)
+        self.exe = exe
 
     def __str__(self):
         return f"PID:{self.pid}, Name:{self.name}, User:{self.username}, Status:{self.status}"
@@ -21,18 +27,104 @@ class ProcessManager:
     """Manages real system processes in safe (non-destructive) mode."""
     def __init__(self):
         self.process_list = []
+        # Incrementally maintained process tree
+        self.by_pid = {}      # pid  -> Process
+        self.children = {}    # ppid -> {child pids}
+        self.generation = 0   # bumped whenever the tree changes (lets callers cache derived data)
 
     def update_processes(self):
         """Fetch live process info from system (safe read-only)."""
-        self.process_list.clear()
-        for proc in psutil.process_iter(['pid', 'name', 'username', 'status']):
-            try:
-                info = proc.info
-                self.process_list.append(
-                    Process(info['pid'], info['name'], info.get('username', 'N/A'), info['status'])
-                )
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        self.load_infos(proc.info for proc in psutil.process_iter(PROCESS_ATTRS))
+
+    def load_infos(self, infos):
+        """Replace the process list from process_iter-style info dicts."""
+        return self.load_processes(
+            Process(info['pid'], info['name'], info.get('username', 'N/A'), info['status'],
+                    info.get('ppid'), info.get('cmdline'), info.get('exe'))
+            for info in infos
+        )
+
+    def load_processes(self, processes):
+        """Replace the process list with ready-made Process records (e.g. a pipeline snapshot)."""
+        self.process_list = list(processes)
+        self.apply_snapshot(self.process_list)
+        return self.process_list
+
+    # ----------------------------
+    # Process Tree
+    # ----------------------------
+    def apply_snapshot(self, processes):
+        """
+        Update the ppid → children tree from a full snapshot by applying only the
+        differences (spawned, exited, re-parented) instead of rebuilding it.
+        Returns the number of tree changes.
+        """
+        current = {p.pid: p for p in processes}
+        changes = 0
+
+        for pid in self.by_pid.keys() - current.keys():
+            self.remove_process(pid)
+            changes += 1
+        for pid, proc in current.items():
+            old = self.by_pid.get(pid)
+            if old is None or old.ppid != proc.ppid:
+                changes += 1
+            self.add_process(proc)
+        return changes
+
+    def add_process(self, proc):
+        """Insert or refresh one process (also usable from process spawn events)."""
+        old = self.by_pid.get(proc.pid)
+        if old is not None and old.ppid != proc.ppid:
+            self._detach(proc.pid, old.ppid)
+        self.by_pid[proc.pid] = proc
+        if old is None or old.ppid != proc.ppid:
+            if proc.ppid is not None:
+                self.children.setdefault(proc.ppid, set()).add(proc.pid)
+            self.generation += 1
+        elif (old.name, old.username) != (proc.name, proc.username):
+            self.generation += 1  # exec() changed identity; scoped rule caches must refresh
+
+    def remove_process(self, pid):
+        """Drop one process (also usable from process exit events)."""
+        old = self.by_pid.pop(pid, None)
+        if old is not None:
+            self._detach(pid, old.ppid)
+            self.generation += 1
+
+    def _detach(self, pid, ppid):
+        siblings = self.children.get(ppid)
+        if siblings is not None:
+            siblings.discard(pid)
+            if not siblings:
+                del self.children[ppid]
+
+    def ancestors(self, pid):
+        """Yield the parent, grandparent, ... of `pid` (O(depth))."""
+        seen = {pid}
+        proc = self.by_pid.get(pid)
+        while proc is not None and len(seen) <= MAX_TREE_DEPTH:
+            ppid = proc.ppid
+            if ppid is None or ppid in seen:
+                return
+            seen.add(ppid)
+            proc = self.by_pid.get(ppid)
+            if proc is not None:
+                yield proc
+
+    def descendants(self, pid):
+        """Yield every process spawned (transitively) by `pid`."""
+        stack = list(self.children.get(pid, ()))
+        seen = {pid}
+        while stack:
+            child = stack.pop()
+            if child in seen:
                 continue
+            seen.add(child)
+            proc = self.by_pid.get(child)
+            if proc is not None:
+                yield proc
+            stack.extend(self.children.get(child, ()))
 
     def show_processes(self):
         """Display active processes in a simple table."""
@@ -0,0 +1,262 @@
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+PROFILE_DIR = "profiles"
+PROFILE_SECONDS = 30.0
+TRACEMALLOC_FRAMES = 5
+_NO_SPAN = nullcontext()
+
+
+class Profiler:
+    """
+    On-demand diagnostics for a running firewall, all off (and near free) until requested:
+
+    - CPU: start_cpu(seconds) profiles every thread that runs sweeps for `seconds` and
+      writes a merged pstats file (cProfile is per-thread, so each sweeping thread enables
+      its own profiler at its next sweep boundary)
+    - memory: memory_snapshot() starts tracemalloc on first use, then reports which source
+      lines grew since the previous snapshot
+    - trace: trace_next_sweep() records span() timings of the next sweep (from every thread)
+      as Chrome trace-event JSON, viewable in chrome://tracing or https://ui.perfetto.dev
+
+    Loops mark their cycles with `with sweep("name"):` and stages with `with span("stage"):`;
+    while nothing is requested both return a shared no-op context after one attribute check.
+    cProfile, pstats and tracemalloc are only imported once one of them is requested.
+    """
+
+    def __init__(self, out_dir=PROFILE_DIR):
+        self.out_dir = out_dir
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # CPU profiling
+        self._cpu_window = None     # (pstats path, monotonic deadline) while profiling is requested
+        self._cpu_running = 0       # per-thread profilers still enabled
+        self._cpu_results = {}      # pstats path -> merged pstats.Stats
+        # Memory
+        self._memory_snapshot = None
+        # Tracing
+        self._trace_path = None
+        self._trace_owner = None    # thread whose sweep is being traced
+        self._trace_base = 0
+        self.tracing = False
+        self.events = []
+
+    def _path(self, prefix, suffix):
+        os.makedirs(self.out_dir, exist_ok=True)
+        return os.path.join(self.out_dir, f"{prefix}_{time.strftime('%Y%m%d-%H%M%S')}{suffix}")
+
+    # ----------------------------
+    # Sweep boundaries
+    # ----------------------------
+    def sweep(self, name="sweep"):
+        """Context manager around one evaluation cycle; where CPU profiles and traces start and stop."""
+        if self._cpu_window is None and not self._cpu_running and self._trace_path is None:
+            return _NO_SPAN
+        return self._sweep(name)
+
+    @contextmanager
+    def _sweep(self, name):
+        self._cpu_checkpoint()
+        owner = False
+        if self._trace_path is not None and self._trace_owner is None:
+            with self._lock:
+                if self._trace_owner is None:
+                    self._trace_owner = threading.get_ident()
+                    self._trace_base = time.perf_counter_ns()
+                    self.events = []
+                    self.tracing = True
+                    owner = True
+        try:
+            with self.span(name):
+                yield
+        finally:
+            if owner:
+                self._finish_trace()
+            self._cpu_checkpoint()
+
+    # ----------------------------
+    # CPU profiling
+    # ----------------------------
+    def start_cpu(self, seconds=PROFILE_SECONDS):
+        """Profile sweeping threads for `seconds`; returns the pstats path that will be written."""
+        path = self._path("cpu", ".pstats")
+        self._cpu_window = (path, time.monotonic() + seconds)
+        print(f"⏱️ CPU profiling for {seconds:g}s → {path}", file=sys.stderr)
+        return path
+
+    def stop_cpu(self):
+        """End the current CPU profile early (threads stop at their next sweep boundary)."""
+        self._cpu_window = None
+
+    @property
+    def cpu_profiling(self):
+        return self._cpu_window is not None or self._cpu_running > 0
+
+    def _cpu_checkpoint(self):
+        window = self._cpu_window
+        if window is not None and time.monotonic() >= window[1]:
+            self._cpu_window = window = None
+        current = getattr(self._local, "profile", None)
+        if current is not None and (window is None or current[0] != window[0]):
+            current[1].disable()
+            self._local.profile = None
+            with self._lock:
+                self._cpu_running -= 1
+            self._save_cpu(*current)
+        if window is not None and getattr(self._local, "profile", None) is None:
+            import cProfile
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                return  # Python 3.12+: one profiler already covers every thread
+            self._local.profile = (window[0], profile)
+            with self._lock:
+                self._cpu_running += 1
+
+    def _save_cpu(self, path, profile):
+        import io
+        import pstats
+
+        with self._lock:
+            stats = self._cpu_results.get(path)
+            if stats is None:
+                stats = self._cpu_results[path] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            stats.dump_stats(path)  # rewritten as each thread's profile is merged in
+            window = self._cpu_window
+            if not self._cpu_running and (window is None or window[0] != path):
+                del self._cpu_results[path]  # every thread of this window has reported
+        report = io.StringIO()
+        pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(15)
+        print(f"✅ CPU profile ({threading.current_thread().name}) saved to {path}\n{report.getvalue()}",
+              file=sys.stderr)
+
+    # ----------------------------
+    # Memory
+    # ----------------------------
+    def memory_snapshot(self, top=15):
+        """
+        Take a tracemalloc snapshot and return the `top` source lines whose allocations grew
+        most since the previous one. The first call only starts tracing and returns [].
+        """
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._memory_snapshot = None
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        previous, self._memory_snapshot = self._memory_snapshot, snapshot
+        if previous is None:
+            print("🧠 Memory tracing started; the next snapshot reports growth since now.", file=sys.stderr)
+            return []
+
+        growth = []
+        for stat in snapshot.compare_to(previous, "lineno")[:top]:
+            frame = stat.traceback[0]
+            growth.append({"where": f"{frame.filename}:{frame.lineno}", "size": stat.size,
+                           "size_diff": stat.size_diff, "count_diff": stat.count_diff})
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"🧠 Traced memory {current / 1024:.0f} KB (peak {peak / 1024:.0f} KB); growth since last snapshot:",
+              file=sys.stderr)
+        for item in growth:
+            print(f"  {item['size_diff'] / 1024:+10.1f} KB {item['count_diff']:+8d} blocks  {item['where']}",
+                  file=sys.stderr)
+        return growth
+
+    def stop_memory(self):
+        tracemalloc = sys.modules.get("tracemalloc")  # never started if it was never imported
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._memory_snapshot = None
+
+    # ----------------------------
+    # Tracing
+    # ----------------------------
+    def trace_next_sweep(self, path=None):
+        """Record the next sweep's spans; returns the Chrome trace JSON path that will be written."""
+        self._trace_path = path or self._path("trace", ".json")
+        return self._trace_path
+
+    def span(self, name, **args):
+        """Context manager timing one stage; a shared no-op unless a sweep is being traced."""
+        if not self.tracing:
+            return _NO_SPAN
+        return self._span(name, args)
+
+    @contextmanager
+    def _span(self, name, args):
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            if self.tracing:
+                thread = threading.current_thread()
+                self.events.append({"name": name, "cat": "firewall", "ph": "X",
+                                    "ts": (started - self._trace_base) / 1000,
+                                    "dur": (time.perf_counter_ns() - started) / 1000,
+                                    "pid": os.getpid(), "tid": thread.ident,
+                                    "args": args, "thread_name": thread.name})
+
+    def _finish_trace(self):
+        import json
+
+        self.tracing = False
+        path, events = self._trace_path, self.events
+        threads = {}
+        for event in events:
+            threads[event["tid"]] = event.pop("thread_name")
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                    for tid, name in threads.items()]
+        try:
+            with open(path, "w") as f:
+                json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+            print(f"✅ Trace of {len(events)} spans saved to {path}", file=sys.stderr)
+        except OSError as e:
+            print(f"⚠️ Could not write trace {path}: {e}", file=sys.stderr)
+        self.events = []
+        self._trace_path = None
+        self._trace_owner = None
+
+    # ----------------------------
+    # Signals
+    # ----------------------------
+    def install_signals(self, seconds=PROFILE_SECONDS):
+        """
+        SIGUSR1 toggles a `seconds`-long CPU profile, SIGUSR2 takes a memory snapshot and
+        traces the next sweep. Must be called from the main thread; returns False where
+        these signals don't exist (Windows).
+        """
+        if not hasattr(signal, "SIGUSR1"):
+            print("⚠️ SIGUSR1/SIGUSR2 are not available on this platform; use the profiling API instead.",
+                  file=sys.stderr)
+            return False
+
+        def toggle_cpu(signum, frame):
+            if self._cpu_window is not None:
+                self.stop_cpu()
+            else:
+                self.start_cpu(seconds)
+
+        def memory_and_trace(signum, frame):
+            self.memory_snapshot()
+            self.trace_next_sweep()
+
+        signal.signal(signal.SIGUSR1, toggle_cpu)
+        signal.signal(signal.SIGUSR2, memory_and_trace)
+        return True
+
+
+# Process-wide instance; hot paths use these module-level shortcuts
+profiler = Profiler()
+sweep = profiler.sweep
+span = profiler.span
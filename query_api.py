@@ -0,0 +1,271 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+QUERY_SOCKET = "firewall.sock"
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+def _connection_dict(conn, names=None):
+    return {"pid": conn.pid, "process": names.get(conn.pid) if names else None,
+            "local_ip": conn.local_ip, "local_port": conn.local_port,
+            "remote_ip": conn.remote_ip, "remote_port": conn.remote_port,
+            "status": conn.status, "age": round(conn.age(), 1) if conn.first_seen is not None else None}
+
+
+def _rule_ids(rules):
+    return [rule.get("id") for rule in rules]
+
+
+class QueryServer:
+    """
+    Local JSON query API on a UNIX-domain socket, answered from the running
+    engine's in-memory state (ConnectionTracker indexes, ProcessManager tree,
+    RuleEngine verdicts, ActionSimulator history) — queries never scan /proc.
+
+    Protocol: one JSON object per line, e.g. {"op": "port_owner", "port": 443},
+    answered with one line {"ok": true, "result": ...} or {"ok": false, "error": ...}.
+    Clients are served concurrently by an asyncio loop on a background thread.
+    """
+
+    def __init__(self, engine, tracker, process_manager=None, simulator=None, metrics=None,
+                 path=QUERY_SOCKET):
+        self.engine = engine
+        self.tracker = tracker
+        self.pm = process_manager
+        self.simulator = simulator
+        self.metrics = metrics
+        self.path = path
+        self.started = time.time()
+        self.requests = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self.ops = {
+            "connections": self.op_connections,
+            "port_owner": self.op_port_owner,
+            "matches": self.op_matches,
+            "decisions": self.op_decisions,
+            "rules": self.op_rules,
+            "stats": self.op_stats,
+            "profile": self.op_profile,
+        }
+
+    # ----------------------------
+    # Lifecycle
+    # ----------------------------
+    def start(self):
+        """Start serving on a daemon thread; returns False where UNIX sockets are unavailable."""
+        if not hasattr(socket, "AF_UNIX"):
+            print("⚠️ UNIX sockets are not available on this platform; query API disabled.", file=sys.stderr)
+            return False
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), daemon=True, name="query-api")
+        self._thread.start()
+        ready.wait(timeout=5)
+        return self._server is not None
+
+    def _run(self, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            if os.path.exists(self.path):
+                if self._in_use():
+                    raise OSError(f"another instance is already serving on {self.path}")
+                os.remove(self.path)  # stale socket from a previous run
+            # Created 0600 from the start, not chmod'ed after bind (umask is process-wide,
+            # so it is only narrowed for the duration of the bind)
+            umask = os.umask(0o177)
+            try:
+                self._server = self._loop.run_until_complete(
+                    asyncio.start_unix_server(self._handle, path=self.path, limit=MAX_REQUEST_BYTES))
+            finally:
+                os.umask(umask)
+        except OSError as e:
+            print(f"⚠️ Query API failed to start on {self.path}: {e}", file=sys.stderr)
+            self._server = None
+            ready.set()
+            return
+        print(f"✅ Query API listening on {self.path}", file=sys.stderr)  # stdout may carry NDJSON
+        ready.set()
+        self._loop.run_forever()
+
+    def _in_use(self):
+        """True if something answers on self.path (a live server, not a stale socket file)."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            probe.settimeout(1.0)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                return False
+        return True
+
+    def stop(self):
+        if self._loop is None:
+            return
+        def shutdown():
+            if self._server is not None:
+                self._server.close()
+            self._loop.stop()
+        self._loop.call_soon_threadsafe(shutdown)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._server is not None and os.path.exists(self.path):
+            os.remove(self.path)  # only our own socket, never one we refused to replace
+
+    # ----------------------------
+    # Protocol
+    # ----------------------------
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # request longer than MAX_REQUEST_BYTES
+                    writer.write(b'{"ok": false, "error": "request too large"}\n')
+                    break
+                if not line:
+                    break
+                writer.write(json.dumps(self.dispatch(line), default=str).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def dispatch(self, line):
+        """Answer one raw request line; every error becomes an {"ok": false} response."""
+        self.requests += 1
+        try:
+            request = json.loads(line)
+            handler = self.ops.get(request.get("op"))
+            if handler is None:
+                return {"ok": False, "error": f"unknown op {request.get('op')!r} (expected one of {sorted(self.ops)})"}
+            return {"ok": True, "result": handler(request)}
+        except (json.JSONDecodeError, AttributeError):
+            return {"ok": False, "error": "request must be a JSON object"}
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": f"bad request: {e}"}
+
+    # ----------------------------
+    # Operations
+    # ----------------------------
+    def _names(self):
+        if self.pm is None:
+            return {}
+        return {pid: proc.name for pid, proc in list(self.pm.by_pid.items())}
+
+    def op_connections(self, request):
+        """Sockets, optionally filtered by pid / port / remote_ip (served from the tracker's indexes)."""
+        if "pid" in request:
+            conns = self.tracker.connections_for_pid(int(request["pid"]))
+        elif "port" in request:
+            conns = self.tracker.connections_on_port(int(request["port"]))
+        elif "remote_ip" in request:
+            conns = self.tracker.connections_to_ip(request["remote_ip"])
+        else:
+            conns = self.tracker.connections
+        limit = int(request.get("limit", 500))
+        names = self._names()
+        return [_connection_dict(conn, names) for conn in conns[:limit]]
+
+    def op_port_owner(self, request):
+        port = int(request["port"])
+        names = self._names()
+        owners = {}
+        for conn in self.tracker.connections_on_port(port):
+            owners.setdefault(conn.pid, {"pid": conn.pid, "process": names.get(conn.pid), "statuses": []})
+            owners[conn.pid]["statuses"].append(conn.status)
+        return list(owners.values())
+
+    def op_matches(self, request):
+        """Rule matches for a pid and its sockets (tracked verdicts first, else cached snapshots)."""
+        pid = int(request["pid"])
+        index = self.engine.target_index
+        if index is not None and ("proc", pid) in index.verdicts:
+            process_rules = list(index.verdicts[("proc", pid)][0])
+        elif self.pm is not None and pid in self.pm.by_pid:
+            process_rules = _rule_ids(self.engine.match_process(self.pm.by_pid[pid]))
+        else:
+            process_rules = None  # unknown pid
+        connections = []
+        for conn in self.tracker.connections_for_pid(pid):
+            matched = _rule_ids(self.engine.match_connection(conn))
+            if matched:
+                connections.append({"local_port": conn.local_port, "remote_ip": conn.remote_ip,
+                                     "remote_port": conn.remote_port, "rule_ids": matched})
+        return {"pid": pid, "process_rules": process_rules, "connection_matches": connections}
+
+    def op_decisions(self, request):
+        if self.simulator is None:
+            return []
+        limit = int(request.get("limit", 50))
+        return list(self.simulator.action_log)[-limit:]
+
+    def op_rules(self, request):
+        return self.engine.rules
+
+    def op_stats(self, request):
+        stats = {
+            "uptime": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "rules": len(self.engine.rules),
+            "connections": len(self.tracker.connections),
+            "tracked_lifetimes": len(self.tracker.lifetimes),
+            "processes": len(self.pm.by_pid) if self.pm is not None else None,
+        }
+        if self.simulator is not None:
+            stats["actions"] = {"total": self.simulator.total_actions,
+                                "by_action": dict(self.simulator.action_counts),
+                                "top_rules": self.simulator.rule_counts.most_common(5)}
+            sinks = getattr(self.simulator.logger, "sinks", None)
+            if sinks is not None:
+                stats["sinks"] = sinks.stats()
+        if self.metrics is not None:
+            stats["metrics"] = self.metrics.summary(step=1, count=60)
+        return stats
+
+    def op_profile(self, request):
+        """Start diagnostics: kind=cpu (seconds=N), memory (growth since last call) or trace (next sweep)."""
+        from profiling import profiler
+
+        kind = request.get("kind", "cpu")
+        if kind == "cpu":
+            return {"path": profiler.start_cpu(float(request.get("seconds", 30)))}
+        if kind == "memory":
+            return {"growth": profiler.memory_snapshot(int(request.get("top", 15)))}
+        if kind == "trace":
+            return {"path": profiler.trace_next_sweep()}
+        raise ValueError(f"unknown kind {kind!r} (expected cpu, memory or trace)")
+
+
+def query(op, path=QUERY_SOCKET, timeout=5.0, **params):
+    """Send one request to a running QueryServer and return its result (raises on errors)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps({"op": op, **params}).encode() + b"\n")
+        buffer = b""
+        while not buffer.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            buffer += chunk
+    response = json.loads(buffer)
+    if not response.get("ok"):
+        raise RuntimeError(response.get("error"))
+    return response["result"]
+
+
+# --- Demo client ---
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python query_api.py OP [key=value ...]   "
+              "(ops: connections, port_owner, matches, decisions, rules, stats, profile)")
+        sys.exit(1)
+    params = dict(arg.split("=", 1) for arg in sys.argv[2:])
+    print(json.dumps(query(sys.argv[1], **params), indent=2, default=str))
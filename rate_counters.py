@@ -0,0 +1,186 @@
+import hashlib
+import time
+from array import array
+
+RATE_WINDOW = 60.0        # seconds covered by rate rules ("per minute")
+RATE_BUCKETS = 6          # sub-windows; the window slides in RATE_WINDOW / RATE_BUCKETS steps
+SKETCH_WIDTH = 2048
+SKETCH_DEPTH = 4
+HLL_PRECISION = 8         # 2**8 registers per key, ~6.5% standard error
+MAX_DISTINCT_KEYS = 1024  # keys tracked for distinct counts per sub-window (least recent evicted)
+
+
+def _hash64(value):
+    """Stable 64-bit hash (Python's hash() is identity for ints and salted for strings)."""
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "little")
+
+
+class CountMinSketch:
+    """Fixed-size frequency sketch: estimates never undercount, memory is width * depth counters."""
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = array("I", bytes(4 * width * depth))
+
+    def _cells(self, key):
+        h = _hash64(key)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        for cell in self._cells(key):
+            self.table[cell] += count
+
+    def estimate(self, key):
+        return min(self.table[cell] for cell in self._cells(key))
+
+    def clear(self):
+        self.table = array("I", bytes(4 * self.width * self.depth))
+
+
+class HyperLogLog:
+    """Distinct-count sketch in 2**precision bytes."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item):
+        h = _hash64(item)
+        index = h >> (64 - self.precision)
+        rest = (h << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = min(64 - rest.bit_length() + 1, 64 - self.precision + 1)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is far more accurate for small cardinalities
+            from math import log
+            estimate = m * log(m / zeros)
+        return int(round(estimate))
+
+
+class _Bucket:
+    def __init__(self, epoch, width, depth):
+        self.epoch = epoch
+        self.counts = CountMinSketch(width, depth)
+        self.distinct = {}   # key -> HyperLogLog, insertion order doubles as LRU order
+
+    def reset(self, epoch):
+        self.epoch = epoch
+        self.counts.clear()
+        self.distinct.clear()
+
+
+class SlidingWindowCounter:
+    """
+    Per-key event counts and distinct-item counts over a sliding time window.
+    The window is a ring of sub-window buckets, each holding one count-min sketch
+    (shared by all keys) and at most `max_keys` HyperLogLogs, so memory stays bounded
+    however many keys appear. Expired buckets are reset in place as the ring turns.
+    """
+
+    def __init__(self, window=RATE_WINDOW, buckets=RATE_BUCKETS, width=SKETCH_WIDTH,
+                 depth=SKETCH_DEPTH, max_keys=MAX_DISTINCT_KEYS, precision=HLL_PRECISION):
+        self.window = window
+        self.bucket_len = window / buckets
+        self.max_keys = max_keys
+        self.precision = precision
+        self._ring = [_Bucket(None, width, depth) for _ in range(buckets)]
+
+    def _epoch(self, now):
+        return int((now if now is not None else time.monotonic()) // self.bucket_len)
+
+    def _live(self, now):
+        epoch = self._epoch(now)
+        oldest = epoch - len(self._ring) + 1
+        return [b for b in self._ring if b.epoch is not None and oldest <= b.epoch <= epoch]
+
+    def add(self, key, item=None, now=None):
+        """Count one event for `key`; if `item` is given, also add it to the key's distinct set."""
+        epoch = self._epoch(now)
+        bucket = self._ring[epoch % len(self._ring)]
+        if bucket.epoch != epoch:
+            bucket.reset(epoch)
+        bucket.counts.add(key)
+        if item is None:
+            return
+        hll = bucket.distinct.pop(key, None)
+        if hll is None:
+            hll = HyperLogLog(self.precision)
+            if len(bucket.distinct) >= self.max_keys:
+                del bucket.distinct[next(iter(bucket.distinct))]
+        bucket.distinct[key] = hll
+        hll.add(item)
+
+    def count(self, key, now=None):
+        """Events for `key` within the window (may overestimate, never underestimates)."""
+        return sum(b.counts.estimate(key) for b in self._live(now))
+
+    def distinct(self, key, now=None):
+        """Approximate number of distinct items seen for `key` within the window."""
+        merged = None
+        for bucket in self._live(now):
+            hll = bucket.distinct.get(key)
+            if hll is None:
+                continue
+            if merged is None:
+                merged = HyperLogLog(self.precision)
+            merged.merge(hll)
+        return merged.count() if merged else 0
+
+
+class ConnectionRates:
+    """
+    Sliding-window connection rates fed from ConnectionTracker.new_connections:
+      - new connections per process (and distinct remote IPs they reached)
+      - new connections per remote IP (across all processes)
+    """
+
+    def __init__(self, window=RATE_WINDOW):
+        self.by_pid = SlidingWindowCounter(window)
+        self.by_remote_ip = SlidingWindowCounter(window)
+
+    def observe(self, connections, now=None):
+        """Record newly seen sockets; sockets open before tracking began are skipped."""
+        for conn in connections:
+            if isinstance(conn, dict):
+                pid, remote_ip, preexisting = conn.get("pid"), conn.get("remote_ip"), conn.get("preexisting")
+            else:
+                pid, remote_ip, preexisting = conn.pid, conn.remote_ip, conn.preexisting
+            if preexisting or not remote_ip:
+                continue  # listening / unconnected sockets are not outbound activity
+            self.by_pid.add(pid, remote_ip, now)
+            self.by_remote_ip.add(remote_ip, None, now)
+
+    def new_connections(self, pid, now=None):
+        return self.by_pid.count(pid, now)
+
+    def distinct_remote_ips(self, pid, now=None):
+        return self.by_pid.distinct(pid, now)
+
+    def connections_from_ip(self, remote_ip, now=None):
+        return self.by_remote_ip.count(remote_ip, now)
+
+
+# --- Demo ---
+if __name__ == "__main__":
+    counter = SlidingWindowCounter(window=60.0)
+    for i in range(5000):
+        counter.add("scanner", f"10.0.{i // 256}.{i % 256}", now=10.0)
+        if i % 50 == 0:
+            counter.add("browser", "93.184.216.34", now=10.0)
+    print(f"scanner: {counter.count('scanner', now=10.0)} conns, "
+          f"~{counter.distinct('scanner', now=10.0)} distinct IPs")
+    print(f"browser: {counter.count('browser', now=10.0)} conns, "
+          f"~{counter.distinct('browser', now=10.0)} distinct IPs")
+    print(f"after the window: {counter.count('scanner', now=75.0)} conns")
@@ -1,54 +1,255 @@
-import json
-import os
+import time
 import psutil
 
 RULES_FILE = "rules.json"
 DRY_RUN = True  # Ensures no real blocking or termination
 
+# Evaluation modes:
+#   "all"         → every matching rule is returned (legacy behaviour)
+#   "first_match" → rules are walked in priority order and evaluation stops
+#                   at the first matching rule whose action is terminal
+EVALUATION_MODES = ("all", "first_match")
+DEFAULT_PRIORITY = 100  # lower number = evaluated earlier; ties keep file order
+TERMINAL_ACTIONS = {"allow", "block", "terminate"}
+
+PROCESS_RULE_TYPES = {"process_name", "username", "cmdline", "exe_sha256",
+                      "rss_mb_gt", "cpu_percent_gt", "io_read_gt", "io_write_gt"}
+CONNECTION_RULE_TYPES = {"port", "ip", "ip_blocklist", "conn_age_gt", "listen_recent",
+                         "conn_rate_gt", "distinct_ips_gt", "ip_rate_gt", "hostname"}
+SUBSTRING_RULE_TYPES = {"process_name", "username", "ip"}
+CASE_SENSITIVE_RULE_TYPES = {"ip_blocklist"}  # values are file paths, not lower-cased
+TREE_SCOPED_TYPES = {"process_name", "username"}
+# Lifetime rules take a number of seconds (see ConnectionTracker lifetime tracking):
+#   conn_age_gt   → connection first seen more than `value` seconds ago
+#   listen_recent → LISTEN socket opened within the last `value` seconds
+# Rate rules take a threshold over the sliding window in rate_counters (RATE_WINDOW, 60s):
+#   conn_rate_gt    → the connection's process opened more than `value` new connections
+#   distinct_ips_gt → the connection's process reached more than `value` distinct remote IPs
+#   ip_rate_gt      → more than `value` new connections involved the connection's remote IP
+RATE_RULE_TYPES = {"conn_rate_gt", "distinct_ips_gt", "ip_rate_gt"}
+# Resource rules compare per-process usage sampled by resource_accounting (one batched /proc pass):
+#   rss_mb_gt      → resident memory above `value` MB
+#   cpu_percent_gt → CPU use above `value` percent of one core since the previous sample
+#   io_read_gt / io_write_gt → disk reads / writes above `value` MB/s
+# An optional "for": N field only matches once the condition has held for N seconds.
+RESOURCE_RULE_TYPES = {"rss_mb_gt", "cpu_percent_gt", "io_read_gt", "io_write_gt"}
+NUMERIC_RULE_TYPES = {"conn_age_gt", "listen_recent"} | RATE_RULE_TYPES | RESOURCE_RULE_TYPES
+
+# Optional "match" field for process_name / username / cmdline rules:
+#   "substring" (default) → lower-cased `value in field`
+#   "glob"                → shell-style pattern that must match the whole field ("chrome*")
+#   "regex"               → Python regex searched anywhere in the field
+# Glob/regex rules of each field are compiled together by pattern_matcher.PatternSet.
+PATTERN_MATCH_MODES = ("glob", "regex")
+PATTERN_FIELDS = {"process_name", "username", "cmdline"}
+
+# Process rule scopes (resolved through ProcessManager's process tree):
+#   "self"        → the process itself matches (default)
+#   "descendants" → the process or any of its ancestors matches ("block X and everything it spawns")
+#   "ancestors"   → the process or any of its descendants matches
+RULE_SCOPES = ("self", "descendants", "ancestors")
+
+
+_UNSET = object()  # marks per-target values that have not been computed yet
+
+
+def process_identity(proc_info):
+    """
+    Return lowered (name, username) for a process target, or None if unsupported.
+    Accepts psutil.Process, dicts, and ProcessManager.Process-style objects.
+    May raise psutil.NoSuchProcess / AccessDenied for live processes.
+    """
+    if isinstance(proc_info, psutil.Process):
+        username = proc_info.username()
+        return proc_info.name().lower(), username.lower() if username else ""
+    if isinstance(proc_info, dict):
+        return (proc_info.get("name") or "").lower(), (proc_info.get("username") or "").lower()
+    name = getattr(proc_info, "name", None)
+    if isinstance(name, str):
+        return name.lower(), (getattr(proc_info, "username", None) or "").lower()
+    return None
+
+
+def process_cmdline(proc_info):
+    """Command line of a process target as one string ("" if unavailable)."""
+    if isinstance(proc_info, psutil.Process):
+        cmdline = proc_info.cmdline()
+    elif isinstance(proc_info, dict):
+        cmdline = proc_info.get("cmdline")
+    else:
+        cmdline = getattr(proc_info, "cmdline", None)
+    if isinstance(cmdline, (list, tuple)):
+        return " ".join(cmdline)
+    return cmdline or ""
+
+
+def _field(target, name):
+    return target.get(name) if isinstance(target, dict) else getattr(target, name, None)
+
+
+def connection_age(conn_info):
+    """Seconds since the connection was first seen, or None if it isn't lifetime-tracked."""
+    first_seen = _field(conn_info, "first_seen")
+    if first_seen is None:
+        return None
+    return time.monotonic() - first_seen
+
+
+def connection_identity(conn_info):
+    """Return (local_port, remote_ip) for a dict or Connection-style target."""
+    # dicts have no attributes, Connection objects have no .get
+    if isinstance(conn_info, dict):
+        return conn_info.get("local_port"), conn_info.get("remote_ip")
+    return getattr(conn_info, "local_port", None), getattr(conn_info, "remote_ip", None)
+
+
 class RuleEngine:
     """Rule Engine to manage and match firewall-like rules safely."""
-    def __init__(self, rules_file=RULES_FILE):
+    def __init__(self, rules_file=RULES_FILE, mode="all"):
+        if mode not in EVALUATION_MODES:
+            raise ValueError(f"Unknown evaluation mode '{mode}' (expected one of {EVALUATION_MODES})")
         self.rules_file = rules_file
+        self.mode = mode
+        from rule_store import RuleStore
+        self.store = RuleStore(rules_file)  # snapshot + journal; id -> rule dict
         self.rules = self.load_rules()
+        self.target_index = None   # set by track_targets() for incremental re-evaluation
+        self.process_tree = None   # ProcessManager, set by set_process_tree() for scoped rules
+        self._ancestor_marks = {}  # (rule_type, value) -> (tree generation, marked pids)
+        self.hash_cache = None     # exe_hash.ExeHashCache, created on first exe_sha256 rule
+        self.blocklists = {}       # ip_blocklist rule value -> ip_blocklist.IPBlocklist
+        self.patterns = None       # pattern_matcher.PatternSet for glob/regex rules
+        self._pattern_rules = []   # pattern index -> rule
+        self.rates = None          # rate_counters.ConnectionRates, fed by observe_connections()
+        self.dns_cache = None      # dns_cache.ReverseDNSCache, created on first hostname rule
+        self.resources = None      # resource_accounting.ResourceSampler, created on first resource rule
+        self._resource_rules = []  # resource index -> (rule_type, threshold, sustain seconds, rule)
+        self._resource_since = {}  # rule id -> per-row time each process went over the threshold
+        self.resource_matches = {} # pid -> resource indexes matched by the last update_resources()
+        self.last_deltas = []
+        self.compile_rules()
 
     # ----------------------------
     # Rule File Management
     # ----------------------------
     def load_rules(self):
-        """Load all rules from a JSON file."""
-        if not os.path.exists(self.rules_file):
-            return []
-        try:
-            with open(self.rules_file, "r") as f:
-                data = json.load(f)
-                return data if isinstance(data, list) else []
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
+        """Load all rules from the JSON snapshot plus any journaled changes."""
+        return self.store.load()
 
     def save_rules(self):
-        """Save rules to the JSON file."""
-        with open(self.rules_file, "w") as f:
-            json.dump(self.rules, f, indent=4)
+        """Write all rules to the JSON snapshot atomically (and empty the journal)."""
+        self.store.compact()
+
+    @staticmethod
+    def validate_rule(rule):
+        """Return a list of problems with a rule dict (empty if it is valid)."""
+        if not isinstance(rule, dict):
+            return ["rule must be a JSON object"]
+        problems = []
+        missing = {"id", "type", "value", "action"} - rule.keys()
+        if missing:
+            problems.append(f"missing {', '.join(sorted(missing))}")
+            return problems
+        if rule["type"] not in PROCESS_RULE_TYPES | CONNECTION_RULE_TYPES:
+            problems.append(f"unknown type '{rule['type']}'")
+        if str(rule["action"]).lower() not in TERMINAL_ACTIONS:
+            problems.append(f"unknown action '{rule['action']}'")
+        if rule["type"] in NUMERIC_RULE_TYPES:
+            try:
+                float(rule["value"])
+            except (TypeError, ValueError):
+                problems.append(f"'{rule['value']}' is not a number")
+        match_problem = RuleEngine._match_problem(rule)
+        if match_problem:
+            problems.append(match_problem)
+        scope_problem = RuleEngine._scope_problem(rule)
+        if scope_problem:
+            problems.append(scope_problem)
+        return problems
+
+    @staticmethod
+    def _match_problem(rule):
+        """Why a rule's "match" mode is invalid (None if it is fine)."""
+        match = rule.get("match", "substring")
+        if match not in ("substring",) + PATTERN_MATCH_MODES:
+            return f"unknown match '{match}' (expected substring, {' or '.join(PATTERN_MATCH_MODES)})"
+        if match != "substring" and rule.get("type") not in PATTERN_FIELDS:
+            return f"match '{match}' is only supported for {', '.join(sorted(PATTERN_FIELDS))} rules"
+        return None
+
+    @staticmethod
+    def _scope_problem(rule):
+        """Why a rule's "scope" can't be honoured (None if it can)."""
+        scope = rule.get("scope", "self")
+        if scope == "self":
+            return None
+        if scope not in RULE_SCOPES:
+            return f"unknown scope '{scope}' (expected one of {RULE_SCOPES})"
+        if rule.get("type") not in TREE_SCOPED_TYPES:
+            return f"scope '{scope}' is only supported for {', '.join(sorted(TREE_SCOPED_TYPES))} rules"
+        if rule.get("match") in PATTERN_MATCH_MODES:
+            return f"scope '{scope}' is not supported for {rule['match']} rules"
+        return None
 
     def add_rule(self, rule):
-        """Add a new rule and save."""
+        """
+        Add a new rule (or replace the rule with the same id) and journal it.
+        Returns the verdict deltas for tracked targets (see track_targets).
+        """
         required = {"id", "type", "value", "action"}
         if not required.issubset(rule.keys()):
             print("❌ Invalid rule format. Must include id, type, value, action.")
-            return
-        self.rules.append(rule)
-        self.save_rules()
+            return []
+        previous = self.store.get(rule["id"])
+        self.store.put(rule)
+        self.rules = self.store.rules()
+        self.compile_rules()
         print(f"✅ Rule {rule['id']} added successfully.")
+        return self._reevaluate_for(rule) if previous is None else self._reevaluate_for(rule, previous)
 
     def delete_rule(self, rule_id):
-        """Delete a rule by ID."""
-        before = len(self.rules)
-        self.rules = [r for r in self.rules if r["id"] != rule_id]
-        if len(self.rules) < before:
-            self.save_rules()
+        """
+        Delete a rule by ID.
+        Returns the verdict deltas for tracked targets (see track_targets).
+        """
+        removed = self.store.delete(rule_id)
+        if removed is not None:
+            self.rules = self.store.rules()
+            self.compile_rules()
             print(f"🗑️ Rule ID {rule_id} deleted successfully.")
-        else:
-            print(f"⚠️ Rule ID {rule_id} not found.")
+            return self._reevaluate_for(removed)
+        print(f"⚠️ Rule ID {rule_id} not found.")
+        return []
+
+    def import_rules(self, rules, replace=False):
+        """
+        Validate and commit many rules as one journal transaction (all or nothing).
+        Rules with existing ids replace them; replace=True drops every rule not imported.
+        Raises ValueError listing the problems if any rule is invalid. Returns verdict deltas.
+        """
+        rules = list(rules)
+        problems = []
+        seen = set()
+        for i, rule in enumerate(rules):
+            issues = self.validate_rule(rule)
+            if not issues and rule["id"] in seen:
+                issues = ["duplicate id in import"]
+            if issues:
+                problems.append(f"rule #{i} ({rule.get('id') if isinstance(rule, dict) else '?'}): "
+                                f"{'; '.join(issues)}")
+            else:
+                seen.add(rule["id"])
+        if problems:
+            raise ValueError(f"{len(problems)} invalid rule(s), nothing imported:\n  " + "\n  ".join(problems[:20]))
+
+        affected = rules + [self.store.get(r["id"]) for r in rules if self.store.get(r["id"]) is not None]
+        if replace:
+            affected += [r for r in self.store.rules() if r["id"] not in seen]
+        self.store.put_many(rules, replace=replace)
+        self.rules = self.store.rules()
+        self.compile_rules()
+        print(f"✅ Imported {len(rules)} rule(s).")
+        return self._reevaluate_for(*affected)
 
     def list_rules(self):
         """Print all current rules."""
@@ -57,9 +258,158 @@ class RuleEngine:
             return
         print("\n📜 Current Rules:")
         for r in self.rules:
-            print(f"  • ID: {r['id']} | Type: {r['type']} | Value: {r['value']} | Action: {r['action']}")
+            print(f"  • ID: {r['id']} | Type: {r['type']} | Value: {r['value']} | Action: {r['action']}"
+                  f" | Priority: {r.get('priority', DEFAULT_PRIORITY)}")
         print()
 
+    # ----------------------------
+    # Rule Compilation & Checks
+    # ----------------------------
+    def compile_rules(self):
+        """
+        Pre-normalize rules into priority-ordered match tables.
+        Each entry is (rule_type, lowered_value, terminal, scope, rule) so matching
+        never re-lowercases rule values per target. Glob/regex rules become
+        ("pattern", pattern_index, ...) entries resolved by one combined matcher per field.
+        """
+        ordered = sorted(enumerate(self.rules),
+                         key=lambda item: (self._priority(item[1]), item[0]))
+        self._process_rules = []
+        self._connection_rules = []
+        self._pattern_rules = []
+        self._resource_rules = []
+        self.resource_matches = {}
+        pattern_specs = []
+        for _, rule in ordered:
+            scope = rule.get("scope", "self")
+            if scope not in RULE_SCOPES:
+                scope = "self"
+            if self._match_problem(rule):
+                continue  # reported by check_rules()
+            if rule.get("match") in PATTERN_MATCH_MODES:
+                index = len(self._pattern_rules)
+                self._pattern_rules.append(rule)
+                pattern_specs.append((index, rule["type"], rule["match"], str(rule["value"])))
+                self._process_rules.append(("pattern", index, self._is_terminal(rule), "self", rule))
+                continue
+            if rule["type"] in RESOURCE_RULE_TYPES:
+                try:
+                    threshold, sustain = float(rule["value"]), float(rule.get("for", 0))
+                except (TypeError, ValueError):
+                    continue  # reported by check_rules()
+                index = len(self._resource_rules)
+                self._resource_rules.append((rule["type"], threshold, sustain, rule))
+                self._process_rules.append(("resource", index, self._is_terminal(rule), "self", rule))
+                continue
+            value = str(rule["value"])
+            if rule["type"] in NUMERIC_RULE_TYPES:
+                try:
+                    value = float(rule["value"])
+                except (TypeError, ValueError):
+                    continue  # reported by check_rules()
+            elif rule["type"] not in CASE_SENSITIVE_RULE_TYPES:
+                value = value.lower()
+                if rule["type"] == "hostname":
+                    value = value.strip(".")
+            entry = (rule["type"], value, self._is_terminal(rule), scope, rule)
+            if rule["type"] in PROCESS_RULE_TYPES:
+                self._process_rules.append(entry)
+            elif rule["type"] in CONNECTION_RULE_TYPES:
+                self._connection_rules.append(entry)
+
+        self.patterns = None
+        if pattern_specs:
+            from pattern_matcher import PatternSet
+            self.patterns = PatternSet().build(pattern_specs)
+
+    def check_rules(self):
+        """
+        Report rules that can never be decisive or that disagree with each other.
+        Returns a list of dicts with keys: kind, rule_id, other_id, detail.
+          - unknown_type:  rule type is not understood by the engine (never matches)
+          - invalid_pattern: glob/regex that does not compile (never matches)
+          - invalid_value: non-numeric value for a numeric rule type, or an unknown / inapplicable
+                           "match" mode (never matches)
+          - unsupported_scope: a scope the rule can't have (it is evaluated as "self")
+          - shadowed:      an earlier terminal rule matches everything this rule matches
+          - contradictory: shadowed by, or overlapping with, a rule that has a different action
+        Shadowing only exists in "first_match" mode; in "all" mode every matching rule fires,
+        so only overlaps with a different action are reported.
+        """
+        issues = []
+        first_match = self.mode == "first_match"
+        by_type = {}
+        for entry in self._process_rules + self._connection_rules:
+            by_type.setdefault(entry[0], []).append(entry)
+        known = PROCESS_RULE_TYPES | CONNECTION_RULE_TYPES
+        for rule in self.rules:
+            if rule["type"] not in known:
+                issues.append({"kind": "unknown_type", "rule_id": rule["id"], "other_id": None,
+                               "detail": f"type '{rule['type']}' is not supported"})
+            elif rule["type"] in NUMERIC_RULE_TYPES:
+                try:
+                    float(rule["value"])
+                except (TypeError, ValueError):
+                    issues.append({"kind": "invalid_value", "rule_id": rule["id"], "other_id": None,
+                                   "detail": f"'{rule['value']}' is not a number"})
+            match_problem = self._match_problem(rule)
+            if match_problem:
+                issues.append({"kind": "invalid_value", "rule_id": rule["id"], "other_id": None,
+                               "detail": match_problem})
+            scope_problem = self._scope_problem(rule)
+            if scope_problem:
+                issues.append({"kind": "unsupported_scope", "rule_id": rule["id"], "other_id": None,
+                               "detail": scope_problem})
+        if self.patterns is not None:
+            for index, error in self.patterns.errors.items():
+                issues.append({"kind": "invalid_pattern", "rule_id": self._pattern_rules[index]["id"],
+                               "other_id": None, "detail": error})
+
+        for rule_type, entries in by_type.items():
+            substring = rule_type in SUBSTRING_RULE_TYPES
+            for i, (_, value_b, _, scope_b, rule_b) in enumerate(entries):
+                action_b = str(rule_b["action"]).lower()
+                for _, value_a, terminal_a, scope_a, rule_a in entries[:i]:
+                    action_a = str(rule_a["action"]).lower()
+                    covers = (value_a in value_b) if substring else (value_a == value_b)
+                    # a tree-scoped rule matches a superset of the same rule with "self" scope
+                    covers = covers and (scope_a == scope_b or scope_b == "self")
+                    if covers and terminal_a and first_match:
+                        kind = "contradictory" if action_a != action_b else "shadowed"
+                        issues.append({"kind": kind, "rule_id": rule_b["id"], "other_id": rule_a["id"],
+                                       "detail": f"never decisive: {rule_a['id']} ({action_a}) matches first"})
+                        break
+                    overlaps = covers or (substring and value_b in value_a)
+                    if overlaps and action_a != action_b:
+                        issues.append({"kind": "contradictory", "rule_id": rule_b["id"], "other_id": rule_a["id"],
+                                       "detail": f"overlaps {rule_a['id']} with a different action "
+                                                 f"({action_a} vs {action_b})"})
+        return issues
+
+    def report_rule_issues(self):
+        """Print the result of check_rules() in a readable form."""
+        issues = self.check_rules()
+        if not issues:
+            print("✅ No shadowed or contradictory rules found.")
+            return issues
+        print(f"\n⚠️ Rule check found {len(issues)} issue(s) (mode: {self.mode}):")
+        for issue in issues:
+            print(f"  • [{issue['kind']}] {issue['rule_id']}: {issue['detail']}")
+        return issues
+
+    @staticmethod
+    def _priority(rule):
+        try:
+            return int(rule.get("priority", DEFAULT_PRIORITY))
+        except (TypeError, ValueError):
+            return DEFAULT_PRIORITY
+
+    @staticmethod
+    def _is_terminal(rule):
+        if "terminal" in rule:
+            return bool(rule["terminal"])
+        return str(rule.get("action", "")).lower() in TERMINAL_ACTIONS
+
     # ----------------------------
     # Matching Logic
     # ----------------------------
@@ -69,28 +419,53 @@ class RuleEngine:
         proc_info can be:
           - dict (from simulation)
           - psutil.Process object
+        In "first_match" mode the walk stops at the first terminal match.
         """
         matched = []
 
         try:
-            # Normalize input
-            if isinstance(proc_info, psutil.Process):
-                name = proc_info.name().lower()
-                username = proc_info.username().lower() if proc_info.username() else ""
-            elif isinstance(proc_info, dict):
-                name = proc_info.get("name", "").lower()
-                username = proc_info.get("username", "").lower()
-            else:
+            identity = process_identity(proc_info)
+            if identity is None:
                 return matched
+            name, username = identity
 
-            for rule in self.rules:
-                rule_type = rule["type"]
-                value = str(rule["value"]).lower()
+            first_match = self.mode == "first_match"
+            exe_digest = cmdline = pattern_hits = resource_hits = _UNSET
+            for rule_type, value, terminal, scope, rule in self._process_rules:
+                if rule_type == "process_name":
+                    hit = value in name
+                elif rule_type == "username":
+                    hit = value in username
+                elif rule_type == "pattern":
+                    if pattern_hits is _UNSET:
+                        pattern_hits = self._pattern_hits(proc_info, name, username)
+                    hit = value in pattern_hits
+                elif rule_type == "resource":
+                    if resource_hits is _UNSET:
+                        resource_hits = self.resource_matches.get(_field(proc_info, "pid"), ())
+                    hit = value in resource_hits
+                elif rule_type == "cmdline":
+                    if cmdline is _UNSET:
+                        try:
+                            cmdline = process_cmdline(proc_info).lower()
+                        except (psutil.NoSuchProcess, psutil.AccessDenied):
+                            cmdline = None  # unreadable: only cmdline rules miss
+                    hit = cmdline is not None and value in cmdline
+                elif rule_type == "exe_sha256":
+                    if exe_digest is _UNSET:
+                        exe_digest = self._exe_digest(proc_info)
+                    hit = exe_digest == value
+                else:
+                    continue
 
-                if rule_type == "process_name" and value in name:
-                    matched.append(rule)
-                elif rule_type == "username" and value in username:
+                if (not hit and scope != "self" and rule_type in TREE_SCOPED_TYPES
+                        and self.process_tree is not None):
+                    hit = self._tree_hit(rule_type, value, scope, proc_info)
+
+                if hit:
                     matched.append(rule)
+                    if first_match and terminal:
+                        break
 
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             pass
@@ -103,23 +478,318 @@ class RuleEngine:
         conn_info can be:
           - dict (simulation)
           - Connection object (from ConnectionTracker)
+        In "first_match" mode the walk stops at the first terminal match.
         """
         matched = []
-        # Extract safely
-        local_port = getattr(conn_info, "local_port", conn_info.get("local_port", None))
-        remote_ip = getattr(conn_info, "remote_ip", conn_info.get("remote_ip", None))
-
-        for rule in self.rules:
-            rule_type = rule["type"]
-            value = str(rule["value"]).lower()
+        local_port, remote_ip = connection_identity(conn_info)
+        port_str = str(local_port)
+        ip_str = str(remote_ip).lower()
+        first_match = self.mode == "first_match"
+        age = hostname = _UNSET
+        for rule_type, value, terminal, _scope, rule in self._connection_rules:
+            if rule_type == "port":
+                hit = port_str == value
+            elif rule_type == "ip":
+                hit = value in ip_str
+            elif rule_type == "ip_blocklist":
+                hit = remote_ip is not None and remote_ip in self._blocklist(value)
+            elif rule_type == "conn_age_gt":
+                if age is _UNSET:
+                    age = connection_age(conn_info)
+                hit = age is not None and age > value
+            elif rule_type == "listen_recent":
+                if age is _UNSET:
+                    age = connection_age(conn_info)
+                hit = (age is not None and age <= value
+                       and _field(conn_info, "status") == "LISTEN"
+                       and not _field(conn_info, "preexisting"))
+            elif rule_type == "hostname":
+                if hostname is _UNSET:
+                    hostname = self._hostname(remote_ip)
+                # The domain itself or any subdomain ("example.com" matches "www.example.com")
+                hit = hostname is not None and (hostname == value or hostname.endswith("." + value))
+            elif rule_type in RATE_RULE_TYPES:
+                hit = self.rates is not None and self._rate(rule_type, conn_info, remote_ip) > value
+            else:
+                continue
 
-            if rule_type == "port" and str(local_port) == value:
-                matched.append(rule)
-            elif rule_type == "ip" and value in str(remote_ip).lower():
+            if hit:
                 matched.append(rule)
+                if first_match and terminal:
+                    break
 
         return matched
 
+    def _pattern_hits(self, proc_info, name, username):
+        """Indexes of every glob/regex rule matching this process (one combined search per field)."""
+        hits = set()
+        for field in self.patterns.matchers:
+            if field == "process_name":
+                hits |= self.patterns.hits(field, name)
+            elif field == "username":
+                hits |= self.patterns.hits(field, username)
+            elif field == "cmdline":
+                try:
+                    hits |= self.patterns.hits(field, process_cmdline(proc_info))
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass  # unreadable command line: only the cmdline patterns miss
+        return hits
+
+    # ----------------------------
+    # Executable Hashes
+    # ----------------------------
+    def _exe_digest(self, proc_info):
+        """
+        SHA-256 of the process executable from the persistent hash cache.
+        Returns None while the hash is still being computed; the pid is then
+        reported by pending_rechecks() once the hash is ready.
+        """
+        if self.hash_cache is None:
+            from exe_hash import ExeHashCache
+            self.hash_cache = ExeHashCache()
+        if isinstance(proc_info, psutil.Process):
+            try:
+                exe = proc_info.exe()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                return None  # e.g. another user's process: only this rule misses, the rest still run
+            pid = proc_info.pid
+        elif isinstance(proc_info, dict):
+            exe, pid = proc_info.get("exe"), proc_info.get("pid")
+        else:
+            exe, pid = getattr(proc_info, "exe", None), getattr(proc_info, "pid", None)
+        return self.hash_cache.lookup(exe, pid)
+
+    def pending_rechecks(self):
+        """Pids whose executable hash became available since the last call; re-evaluate them."""
+        if self.hash_cache is None:
+            return set()
+        return self.hash_cache.drain_ready()
+
+    def wait_pending(self, timeout):
+        """
+        Wait up to `timeout` seconds for in-flight executable hashes and reverse-DNS
+        lookups; True if none are left.
+        """
+        deadline = time.monotonic() + timeout
+        while ((self.hash_cache is not None and self.hash_cache.pending_count())
+               or (self.dns_cache is not None and self.dns_cache.pending_count())):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.02)
+        return True
+
+    # ----------------------------
+    # Bulk IP Blocklists
+    # ----------------------------
+    def _blocklist(self, value):
+        """IPBlocklist for an ip_blocklist rule value (comma-separated feed paths)."""
+        blocklist = self.blocklists.get(value)
+        if blocklist is None:
+            from ip_blocklist import IPBlocklist
+            feeds = [path.strip() for path in value.split(",") if path.strip()]
+            blocklist = self.blocklists[value] = IPBlocklist(feeds)
+        return blocklist
+
+    def refresh_blocklists(self):
+        """Reload any blocklist whose feed files changed; returns the number reloaded."""
+        return sum(1 for blocklist in self.blocklists.values() if blocklist.refresh())
+
+    # ----------------------------
+    # Hostname Rules
+    # ----------------------------
+    def _hostname(self, remote_ip):
+        """
+        Cached reverse-DNS name of `remote_ip`; never waits on DNS.
+        Returns None while the lookup is in flight; the IP is then reported
+        by pending_dns_rechecks() once it resolves.
+        """
+        if not remote_ip:
+            return None
+        if self.dns_cache is None:
+            from dns_cache import ReverseDNSCache
+            self.dns_cache = ReverseDNSCache()
+        return self.dns_cache.lookup(remote_ip)
+
+    def pending_dns_rechecks(self):
+        """Remote IPs whose hostname became known (or changed) since the last call."""
+        if self.dns_cache is None:
+            return set()
+        return self.dns_cache.drain_ready()
+
+    # ----------------------------
+    # Rate Rules
+    # ----------------------------
+    def observe_connections(self, connections):
+        """
+        Feed newly seen sockets (ConnectionTracker.new_connections) into the
+        sliding-window rate counters. Counting starts once a rate rule exists.
+        """
+        if self.rates is None:
+            if not any(entry[0] in RATE_RULE_TYPES for entry in self._connection_rules):
+                return
+            from rate_counters import ConnectionRates
+            self.rates = ConnectionRates()
+        self.rates.observe(connections)
+
+    def _rate(self, rule_type, conn_info, remote_ip):
+        if rule_type == "ip_rate_gt":
+            return self.rates.connections_from_ip(remote_ip) if remote_ip else 0
+        pid = _field(conn_info, "pid")
+        if rule_type == "conn_rate_gt":
+            return self.rates.new_connections(pid)
+        return self.rates.distinct_remote_ips(pid)
+
+    # ----------------------------
+    # Resource Rules
+    # ----------------------------
+    def sample_resources(self):
+        """Take one batched ResourceSample for update_resources() (None without resource rules)."""
+        if not self._resource_rules:
+            return None
+        needs_io = any(entry[0] in ("io_read_gt", "io_write_gt") for entry in self._resource_rules)
+        if self.resources is None or (needs_io and not self.resources.io):
+            from resource_accounting import ResourceSampler
+            self.resources = ResourceSampler(io=needs_io)
+        return self.resources.sample()
+
+    def update_resources(self, sample=_UNSET):
+        """
+        Sample every process' CPU / memory / I/O in one batched pass and evaluate all
+        resource rules over the sample's columns at once. match_process() then only looks
+        the pid up in the result. Call once per sweep; sampling starts once a resource rule
+        exists. A sample taken earlier by sample_resources() can be passed in to evaluate
+        that one instead. Returns the ResourceSample (None without resource rules).
+        """
+        if sample is _UNSET:
+            sample = self.sample_resources()
+        if sample is None or not self._resource_rules:
+            return None
+
+        import numpy as np
+        from resource_accounting import MB
+
+        columns = {"rss_mb_gt": sample.rss / MB, "cpu_percent_gt": sample.cpu_percent,
+                   "io_read_gt": sample.read_rate / MB, "io_write_gt": sample.write_rate / MB}
+        matched = np.zeros((len(sample), len(self._resource_rules)), dtype=bool)
+        resource_since = {}
+        for index, (rule_type, threshold, sustain, rule) in enumerate(self._resource_rules):
+            with np.errstate(invalid="ignore"):
+                over = columns[rule_type] > threshold  # NaN (no rate yet / unreadable) is never over
+            if sustain > 0:
+                # Carry each process' "over since" time across samples via prev_index
+                previous = self._resource_since.get(rule["id"])
+                since = np.full(len(sample), np.nan)
+                if previous is not None:
+                    linked = sample.prev_index >= 0
+                    since[linked] = previous[sample.prev_index[linked]]
+                since = np.where(over, np.where(np.isnan(since), sample.timestamp, since), np.nan)
+                resource_since[rule["id"]] = since
+                over &= sample.timestamp - np.nan_to_num(since, nan=sample.timestamp) >= sustain
+            matched[:, index] = over
+
+        rows, indexes = np.nonzero(matched)
+        resource_matches = {}
+        for pid, index in zip(sample.pids[rows].tolist(), indexes.tolist()):
+            resource_matches.setdefault(pid, set()).add(index)
+        self.resource_matches = resource_matches
+        self._resource_since = resource_since
+        return sample
+
+    # ----------------------------
+    # Process-Tree Scopes
+    # ----------------------------
+    def set_process_tree(self, process_manager):
+        """Use a ProcessManager's ppid → children tree to resolve scoped rules."""
+        self.process_tree = process_manager
+        self._ancestor_marks.clear()
+
+    @staticmethod
+    def _tree_field(proc, rule_type):
+        field = proc.name if rule_type == "process_name" else proc.username
+        return (field or "").lower()
+
+    def _tree_hit(self, rule_type, value, scope, proc_info):
+        """Resolve "descendants"/"ancestors" scopes in O(depth) per target."""
+        pid = proc_info.get("pid") if isinstance(proc_info, dict) else getattr(proc_info, "pid", None)
+        tree = self.process_tree
+        if scope == "descendants":
+            return any(value in self._tree_field(p, rule_type) for p in tree.ancestors(pid))
+
+        # "ancestors": mark every ancestor of a matching process once per tree generation,
+        # then each lookup is a set membership test.
+        cached = self._ancestor_marks.get((rule_type, value))
+        if cached is None or cached[0] != tree.generation:
+            marked = set()
+            for proc in list(tree.by_pid.values()):
+                if value in self._tree_field(proc, rule_type):
+                    for anc in tree.ancestors(proc.pid):
+                        if anc.pid in marked:
+                            break  # the rest of this chain is already marked
+                        marked.add(anc.pid)
+            cached = (tree.generation, marked)
+            self._ancestor_marks[(rule_type, value)] = cached
+        return pid in cached[1]
+
+    def match_process_connections(self, proc_info, tracker):
+        """
+        Apply process-scoped rules to the sockets that process owns.
+        Uses ConnectionTracker's pid index, so no connection table scan is needed.
+        Returns a list of (Connection, matched_rules).
+        """
+        matched = self.match_process(proc_info)
+        if not matched:
+            return []
+        pid = proc_info.get("pid") if isinstance(proc_info, dict) else getattr(proc_info, "pid", None)
+        return [(conn, matched) for conn in tracker.connections_for_pid(pid)]
+
+    # ----------------------------
+    # Incremental Re-evaluation
+    # ----------------------------
+    def track_targets(self, processes, connections):
+        """
+        Remember the live targets of a full sweep and index them by rule predicate
+        (port, remote IP, process name, username). Later add_rule/delete_rule calls
+        re-evaluate only the targets the changed rule could match.
+        """
+        from target_index import TargetIndex
+
+        index = TargetIndex()
+        index.update(processes, connections)
+        for key, target in index.targets.items():
+            index.verdicts[key] = self._verdict(key, target)
+        self.target_index = index
+        return index
+
+    def _verdict(self, key, target):
+        matches = self.match_process(target) if key[0] == "proc" else self.match_connection(target)
+        return tuple(r["id"] for r in matches), matches
+
+    def _reevaluate_for(self, *rules):
+        """Re-evaluate tracked targets affected by `rules`; return only changed verdicts."""
+        self.last_deltas = []
+        if self.target_index is None:
+            return self.last_deltas
+
+        keys = set()
+        for rule in rules:
+            keys |= self.target_index.candidates(rule)
+        for key in keys:
+            target = self.target_index.targets[key]
+            before_ids, before_rules = self.target_index.verdicts.get(key, ((), []))
+            after_ids, after_rules = self._verdict(key, target)
+            if after_ids == before_ids:
+                continue
+            self.target_index.verdicts[key] = (after_ids, after_rules)
+            self.last_deltas.append({
+                "key": key,
+                "target": target,
+                "before": list(before_ids),
+                "after": list(after_ids),
+                "added": [r for r in after_rules if r["id"] not in before_ids],
+                "removed": [rid for rid in before_ids if rid not in after_ids],
+            })
+        return self.last_deltas
+
     # ----------------------------
     # Enforcement Simulation
     # ----------------------------
@@ -154,6 +824,7 @@ if __name__ == "__main__":
 
     print("\n--- Current Rules ---")
     engine.list_rules()
+    engine.report_rule_issues()
 
     # Test using live process snapshot
     print("\n--- Testing Live Process Matching ---")
@@ -0,0 +1,139 @@
+import json
+import os
+import sys
+import tempfile
+
+COMPACT_EVERY = 1000   # journal entries before the snapshot is rewritten
+
+
+class RuleStore:
+    """
+    Durable rule storage: a JSON snapshot (the familiar rules.json list) plus an
+    append-only journal (<rules file>.journal) of changes since that snapshot.
+
+    - put/delete append one fsynced journal line instead of rewriting the file
+    - put_many appends a whole batch as one line, so it commits all-or-nothing
+    - compact() atomically replaces the snapshot (temp file + rename) and empties the journal
+    A torn trailing journal line from a crash is cut off on load, and a complete line that
+    isn't a well-formed entry is skipped with a warning; the snapshot is never written in
+    place, so it can't be corrupted by a crash mid-write.
+    Rules live in an id -> rule dict (file order preserved) for O(1) lookups and updates.
+    """
+
+    def __init__(self, path, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.compact_every = compact_every
+        self.by_id = {}
+        self.journal_entries = 0
+
+    # ----------------------------
+    # Loading
+    # ----------------------------
+    def load(self):
+        """Read the snapshot, then replay the journal on top of it. Returns the rule list."""
+        self.by_id = {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            for rule in data if isinstance(data, list) else []:
+                if isinstance(rule, dict) and "id" in rule:
+                    self.by_id[rule["id"]] = rule
+        except (OSError, json.JSONDecodeError):
+            pass
+
+        self.journal_entries = 0
+        try:
+            with open(self.journal_path, "rb+") as f:
+                good = 0  # offset just past the last complete entry
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn write at the tail: everything before it is intact
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    good += len(line)
+                    self.journal_entries += 1
+                    try:
+                        self._apply(entry)
+                    except (AttributeError, KeyError, TypeError) as e:
+                        print(f"⚠️ Skipping malformed entry {self.journal_entries} of {self.journal_path}: "
+                              f"{type(e).__name__} {e}", file=sys.stderr)
+                if f.seek(0, os.SEEK_END) != good:
+                    # Cut the torn bytes off, or the next append would be glued onto them
+                    f.truncate(good)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError:
+            pass
+        return self.rules()
+
+    def _apply(self, entry):
+        """Apply one journal entry; raises (without changing anything) if it is malformed."""
+        op = entry["op"]
+        if op == "put":
+            self.by_id.update({rule["id"]: rule for rule in entry["rules"]})
+        elif op == "delete":
+            self.by_id.pop(entry["id"], None)
+        elif op == "replace":
+            self.by_id = {rule["id"]: rule for rule in entry["rules"]}
+        else:
+            raise KeyError(f"unknown op {op!r}")
+
+    def rules(self):
+        return list(self.by_id.values())
+
+    def get(self, rule_id):
+        return self.by_id.get(rule_id)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    # ----------------------------
+    # Changes
+    # ----------------------------
+    def put(self, rule):
+        """Insert or replace one rule (by id)."""
+        self.put_many([rule])
+
+    def put_many(self, rules, replace=False):
+        """Insert/replace many rules in one journal entry (replace=True drops all other rules)."""
+        entry = {"op": "replace" if replace else "put", "rules": list(rules)}
+        self._append(entry)
+        self._apply(entry)
+
+    def delete(self, rule_id):
+        """Remove a rule; returns it, or None if no rule has that id."""
+        if rule_id not in self.by_id:
+            return None
+        self._append({"op": "delete", "id": rule_id})
+        return self.by_id.pop(rule_id)
+
+    def _append(self, entry):
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_entries += 1
+        if self.journal_entries >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Atomically write the current rules as the snapshot and start an empty journal."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".rules_", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.rules(), f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        # Only after the snapshot is in place: the journal's changes are now part of it
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.journal_entries = 0
@@ -0,0 +1,313 @@
+import argparse
+import gzip
+import json
+import socket
+import sys
+import time
+from collections import Counter
+
+SNAPSHOT_FILE = "snapshots.jsonl.gz"
+SNAPSHOT_FORMAT = "fw-snapshot"
+SNAPSHOT_VERSION = 2   # 2: connection age / preexisting and per-frame reverse DNS answers
+# Inputs a capture does not contain: rules of these types never match during a replay
+UNREPLAYABLE_RULE_TYPES = {
+    "cmdline": "command lines are not captured",
+    "exe_sha256": "executables are not captured",
+    "rss_mb_gt": "resource usage is not captured",
+    "cpu_percent_gt": "resource usage is not captured",
+    "io_read_gt": "resource usage is not captured",
+    "io_write_gt": "resource usage is not captured",
+    "conn_rate_gt": "connection rates are not replayed",
+    "distinct_ips_gt": "connection rates are not replayed",
+    "ip_rate_gt": "connection rates are not replayed",
+}
+
+
+# ----------------------------
+# Snapshot Encoding
+# ----------------------------
+# Frames store targets as positional lists instead of dicts to keep the
+# capture file compact:
+#   process    -> [pid, name, username, status]
+#   connection -> [pid, local_ip, local_port, remote_ip, remote_port, status, age, preexisting]
+# (age is seconds since the tracker first saw the socket, or null; version 1 rows stop at status)
+# Each frame also carries "dns": {remote_ip: hostname} for the answers known when it was taken.
+
+def encode_process(p):
+    return [p.pid, p.name, p.username, p.status]
+
+
+def encode_connection(c, now=None):
+    age = round(c.age(now), 3) if c.first_seen is not None else None
+    return [c.pid, c.local_ip, c.local_port, c.remote_ip, c.remote_port, c.status, age, c.preexisting]
+
+
+def decode_process(row):
+    pid, name, username, status = row
+    return {"pid": pid, "name": name or "", "username": username or "", "status": status}
+
+
+def decode_connection(row, now=None):
+    pid, local_ip, local_port, remote_ip, remote_port, status = row[:6]
+    age, preexisting = (row[6], row[7]) if len(row) >= 8 else (None, False)
+    now = now if now is not None else time.monotonic()
+    return {"pid": pid, "local_ip": local_ip, "local_port": local_port,
+            "remote_ip": remote_ip, "remote_port": remote_port, "status": status,
+            "first_seen": now - age if age is not None else None, "preexisting": preexisting}
+
+
+def iter_frames(path=SNAPSHOT_FILE):
+    """Yield snapshot frames from a capture file (header line is skipped)."""
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            try:
+                frame = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if frame.get("format") == SNAPSHOT_FORMAT:
+                continue
+            yield frame
+
+
+# ----------------------------
+# Capture
+# ----------------------------
+class SnapshotRecorder:
+    """
+    Records live process and connection snapshots into a gzip'd JSONL file (read-only).
+    Remote IPs are reverse-resolved in the background (as the engine does) and each frame
+    stores the hostnames known by then, so hostname rules replay without live DNS.
+    """
+
+    def __init__(self, path=SNAPSHOT_FILE, pm=None, ct=None, resolve_dns=True):
+        from process_manager import ProcessManager
+        from connection_tracker import ConnectionTracker
+
+        self.path = path
+        self.pm = pm or ProcessManager()
+        self.ct = ct or ConnectionTracker()
+        self.dns = None
+        if resolve_dns:
+            from dns_cache import ReverseDNSCache
+            self.dns = ReverseDNSCache()
+        self.frames_written = 0
+
+    def capture_frame(self, seq):
+        """Take one consistent snapshot of processes and connections."""
+        self.pm.update_processes()
+        self.ct.fetch_connections()
+        now = time.monotonic()
+        dns = {}
+        if self.dns is not None:
+            for ip in {c.remote_ip for c in self.ct.connections if c.remote_ip}:
+                hostname = self.dns.lookup(ip)
+                if hostname:
+                    dns[ip] = hostname
+        return {
+            "seq": seq,
+            "ts": round(time.time(), 3),
+            "procs": [encode_process(p) for p in self.pm.process_list],
+            "conns": [encode_connection(c, now) for c in self.ct.connections],
+            "dns": dns,
+        }
+
+    def record(self, interval=1.0, count=10):
+        """Capture `count` frames, one every `interval` seconds."""
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "host": socket.gethostname(),
+            "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "interval": interval,
+        }
+        with gzip.open(self.path, "wt", compresslevel=6) as f:
+            f.write(json.dumps(header, separators=(",", ":")) + "\n")
+            for seq in range(count):
+                started = time.time()
+                frame = self.capture_frame(seq)
+                f.write(json.dumps(frame, separators=(",", ":")) + "\n")
+                self.frames_written += 1
+                print(f"📸 Frame {seq + 1}/{count}: {len(frame['procs'])} processes, "
+                      f"{len(frame['conns'])} connections")
+                if seq + 1 < count:
+                    time.sleep(max(0.0, interval - (time.time() - started)))
+        if self.dns is not None:
+            self.dns.close()
+        print(f"✅ Saved {self.frames_written} frames to {self.path}")
+
+
+# ----------------------------
+# Replay
+# ----------------------------
+class _NullLogger:
+    """Stands in for FirewallLogger so replays never touch the live log file."""
+
+    def log_decision(self, target=None, rule=None, result=None):
+        pass
+
+
+class SnapshotDNS:
+    """
+    Stands in for dns_cache.ReverseDNSCache during a replay: answers only from the
+    hostnames recorded in the current frame and never queries DNS.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def load(self, frame):
+        self.entries = frame.get("dns") or {}
+
+    def lookup(self, ip):
+        return self.entries.get(ip) if ip else None
+
+    def drain_ready(self):
+        return set()
+
+    def pending_count(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+def _frame_targets(frame):
+    """Yield (key, kind, target) for every process and connection in a frame."""
+    for row in frame.get("procs", []):
+        yield ("proc", row[0]), "proc", decode_process(row)
+    now = time.monotonic()
+    for row in frame.get("conns", []):
+        yield ("conn", row[0], row[1], row[2], row[3], row[4]), "conn", decode_connection(row, now)
+
+
+class ReplayEngine:
+    """
+    Feeds captured snapshots through RuleEngine and ActionSimulator as fast as possible.
+    Hostname rules see the reverse-DNS answers recorded with each frame, never live DNS.
+    Rules needing inputs a capture lacks (UNREPLAYABLE_RULE_TYPES) never match; they are
+    listed in self.unreplayable and reported on stderr.
+    """
+
+    def __init__(self, rules_file=None, simulate_actions=True):
+        from rule_engine import RuleEngine, RULES_FILE
+        from action_simulator import ActionSimulator
+
+        self.engine = RuleEngine(rules_file or RULES_FILE)
+        self.dns = SnapshotDNS()
+        self.engine.dns_cache = self.dns
+        self.simulator = ActionSimulator(logger=_NullLogger(), output="silent") if simulate_actions else None
+        self.unreplayable = [(rule.get("id"), UNREPLAYABLE_RULE_TYPES[rule.get("type")])
+                             for rule in self.engine.rules if rule.get("type") in UNREPLAYABLE_RULE_TYPES]
+        for rule_id, reason in self.unreplayable:
+            print(f"⚠️ Rule {rule_id} can't be replayed ({reason}); it will not match", file=sys.stderr)
+
+    def begin_frame(self, frame):
+        """Make the frame's recorded context (reverse DNS answers) current."""
+        self.dns.load(frame)
+
+    def decide(self, kind, target):
+        """Return the matched rules for one decoded target."""
+        if kind == "proc":
+            return self.engine.match_process(target)
+        return self.engine.match_connection(target)
+
+    def replay(self, path=SNAPSHOT_FILE):
+        """Replay every frame and return throughput statistics."""
+        stats = {"frames": 0, "targets": 0, "decisions": 0, "actions": Counter(), "rules": Counter()}
+        started = time.perf_counter()
+
+        for frame in iter_frames(path):
+            stats["frames"] += 1
+            self.begin_frame(frame)
+            for _key, kind, target in _frame_targets(frame):
+                stats["targets"] += 1
+                for rule in self.decide(kind, target):
+                    stats["decisions"] += 1
+                    stats["actions"][rule.get("action")] += 1
+                    stats["rules"][rule.get("id")] += 1
+                    if self.simulator:
+                        self.simulator.apply_action(target, rule)
+
+        stats["elapsed"] = time.perf_counter() - started
+        elapsed = stats["elapsed"] or 1e-9
+        stats["targets_per_sec"] = stats["targets"] / elapsed
+        stats["decisions_per_sec"] = stats["decisions"] / elapsed
+        return stats
+
+
+def diff_rule_sets(path, rules_a, rules_b, sample_limit=20):
+    """
+    Replay a capture against two rule files and report targets whose verdicts differ.
+    Both engines evaluate the same frame before moving on, so memory stays constant.
+    """
+    a = ReplayEngine(rules_a, simulate_actions=False)
+    b = ReplayEngine(rules_b, simulate_actions=False)
+    result = {"frames": 0, "targets": 0, "changed": 0, "transitions": Counter(), "samples": []}
+
+    for frame in iter_frames(path):
+        result["frames"] += 1
+        a.begin_frame(frame)
+        b.begin_frame(frame)
+        for key, kind, target in _frame_targets(frame):
+            result["targets"] += 1
+            before = tuple((r.get("id"), r.get("action")) for r in a.decide(kind, target))
+            after = tuple((r.get("id"), r.get("action")) for r in b.decide(kind, target))
+            if before == after:
+                continue
+            result["changed"] += 1
+            before_actions = ",".join(sorted({act for _, act in before})) or "none"
+            after_actions = ",".join(sorted({act for _, act in after})) or "none"
+            result["transitions"][f"{before_actions} → {after_actions}"] += 1
+            if len(result["samples"]) < sample_limit:
+                result["samples"].append({"seq": frame.get("seq"), "target": key,
+                                          "before": before, "after": after})
+    return result
+
+
+# ----------------------------
+# Reporting
+# ----------------------------
+def print_replay_stats(stats):
+    print("\n--- Replay Results ---")
+    print(f"Frames: {stats['frames']} | Targets: {stats['targets']} | Decisions: {stats['decisions']}")
+    print(f"Elapsed: {stats['elapsed']:.3f}s | Targets/s: {stats['targets_per_sec']:.0f} | "
+          f"Decisions/s: {stats['decisions_per_sec']:.0f}")
+    for action, count in stats["actions"].most_common():
+        print(f"  • {action}: {count}")
+
+
+def print_diff(result):
+    print("\n--- Rule Set Diff ---")
+    print(f"Frames: {result['frames']} | Targets: {result['targets']} | Changed verdicts: {result['changed']}")
+    for transition, count in result["transitions"].most_common():
+        print(f"  • {transition}: {count}")
+    for sample in result["samples"]:
+        print(f"  [frame {sample['seq']}] {sample['target']}: {sample['before']} → {sample['after']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture and replay firewall snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    cap = sub.add_parser("capture", help="Record live process/connection snapshots")
+    cap.add_argument("--out", default=SNAPSHOT_FILE)
+    cap.add_argument("--interval", type=float, default=1.0)
+    cap.add_argument("--count", type=int, default=10)
+    cap.add_argument("--no-dns", action="store_true", help="don't record reverse DNS answers")
+
+    rep = sub.add_parser("replay", help="Replay a capture through the rule engine")
+    rep.add_argument("capture", nargs="?", default=SNAPSHOT_FILE)
+    rep.add_argument("--rules", default=None)
+
+    dif = sub.add_parser("diff", help="Compare decisions of two rule files on a capture")
+    dif.add_argument("capture")
+    dif.add_argument("rules_a")
+    dif.add_argument("rules_b")
+
+    args = parser.parse_args()
+    if args.command == "capture":
+        SnapshotRecorder(args.out, resolve_dns=not args.no_dns).record(interval=args.interval, count=args.count)
+    elif args.command == "replay":
+        print_replay_stats(ReplayEngine(args.rules).replay(args.capture))
+    else:
+        print_diff(diff_rule_sets(args.capture, args.rules_a, args.rules_b))
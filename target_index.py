@@ -0,0 +1,110 @@
+import re
+
+import psutil
+
+from rule_engine import CONNECTION_RULE_TYPES, PROCESS_RULE_TYPES, process_identity, connection_identity
+
+
+def target_key(kind, target):
+    """Stable key for a process ("proc", pid) or a connection socket tuple."""
+    if kind == "proc":
+        pid = target.get("pid") if isinstance(target, dict) else getattr(target, "pid", None)
+        return ("proc", pid)
+    if isinstance(target, dict):
+        get = target.get
+    else:
+        def get(attr):
+            return getattr(target, attr, None)
+    return ("conn", get("pid"), get("local_ip"), get("local_port"), get("remote_ip"), get("remote_port"))
+
+
+class TargetIndex:
+    """
+    Reverse index from rule predicates to the live targets that could match them.
+    Substring predicates (name, username, IP) are resolved against the *distinct*
+    values seen, which is far smaller than the number of targets on a busy host.
+    """
+
+    def __init__(self):
+        self.targets = {}      # key -> process/connection target
+        self.verdicts = {}     # key -> (matched rule ids, matched rules)
+        self.by_port = {}      # "8080" -> {conn keys}
+        self.by_remote_ip = {} # "10.0.0.1" -> {conn keys}
+        self.by_name = {}      # "chrome.exe" -> {proc keys}
+        self.by_username = {}  # "alice" -> {proc keys}
+
+    def update(self, processes, connections):
+        """Rebuild the index from one snapshot of processes and connections."""
+        self.targets.clear()
+        self.verdicts.clear()
+        for table in (self.by_port, self.by_remote_ip, self.by_name, self.by_username):
+            table.clear()
+
+        for proc in processes:
+            try:
+                identity = process_identity(proc)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            if identity is None:
+                continue
+            key = target_key("proc", proc)
+            self.targets[key] = proc
+            name, username = identity
+            self.by_name.setdefault(name, set()).add(key)
+            self.by_username.setdefault(username, set()).add(key)
+
+        for conn in connections:
+            key = target_key("conn", conn)
+            self.targets[key] = conn
+            local_port, remote_ip = connection_identity(conn)
+            self.by_port.setdefault(str(local_port), set()).add(key)
+            self.by_remote_ip.setdefault(str(remote_ip).lower(), set()).add(key)
+
+    def candidates(self, rule):
+        """Return the keys of every tracked target the rule could match."""
+        rule_type = rule.get("type")
+        value = str(rule.get("value", "")).lower()
+
+        if rule.get("match") in ("glob", "regex") and rule_type in ("process_name", "username"):
+            table = self.by_name if rule_type == "process_name" else self.by_username
+            return self._pattern_lookup(table, rule["match"], str(rule.get("value", "")))
+
+        if rule.get("scope", "self") != "self" and rule_type in ("process_name", "username"):
+            # Tree-scoped rules reach relatives with unrelated names; re-check every process
+            return {key for key in self.targets if key[0] == "proc"}
+
+        if rule_type == "port":
+            return set(self.by_port.get(value, ()))
+        if rule_type == "ip":
+            return self._substring_lookup(self.by_remote_ip, value)
+        if rule_type == "process_name":
+            return self._substring_lookup(self.by_name, value)
+        if rule_type == "username":
+            return self._substring_lookup(self.by_username, value)
+        if rule_type in PROCESS_RULE_TYPES:
+            # Predicates the index can't resolve (e.g. exe hashes) fall back to every process
+            return {key for key in self.targets if key[0] == "proc"}
+        if rule_type in CONNECTION_RULE_TYPES:
+            return {key for key in self.targets if key[0] == "conn"}
+        return set()
+
+    @staticmethod
+    def _pattern_lookup(table, mode, pattern):
+        from pattern_matcher import PATTERN_FLAGS, pattern_source
+        try:
+            regex = re.compile(pattern_source(mode, pattern), PATTERN_FLAGS)
+        except re.error:
+            return set()
+        keys = set()
+        for seen, members in table.items():
+            if regex.search(seen):
+                keys |= members
+        return keys
+
+    @staticmethod
+    def _substring_lookup(table, value):
+        keys = set()
+        for seen, members in table.items():
+            if value in seen:
+                keys |= members
+        return keys
@@ -0,0 +1,104 @@
+import math
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel (tick → seconds/minutes/hours style levels).
+    schedule() and cancel() are O(1); advance() does O(1) work per elapsed tick
+    plus O(1) per expiring or cascading timer, so no full scan of live timers
+    is ever needed. Rescheduling a key simply supersedes its previous timer;
+    stale bucket entries are skipped lazily when their slot comes around.
+    """
+
+    def __init__(self, tick=1.0, slots=(64, 64, 64), start=0.0):
+        self.tick = tick
+        self.slots = slots
+        self.origin = start
+        self.current = 0                 # last processed tick
+        self.levels = [[[] for _ in range(n)] for n in slots]
+        self.overflow = []               # timers beyond the top level's span
+        self.timers = {}                 # key -> expiry tick (the only live timer per key)
+        # ticks covered by each level: 64, 64*64, 64*64*64 ...
+        self.spans = []
+        span = 1
+        for n in slots:
+            span *= n
+            self.spans.append(span)
+
+    def __len__(self):
+        return len(self.timers)
+
+    def _tick_of(self, when):
+        return max(self.current + 1, math.ceil((when - self.origin) / self.tick))
+
+    def schedule(self, key, when):
+        """Fire `key` at time `when` (replaces any existing timer for key)."""
+        tick = self._tick_of(when)
+        self.timers[key] = tick
+        self._place(key, tick)
+
+    def cancel(self, key):
+        self.timers.pop(key, None)
+
+    def _place(self, key, tick):
+        delta = tick - self.current
+        unit = 1
+        for level, span in enumerate(self.spans):
+            if delta < span:
+                slot = (tick // unit) % self.slots[level]
+                self.levels[level][slot].append((key, tick))
+                return
+            unit = span
+        self.overflow.append((key, tick))
+
+    def advance(self, now):
+        """Process all ticks up to `now`; return the keys whose timers expired."""
+        target = math.floor((now - self.origin) / self.tick)
+        expired = []
+        if target - self.current > self.spans[-1]:
+            # Long gap (e.g. host suspend): re-bucket everything once instead of ticking through it
+            self.current = target
+            pending = [(k, t) for k, t in self.timers.items()]
+            self.levels = [[[] for _ in range(n)] for n in self.slots]
+            self.overflow = []
+            for key, tick in pending:
+                if tick <= target:
+                    del self.timers[key]
+                    expired.append(key)
+                else:
+                    self._place(key, tick)
+            return expired
+
+        while self.current < target:
+            self.current += 1
+            self._cascade()
+            bucket = self.levels[0][self.current % self.slots[0]]
+            if not bucket:
+                continue
+            self.levels[0][self.current % self.slots[0]] = []
+            for key, tick in bucket:
+                if self.timers.get(key) != tick:
+                    continue  # cancelled or rescheduled
+                if tick <= self.current:
+                    del self.timers[key]
+                    expired.append(key)
+                else:
+                    self._place(key, tick)
+        return expired
+
+    def _cascade(self):
+        """When a lower level wraps, move the next higher-level bucket down."""
+        unit = 1
+        for level in range(1, len(self.slots) + 1):
+            unit = self.spans[level - 1]
+            if self.current % unit:
+                return
+            if level == len(self.slots):
+                entries, self.overflow = self.overflow, []
+            else:
+                slot = (self.current // unit) % self.slots[level]
+                entries = self.levels[level][slot]
+                self.levels[level][slot] = []
+            for key, tick in entries:
+                if self.timers.get(key) == tick:
+                    self._place(key, tick)
@@ -3,7 +3,7 @@ from tkinter import ttk, messagebox
 import psutil
 import threading
 import time
-from datetime import datetime
+import numpy as np
 from collections import deque
 
 from process_manager import ProcessManager
@@ -11,6 +11,10 @@ from connection_tracker import ConnectionTracker
 from rule_engine import RuleEngine
 from action_simulator import ActionSimulator
 from logger import FirewallLogger
+from governor import CPUGovernor, HostCPU
+from metrics_store import MetricsStore
+from query_api import QueryServer
+from profiling import profiler, span
 
 
 class FirewallGUI:
@@ -27,14 +31,11 @@ class FirewallGUI:
         self.re = RuleEngine()
         self.logger = FirewallLogger()
         self.act = ActionSimulator(self.logger)
+        # Adapts polling intervals / evaluation batches to the firewall's CPU budget
+        self.governor = CPUGovernor()
         
-        # Track connection start times
-        self.connection_start_times = {}
-        
-        # Data for live graphs
-        self.cpu_data = deque(maxlen=60)  # Last 60 data points
-        self.memory_data = deque(maxlen=60)
-        self.time_labels = deque(maxlen=60)
+        # Live graphs read from the persistent multi-resolution store (history survives restarts)
+        self.metrics = MetricsStore()
         
         # Firewall-specific performance metrics
         self.rule_match_count = 0
@@ -46,10 +47,6 @@ class FirewallGUI:
         
         # Monitoring flags
         self.monitoring_active = False
-        
-        # Initialize with some data
-        self.cpu_data.append(0)
-        self.memory_data.append(0)
 
         self.tab_control = ttk.Notebook(root)
         self.proc_tab = ttk.Frame(self.tab_control)
@@ -71,10 +68,24 @@ class FirewallGUI:
         self.create_log_tab()
         self.create_add_rule_section()
         self.create_perf_tab()
+
+        # Process/connection/log tables are filled on first view, so the window
+        # appears without waiting on a full process and socket walk.
+        self.lazy_tabs = {str(self.proc_tab): self.refresh_proc_tab,
+                          str(self.conn_tab): self.refresh_conn_tab,
+                          str(self.log_tab): self.refresh_log_tab}
+        self.tab_control.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.root.after_idle(self.on_tab_changed)
         
         # Start monitoring thread after UI is ready
         self.root.after(1000, self.start_monitoring)
 
+    def on_tab_changed(self, event=None):
+        """Populate a lazily-filled tab the first time it is shown."""
+        refresh = self.lazy_tabs.pop(self.tab_control.select(), None)
+        if refresh:
+            refresh()
+
     # ----------------------------
     # PROCESS TAB
     # ----------------------------
@@ -93,7 +104,6 @@ class FirewallGUI:
 
         refresh_btn = tk.Button(self.proc_tab, text="Refresh", command=self.refresh_proc_tab)
         refresh_btn.pack(pady=5)
-        self.refresh_proc_tab()
 
     def refresh_proc_tab(self):
         for i in self.proc_tree.get_children():
@@ -118,23 +128,24 @@ class FirewallGUI:
     # CONNECTION TAB
     # ----------------------------
     def create_conn_tab(self):
-        self.conn_tree = ttk.Treeview(self.conn_tab, columns=("PID", "Process", "Local", "Remote", "Status"), show="headings")
+        self.conn_tree = ttk.Treeview(self.conn_tab, columns=("PID", "Process", "Local", "Remote", "Status", "Age"), show="headings")
         self.conn_tree.heading("PID", text="PID")
         self.conn_tree.heading("Process", text="Process")
         self.conn_tree.heading("Local", text="Local")
         self.conn_tree.heading("Remote", text="Remote")
         self.conn_tree.heading("Status", text="Status")
+        self.conn_tree.heading("Age", text="Age")
         
         self.conn_tree.column("PID", width=80)
         self.conn_tree.column("Process", width=180)
         self.conn_tree.column("Local", width=180)
         self.conn_tree.column("Remote", width=180)
         self.conn_tree.column("Status", width=120)
+        self.conn_tree.column("Age", width=80)
         self.conn_tree.pack(expand=1, fill="both")
 
         refresh_btn = tk.Button(self.conn_tab, text="Refresh Connections", command=self.refresh_conn_tab)
         refresh_btn.pack(pady=5)
-        self.refresh_conn_tab()
 
     def refresh_conn_tab(self):
         for i in self.conn_tree.get_children():
@@ -156,7 +167,8 @@ class FirewallGUI:
             local = f"{conn.local_ip}:{conn.local_port}" if conn.local_ip else "-"
             remote = f"{conn.remote_ip}:{conn.remote_port}" if conn.remote_ip else "-"
             
-            self.conn_tree.insert("", "end", values=(conn.pid, pname[:25], local[:25], remote[:25], conn.status))
+            age = f"{conn.age():.0f}s" + ("+" if conn.preexisting else "")  # "+": open before tracking began
+            self.conn_tree.insert("", "end", values=(conn.pid, pname[:25], local[:25], remote[:25], conn.status, age))
             
             count += 1
             if count >= 50:  # Limit to 50 connections
@@ -209,10 +221,16 @@ class FirewallGUI:
             messagebox.showerror("Error", "All fields are required")
             return
         new_rule = {"id": rule_id, "type": rule_type, "value": rule_value, "action": rule_action}
-        self.re.rules.append(new_rule)
-        self.re.save_rules()
+        # Only targets the new rule could match are re-evaluated (see RuleEngine.track_targets)
+        deltas = self.re.add_rule(new_rule)
+        for delta in deltas:
+            for rule in delta["added"]:
+                self.act.apply_action(delta["target"], rule)
         self.refresh_rule_tab()
-        messagebox.showinfo("Success", f"Rule '{rule_id}' added successfully!")
+        if deltas:
+            self.refresh_log_tab()
+        messagebox.showinfo("Success", f"Rule '{rule_id}' added successfully!\n"
+                                       f"{len(deltas)} tracked target(s) changed verdict.")
         self.rule_id_entry.delete(0, tk.END)
         self.rule_type_entry.delete(0, tk.END)
         self.rule_value_entry.delete(0, tk.END)
@@ -231,13 +249,10 @@ class FirewallGUI:
         tk.Button(self.log_tab, text="Refresh Logs", command=self.refresh_log_tab).pack(pady=5)
         tk.Button(self.log_tab, text="Apply Rules to All", command=self.apply_rules_to_all).pack(pady=5)
 
-        self.refresh_log_tab()
-
     def refresh_log_tab(self):
         for i in self.log_tree.get_children():
             self.log_tree.delete(i)
-        records = self.logger.query_logs()
-        for rec in records[-25:]:
+        for rec in self.logger.recent(25):
             pname = rec.get("process_name", "Unknown")
             self.log_tree.insert("", "end", values=(rec["timestamp"], rec["pid"], pname, rec["rule_id"], rec["action"], rec["result"]))
 
@@ -307,6 +322,9 @@ class FirewallGUI:
         
         self.most_active_rule_label = tk.Label(fw_inner, text="Most Active Rule: None", font=('Arial', 10))
         self.most_active_rule_label.grid(row=1, column=1, padx=20, pady=5, sticky='w')
+        
+        self.governor_label = tk.Label(fw_inner, text="Governor: steady", font=('Arial', 10))
+        self.governor_label.grid(row=2, column=0, columnspan=2, padx=20, pady=5, sticky='w')
     
     def start_monitoring(self):
         """Start the monitoring thread after UI is initialized"""
@@ -318,58 +336,48 @@ class FirewallGUI:
         self.rule_eval_thread = threading.Thread(target=self.continuous_rule_evaluation, daemon=True)
         self.rule_eval_thread.start()
         
+        # Local JSON API over a UNIX socket, answered from the state gathered above
+        self.re.set_process_tree(self.pm)
+        self.query_server = QueryServer(self.re, self.ct, self.pm, self.act, self.metrics)
+        self.query_server.start()
+        
         print("✅ Performance monitoring started!")
         print("✅ Continuous rule evaluation started!")
     
     def monitor_system(self):
         """Background thread to collect system metrics"""
         start_time = time.time()
-        
-        try:
-            firewall_proc = psutil.Process()  # Current process (firewall)
-            # Initialize CPU measurement
-            firewall_proc.cpu_percent(interval=None)
-        except:
-            firewall_proc = None
-        
-        # Wait a bit for first CPU measurement
-        time.sleep(0.1)
+        host_cpu = HostCPU()  # own baseline; the governor keeps a separate one
         
         while self.monitoring_active:
             try:
-                # Collect metrics
-                cpu_percent = psutil.cpu_percent(interval=1)
-                mem_percent = psutil.virtual_memory().percent
-                
-                current_time = datetime.now().strftime("%H:%M:%S")
-                
-                self.cpu_data.append(cpu_percent)
-                self.memory_data.append(mem_percent)
-                self.time_labels.append(current_time)
+                # Polling pace is set by the CPU governor (never a blocking sample)
+                time.sleep(self.governor.metrics_interval)
+                with profiler.sweep("monitor"):
+                    cpu_percent = host_cpu.percent()
+                    mem_percent = psutil.virtual_memory().percent
                 
-                # Get process and connection counts
-                try:
-                    proc_count = len(list(psutil.process_iter()))
-                except:
-                    proc_count = 0
-                
-                try:
-                    self.ct.fetch_connections()
-                    conn_count = len(self.ct.connections)
-                except:
-                    conn_count = 0
+                    # Get process and connection counts (the process tree also backs scoped rules and the query API);
+                    # while the governor backs off, fresh listings are skipped on some cycles and the last one reused
+                    try:
+                        if self.governor.due("monitor_processes"):
+                            self.pm.update_processes()
+                        proc_count = len(self.pm.by_pid)
+                    except:
+                        proc_count = 0
                 
-                # Get firewall's own CPU usage (cached value after interval)
-                if firewall_proc:
                     try:
-                        firewall_cpu = firewall_proc.cpu_percent(interval=None)
-                        # If still 0, force a measurement
-                        if firewall_cpu == 0.0:
-                            firewall_cpu = firewall_proc.cpu_percent(interval=0.5)
+                        if self.governor.due("monitor_connections"):
+                            self.ct.fetch_connections()
+                        conn_count = len(self.ct.connections)
                     except:
-                        firewall_cpu = 0.0
-                else:
-                    firewall_cpu = 0.0
+                        conn_count = 0
+                
+                    # Firewall's own CPU usage, as last measured by the governor
+                    firewall_cpu = self.governor.own_cpu
+                
+                    self.metrics.record({"cpu": cpu_percent, "memory": mem_percent, "firewall_cpu": firewall_cpu,
+                                         "processes": proc_count, "connections": conn_count})
                 
                 # Calculate uptime
                 uptime_seconds = int(time.time() - start_time)
@@ -393,65 +401,76 @@ class FirewallGUI:
     
     def continuous_rule_evaluation(self):
         """Continuously evaluate rules against active processes/connections (simulates real firewall)"""
+        proc_list = []
         while self.monitoring_active:
             try:
-                eval_start = time.time()
-                rules_checked = 0
+                with profiler.sweep("rule_eval"):
+                    eval_start = time.time()
+                    rules_checked = 0
                 
-                # Sample a subset of processes (10 random ones) for performance
-                import random
-                proc_list = list(psutil.process_iter(['pid', 'name', 'username']))
-                sample_size = min(10, len(proc_list))
+                    # Batch sizes / full-vs-sampled depth and how often to re-list come from the CPU governor
+                    if self.governor.due("eval_processes"):
+                        with span("process_iter"):
+                            proc_list = list(psutil.process_iter(['pid', 'name', 'username']))
+                    with span("update_resources"):
+                        self.re.update_resources()
                 
-                for proc in random.sample(proc_list, sample_size):
-                    try:
-                        rule_start = time.time()
-                        matched_rules = self.re.match_process(proc)
-                        rule_end = time.time()
+                    with span("match_processes"):
+                        for proc in self.governor.sample(proc_list, self.governor.proc_batch):
+                            try:
+                                rule_start = time.time()
+                                matched_rules = self.re.match_process(proc)
+                                rule_end = time.time()
                         
-                        self.rule_processing_times.append(rule_end - rule_start)
-                        rules_checked += 1
+                                self.rule_processing_times.append(rule_end - rule_start)
+                                rules_checked += 1
                         
-                        for rule in matched_rules:
-                            rule_id = rule.get('id', 'unknown')
-                            self.rule_match_stats[rule_id] = self.rule_match_stats.get(rule_id, 0) + 1
-                            self.rule_match_count += 1
-                    except:
-                        pass
+                                for rule in matched_rules:
+                                    rule_id = rule.get('id', 'unknown')
+                                    self.rule_match_stats[rule_id] = self.rule_match_stats.get(rule_id, 0) + 1
+                                    self.rule_match_count += 1
+                            except:
+                                pass
                 
-                # Sample connections (5 random ones)
-                try:
-                    self.ct.fetch_connections()
-                    conn_sample_size = min(5, len(self.ct.connections))
+                    try:
+                        if self.governor.due("eval_connections"):
+                            with span("fetch_connections"):
+                                self.ct.fetch_connections()
+                                self.re.observe_connections(self.ct.drain_new_connections())
                     
-                    for conn in random.sample(self.ct.connections, conn_sample_size):
-                        rule_start = time.time()
-                        matched_rules = self.re.match_connection(conn)
-                        rule_end = time.time()
+                        with span("match_connections"):
+                            for conn in self.governor.sample(self.ct.connections, self.governor.conn_batch):
+                                rule_start = time.time()
+                                matched_rules = self.re.match_connection(conn)
+                                rule_end = time.time()
                         
-                        self.rule_processing_times.append(rule_end - rule_start)
-                        rules_checked += 1
+                                self.rule_processing_times.append(rule_end - rule_start)
+                                rules_checked += 1
                         
-                        for rule in matched_rules:
-                            rule_id = rule.get('id', 'unknown')
-                            self.rule_match_stats[rule_id] = self.rule_match_stats.get(rule_id, 0) + 1
-                            self.rule_match_count += 1
-                except:
-                    pass
+                                for rule in matched_rules:
+                                    rule_id = rule.get('id', 'unknown')
+                                    self.rule_match_stats[rule_id] = self.rule_match_stats.get(rule_id, 0) + 1
+                                    self.rule_match_count += 1
+                    except:
+                        pass
                 
-                # Calculate rules per second
-                eval_time = time.time() - eval_start
-                if eval_time > 0:
-                    self.rules_per_second = rules_checked / eval_time
+                    # Calculate rules per second
+                    eval_time = time.time() - eval_start
+                    if eval_time > 0:
+                        self.rules_per_second = rules_checked / eval_time
                 
-                self.rules_checked_since_last += rules_checked
+                    self.rules_checked_since_last += rules_checked
+                    if rules_checked:
+                        recent = list(self.rule_processing_times)[-rules_checked:]
+                        self.metrics.record({"rule_eval_ms": sum(recent) / len(recent) * 1000})
                 
-                # Sleep for a bit before next evaluation cycle
-                time.sleep(2)  # Evaluate every 2 seconds
+                # Measure our own CPU use and adapt the pace before the next cycle
+                self.governor.update()
+                time.sleep(self.governor.eval_interval)
                 
             except Exception as e:
                 print(f"Rule evaluation error: {e}")
-                time.sleep(2)
+                time.sleep(self.governor.eval_interval)
     
     def update_perf_display(self, cpu, mem, proc_count, conn_count, uptime, fw_cpu):
         """Update performance graphs and statistics (called from main thread)"""
@@ -481,9 +500,21 @@ class FirewallGUI:
         else:
             self.most_active_rule_label.config(text=f"Most Active Rule: None")
         
+        gov = self.governor.metrics()
+        self.governor_label.config(
+            text=f"Governor: {gov['state']} | budget {gov['budget']:.1f}% | depth {gov['depth']} | "
+                 f"poll {gov['metrics_interval']:.1f}s | eval {gov['eval_interval']:.1f}s | "
+                 f"batch {gov['proc_batch']}/{gov['conn_batch']} | list every {gov['collect_every']}")
+        
         # Draw graphs
-        self.draw_graph(self.cpu_canvas, self.cpu_data, "CPU", "#FF6B6B", max_val=100)
-        self.draw_graph(self.mem_canvas, self.memory_data, "Memory", "#4ECDC4", max_val=100)
+        self.draw_graph(self.cpu_canvas, self.recent_samples("cpu"), "CPU", "#FF6B6B", max_val=100)
+        self.draw_graph(self.mem_canvas, self.recent_samples("memory"), "Memory", "#4ECDC4", max_val=100)
+    
+    def recent_samples(self, metric, points=60):
+        """Last `points` recorded 1s averages of `metric` (gaps from slower polling skipped)."""
+        span = min(3600, int(points * max(1.0, self.governor.metrics_interval)) + 1)
+        _, _, avg, _ = self.metrics.window(metric, step=1, count=span)
+        return [float(v) for v in avg[~np.isnan(avg)][-points:]]
     
     def draw_graph(self, canvas, data, label, color, max_val=100):
         """Draw a line graph on the canvas"""
@@ -551,7 +582,8 @@ class FirewallGUI:
         rules_processed = 0
         
         # Apply to all live processes
-        for proc in psutil.process_iter(['pid', 'name', 'username']):
+        live_procs = list(psutil.process_iter(['pid', 'name', 'username']))
+        for proc in live_procs:
             rule_start = time.time()
             matched_rules = self.re.match_process(proc)
             rule_end = time.time()
@@ -570,6 +602,7 @@ class FirewallGUI:
 
         # Apply to all active connections
         self.ct.fetch_connections()
+        self.re.observe_connections(self.ct.drain_new_connections())
         for conn in self.ct.connections:
             rule_start = time.time()
             matched_rules = self.re.match_connection(conn)
@@ -587,10 +620,15 @@ class FirewallGUI:
                 self.rule_match_stats[rule_id] = self.rule_match_stats.get(rule_id, 0) + 1
                 self.rule_match_count += 1
         
+        self.act.flush()
+
         # Calculate rules per second
         total_time = time.time() - start_time
         if total_time > 0:
             self.rules_per_second = rules_processed / total_time
+
+        # Remember this sweep so later rule edits only re-evaluate affected targets
+        self.re.track_targets(live_procs, self.ct.connections)
         
         self.refresh_proc_tab()
         self.refresh_conn_tab()
@@ -615,6 +653,7 @@ if __name__ == "__main__":
         
         app = FirewallGUI(root)
         print("✅ GUI created successfully!")
+        profiler.install_signals()  # SIGUSR1: CPU profile, SIGUSR2: memory diff + sweep trace
         print("=" * 60)
         print("📊 Features:")
         print("  • Process monitoring with CPU & Memory metrics")
@@ -625,6 +664,9 @@ if __name__ == "__main__":
         print("🚀 Application running... Close window to exit.\n")
         
         root.mainloop()
+        app.metrics.close()  # persist the latest samples for the next run
+        app.act.close()      # pending summary / queued enforcement
+        app.logger.close()   # drain queued decision sinks
     except Exception as e:
         print(f"❌ Error starting GUI: {e}")
         import traceback